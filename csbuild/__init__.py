@@ -173,6 +173,17 @@ with perf_timer.PerfTimer("csbuild module init"):
 	csbuild = sys.modules["csbuild"]
 
 	# pylint: disable=wrong-import-position
+	from ._utils import daemon_client, PlatformString
+
+	# Builds run through the daemon are forwarded before anything else is imported, since the imports are most of
+	# what the daemon saves
+	if os.getenv(PlatformString("CSBUILD_NO_AUTO_RUN")) != "1" \
+			and getattr(sys.modules["__main__"], "__file__", None) is not None \
+			and (daemon_client.DAEMON_ARG in sys.argv or daemon_client.STOP_DAEMON_ARG in sys.argv):
+		_exitCode = daemon_client.RunClient()
+		if _exitCode is not None:
+			sys.exit(_exitCode)
+
 	from ._build.context_manager import ContextManager, MultiDataContext
 	from ._build import project_plan, project, input_file
 
@@ -181,7 +192,6 @@ with perf_timer.PerfTimer("csbuild module init"):
 	from ._utils.string_abc import String
 	from ._utils.decorators import TypeChecked
 	from ._utils import ordered_set
-	from ._utils import PlatformString
 
 	from .toolchain import toolchain
 
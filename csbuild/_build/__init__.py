@@ -35,17 +35,25 @@ import sys
 import imp
 import math
 import multiprocessing
+import multiprocessing.pool
 import time
 import threading
 import collections
+import functools
 
 from . import recompile
-from . import project_plan, project, input_file
-from .. import log, commands, tools, perf_timer
-from .._utils import system, shared_globals, thread_pool, terminfo, ordered_set, FormatTime, queue, dag, MultiBreak, PlatformString, settings_manager
+from . import project_plan, project, input_file, readiness, process_runner, build_daemon
+from .. import log, commands, tools, perf_timer, cache_server
+from .._utils import system, shared_globals, thread_pool, terminfo, ordered_set, FormatTime, queue, dag, MultiBreak, PlatformString, settings_manager, task_history, artifact_cache, daemon_client
 from .._utils.decorators import TypeChecked
+from .._utils.reraise import Reraise
 from .._utils.string_abc import String
 
+if sys.version_info >= (3, 5):
+	from . import async_runner
+else:
+	async_runner = None
+
 if sys.version_info[0] >= 3:
 	_typeType = type
 	_classType = type
@@ -63,50 +71,373 @@ class _dummy(object):
 
 _runningBuilds = 0
 
-def _canRun(tool):
-	return tool.maxParallel <= 0 or tool.curParallel < tool.maxParallel
+# Maps each project to the projects that depend on it, used to estimate critical paths across projects
+_dependentProjects = {}
+# Memoized critical path estimates keyed by (project, tool)
+_criticalPathMemo = {}
+# Index of pending inputs and waiting tools for the current build
+_readiness = None
+# Memoized results of the pre-build dependency check, keyed by (project, dependency extension)
+_preBuildDependencyMemo = {}
+# Checks deferred until the end of the current batch of completions, when batching completions
+_completionBatch = None
+# Event loop running the coroutines of tools with RunAsync or RunGroupAsync, if any are in the build
+_asyncRunner = None
+# Inputs waiting to be passed to RunBatch, keyed by (project, tool)
+_pendingBatches = {}
+# Worker processes running the tools with runInProcess set, if any are in the build
+_processRunner = None
+# Inputs the dependency analysis found to be up to date before any tasks were enqueued, keyed by
+# (project, input, tool), with the digest of each tool's command signature for the input
+_upToDateInputs = {}
+# Outputs that were built this run but came out byte-identical to the last time they were built
+_unchangedOutputs = set()
+# Outputs that were built this run and changed, but whose interface to other projects is the same as the last time
+_unchangedInterfaces = set()
+
+def _getLane(tool):
+	"""
+	Get the thread pool lane a tool's tasks should be added to
+
+	:param tool: The tool
+	:type tool: type
+	:return: The lane for tools with a maxParallel value, otherwise None
+	:rtype: type or None
+	"""
+	if tool.maxParallel <= 0:
+		return None
+	return tool
+
+def _estimateToolCost(tool):
+	"""
+	Estimate the cost of a single task executed by a tool, based on how long its tasks have taken in previous builds.
+	Tools with no history are assumed to take one second.
+
+	:param tool: The tool
+	:type tool: type
+	:return: The estimated cost
+	:rtype: float
+	"""
+	average = shared_globals.taskHistory.GetToolAverage(tool.__name__)
+	if average is None:
+		return 1.0
+	return average
+
+def _getHistoryInputKey(buildInput):
+	"""
+	Get the key used to identify a task's input in the task history.
+
+	:param buildInput: The input for a task - an input file, a group of inputs, or None
+	:type buildInput: input_file.InputFile or ordered_set.OrderedSet or None
+	:return: The input's filename for single-input tasks, None for group and null-input tasks
+	:rtype: str or None
+	"""
+	if isinstance(buildInput, input_file.InputFile):
+		return buildInput.filename
+	return None
+
+def _getInputSize(buildInput):
+	"""
+	Get the total size of a task's inputs, as recorded in the task history.
+
+	:param buildInput: The input for a task - an input file, a group of inputs, or None
+	:type buildInput: input_file.InputFile or ordered_set.OrderedSet or None
+	:return: Size in bytes
+	:rtype: int
+	"""
+	if buildInput is None:
+		return 0
+	if isinstance(buildInput, input_file.InputFile):
+		buildInput = (buildInput,)
+	size = 0
+	for inputFile in buildInput:
+		try:
+			size += os.path.getsize(inputFile.filename)
+		except OSError:
+			pass
+	return size
+
+class _remainingWork(object):
+	"""
+	Running totals of the estimated duration of all enqueued tasks that haven't finished yet, used for the ETA
+	display. Updated from worker threads when tasks finish, so access is guarded by the lock.
+	"""
+	lock = threading.Lock()
+	seconds = 0.0
+	unestimatedTasks = 0
+	numThreads = 1
+
+def _updateTimeRemaining():
+	if _remainingWork.unestimatedTasks:
+		shared_globals.estimatedTimeRemaining = None
+	else:
+		shared_globals.estimatedTimeRemaining = _remainingWork.seconds / _remainingWork.numThreads
+
+def _addRemainingWork(estimate):
+	#pylint: disable=not-context-manager
+	with _remainingWork.lock:
+		if estimate is None:
+			_remainingWork.unestimatedTasks += 1
+		else:
+			_remainingWork.seconds += estimate
+		_updateTimeRemaining()
+
+def _releaseRemainingWork(estimate):
+	#pylint: disable=not-context-manager
+	with _remainingWork.lock:
+		if estimate is None:
+			_remainingWork.unestimatedTasks -= 1
+		else:
+			_remainingWork.seconds = max(0.0, _remainingWork.seconds - estimate)
+		_updateTimeRemaining()
+
+def _estimateCriticalPath(buildProject, tool, visiting=None):
+	"""
+	Estimate the remaining critical path of a task: its own cost plus the longest chain of downstream tools that
+	consume its outputs, both within its own project and in the projects that depend on it.
+
+	:param buildProject: Project the task belongs to
+	:type buildProject: project.Project
+	:param tool: Tool executing the task
+	:type tool: type
+	:param visiting: (project, tool) pairs currently being evaluated, used to break cycles
+	:type visiting: set
+	:return: The estimated critical path length
+	:rtype: float
+	"""
+	key = (buildProject, tool)
+	if key in _criticalPathMemo:
+		return _criticalPathMemo[key]
+
+	if visiting is None:
+		visiting = set()
+	if key in visiting:
+		# Tools that (indirectly) consume their own outputs would otherwise recurse forever.
+		return 0.0
+	visiting.add(key)
+
+	longestDownstream = 0.0
+	for nextTool in buildProject.toolchain.GetAllTools():
+		if nextTool is tool:
+			continue
+		consumed = nextTool.inputGroups if nextTool.inputFiles is None else nextTool.inputFiles | nextTool.inputGroups
+		if consumed & tool.outputFiles:
+			longestDownstream = max(longestDownstream, _estimateCriticalPath(buildProject, nextTool, visiting))
+
+	for dependentProject in _dependentProjects.get(buildProject, ()):
+		for nextTool in dependentProject.toolchain.GetAllTools():
+			if (nextTool.crossProjectDependencies | nextTool.crossProjectInputGroups) & tool.outputFiles:
+				longestDownstream = max(longestDownstream, _estimateCriticalPath(dependentProject, nextTool, visiting))
+
+	visiting.discard(key)
+	ret = _estimateToolCost(tool) + longestDownstream
+	_criticalPathMemo[key] = ret
+	return ret
+
+def _getTaskPriority(buildProject, tool):
+	"""
+	Get the priority of a task in the thread pool. In critical path mode, tasks with the longest estimated remaining
+	critical path are run first, with the project's priority used to break ties.
+
+	:param buildProject: Project the task belongs to
+	:type buildProject: project.Project
+	:param tool: Tool executing the task
+	:type tool: type
+	:return: Priority for ThreadPool.AddTask
+	:rtype: tuple
+	"""
+	if shared_globals.schedulingMode != shared_globals.SchedulingMode.CriticalPath:
+		return 0
+	return _estimateCriticalPath(buildProject, tool), buildProject.priority
+
+def _analyzeDependencies(projectBuildList, numThreads):
+	"""
+	Check which of the inputs every project starts with are up to date, all at once and in parallel, before anything
+	is enqueued. Inputs that are up to date can then go straight to their previous results instead of each taking a
+	trip through the thread pool just to find that out.
+
+	:param projectBuildList: List of projects
+	:type projectBuildList: list[project.Project]
+	:param numThreads: Number of threads to check with
+	:type numThreads: int
+	"""
+	_upToDateInputs.clear()
+	if shared_globals.runMode == shared_globals.RunMode.GenerateSolution:
+		return
+
+	with perf_timer.PerfTimer("Dependency analysis"):
+		toCheck = []
+		for buildProject in projectBuildList:
+			for extension, fileList in buildProject.inputFiles.items():
+				toolList = buildProject.toolchain.GetToolsFor(extension)
+				if not toolList:
+					continue
+				for inputFile in fileList:
+					if buildProject.GetLastResult(inputFile) is not None:
+						toCheck.append((buildProject, inputFile, toolList))
+
+		if not toCheck:
+			return
+
+		def _check(item):
+			buildProject, inputFile, toolList = item
+			checker, fileList = _getChecker(buildProject, inputFile)
+			ret = {}
+			try:
+				if recompile.ShouldRecompile(buildProject, checker, fileList):
+					return ret
+				for tool in toolList:
+					signature = _getSignature(tool, buildProject.toolchain, buildProject, inputFile)
+					if not _signatureChanged(tool, buildProject, inputFile, signature):
+						ret[(buildProject, inputFile, tool)] = signature
+			except Exception: #pylint: disable=broad-except
+				# Leave it to the task to check again, so it fails the way it would have without the analysis
+				pass
+			return ret
+
+		pool = multiprocessing.pool.ThreadPool(max(numThreads, 1))
+		try:
+			results = pool.map(_check, toCheck)
+		finally:
+			pool.close()
+			pool.join()
+
+		for result in results:
+			_upToDateInputs.update(result)
+		log.Info("Dependency analysis found {} of {} inputs up to date", sum(1 for result in results if result), len(toCheck))
+
+def _getAnalyzedResult(buildProject, tool, buildInput, doCompileCheck):
+	"""
+	Get the previous result of an input the dependency analysis found to be up to date
+
+	:type buildProject: project.Project
+	:return: The previous result, or None if the input needs to be checked by its task
+	:rtype: tuple or None
+	"""
+	key = (buildProject, buildInput, tool)
+	if not doCompileCheck or key not in _upToDateInputs:
+		return None
+	if _needsCrossProjectRebuild(tool, buildProject):
+		return None
+	_recordSignature(tool, buildProject, buildInput, _upToDateInputs[key])
+	return tuple(buildProject.GetLastResult(buildInput))
 
 def _enqueueBuild(buildProject, tool, buildInput, pool, projectList, projectsWithCrossProjectDeps, inputExtension, doCompileCheck=False):
 	with perf_timer.PerfTimer("Enqueuing build tasks"):
 		global _runningBuilds
 		_runningBuilds += 1
-		tool.curParallel += 1
 		shared_globals.totalBuilds += 1
-		log.UpdateProgressBar()
 
 		buildProject.toolchain.CreateReachability(tool)
 
+		previousResult = None
+		if isinstance(buildInput, input_file.InputFile):
+			previousResult = _getAnalyzedResult(buildProject, tool, buildInput, doCompileCheck)
+
+		if previousResult is None:
+			log.UpdateProgressBar()
+			priority = _getTaskPriority(buildProject, tool)
+			estimate = shared_globals.taskHistory.Estimate(repr(buildProject), tool.__name__, _getHistoryInputKey(buildInput))
+			_addRemainingWork(estimate)
+
 		if tool.exclusive:
 			try:
 				buildProject.inputFiles[inputExtension].remove(buildInput)
 			except KeyError:
 				#Wasn't in there so nothing to remove.
 				pass
+			else:
+				_readiness.RemoveInput(buildProject, inputExtension, buildInput)
+				if not buildProject.inputFiles[inputExtension]:
+					_preBuildDependencyMemo.clear()
 
 		if buildInput is None:
 			buildProject.toolchain.DeactivateTool(tool)
 			log.Info("Enqueuing null-input build for {} for project {}", tool.__name__, buildProject)
-			pool.AddTask(
-				(_logThenRun, tool.Run, tool, buildProject.toolchain, buildProject, None, doCompileCheck),
+			_addBuildTask(
+				pool, priority, estimate, tool.Run, tool.RunAsync, tool, buildProject, None, doCompileCheck,
 				(_buildFinished, pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, None, None)
 			)
 		elif isinstance(buildInput, input_file.InputFile):
 			buildInput.AddUsedTool(tool)
+			_readiness.MarkUsed(buildInput, tool)
+			if previousResult is not None:
+				log.Info("{} is up to date for {} for project {}", buildInput, tool.__name__, buildProject)
+				pool.callbackQueue.Put(functools.partial(
+					_buildFinished, pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, inputExtension,
+					[buildInput], previousResult, True
+				))
+				return
+			if _usesBatches(tool):
+				log.Info("Adding {} to the next batch for {} for project {}", buildInput, tool.__name__, buildProject)
+				_addToBatch(
+					pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, buildInput, inputExtension,
+					doCompileCheck, estimate, priority
+				)
+				return
 			log.Info("Enqueuing build for {} using {} for project {}", buildInput, tool.__name__, buildProject)
-			pool.AddTask(
-				(_logThenRun, tool.Run, tool, buildProject.toolchain, buildProject, buildInput, doCompileCheck),
+			_addBuildTask(
+				pool, priority, estimate, tool.Run, tool.RunAsync, tool, buildProject, buildInput, doCompileCheck,
 				(_buildFinished, pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, inputExtension, [buildInput])
 			)
 		else:
 			for inputFile in buildInput:
 				inputFile.AddUsedTool(tool)
+				_readiness.MarkUsed(inputFile, tool)
 
 			log.Info("Enqueuing multi-build task for {} using {} for project {}", buildProject, buildInput, tool.__name__, buildProject)
-			pool.AddTask(
-				(_logThenRun, tool.RunGroup, tool, buildProject.toolchain, buildProject, buildInput, doCompileCheck),
+			_addBuildTask(
+				pool, priority, estimate, tool.RunGroup, tool.RunGroupAsync, tool, buildProject, buildInput, doCompileCheck,
 				(_buildFinished, pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, None, buildInput)
 			)
 
+def _addBuildTask(pool, priority, estimate, function, asyncFunction, tool, buildProject, buildInput, doCompileCheck, callback):
+	"""
+	Add a task to the thread pool that runs a tool, either synchronously, or by starting its coroutine if it has one.
+
+	:param pool: thread pool
+	:type pool: thread_pool.ThreadPool
+	:param priority: Priority for ThreadPool.AddTask
+	:type priority: numbers.Number or tuple
+	:param estimate: Estimated duration of the task
+	:type estimate: float or None
+	:param function: The tool's Run or RunGroup
+	:type function: Callable
+	:param asyncFunction: The tool's RunAsync or RunGroupAsync, or None if it doesn't have one
+	:type asyncFunction: Callable or None
+	:param tool: The tool
+	:type tool: type
+	:param buildProject: The project
+	:type buildProject: project.Project
+	:param buildInput: The input or inputs, or None for a null-input build
+	:type buildInput: input_file.InputFile or ordered_set.OrderedSet or None
+	:param doCompileCheck: Whether to check if the inputs need to be recompiled
+	:type doCompileCheck: bool
+	:param callback: Callback to call with the task's result
+	:type callback: tuple
+	"""
+	if asyncFunction is not None and _asyncRunner is not None:
+		# The pool task only checks whether there's anything to do and starts the coroutine. The callback is sent
+		# once the coroutine finishes, and maxParallel is enforced on the event loop rather than with a lane.
+		pool.AddTask(
+			(
+				_startAsyncTask, estimate, asyncFunction, tool, buildProject.toolchain, buildProject, buildInput,
+				doCompileCheck, pool.callbackQueue, functools.partial(*callback)
+			),
+			None,
+			priority=priority
+		)
+	else:
+		if tool.runInProcess and _processRunner is not None:
+			# The thread waits for the worker process, so the rest of the bookkeeping happens on it as usual
+			function = functools.partial(_processRunner.Run, tool)
+		pool.AddTask(
+			(_runTask, estimate, function, tool, buildProject.toolchain, buildProject, buildInput, doCompileCheck),
+			callback,
+			priority=priority,
+			lane=_getLane(tool)
+		)
+
 def _dependenciesMet(buildProject, tool):
 	with perf_timer.PerfTimer("Dependency checks"):
 		log.Info("Checking if we can enqueue a new build for tool {} for project {}", tool.__name__, buildProject)
@@ -134,7 +465,7 @@ def _getGroupInputFiles(buildProject, tool):
 						log.Info("Extension {} is still active in dependent project, can't build yet.", inputFile)
 						return None
 				log.Info("{} is ok to build.", inputFile)
-				fileList.update([x for x in buildProject.inputFiles.get(inputFile, []) if not x.WasToolUsed(tool)])
+				fileList.update(_readiness.GetPending(buildProject, tool, inputFile))
 				for dep in buildProject.dependencies:
 					fileList.update(dep.inputFiles.get(inputFile, []))
 		else:
@@ -144,58 +475,424 @@ def _getGroupInputFiles(buildProject, tool):
 					log.Info("Extension {} is still active, can't build yet.", inputFile)
 					return None
 				log.Info("{} is ok to build.", inputFile)
-				fileList.update([x for x in buildProject.inputFiles.get(inputFile, []) if not x.WasToolUsed(tool)])
+				fileList.update(_readiness.GetPending(buildProject, tool, inputFile))
 		return fileList
 
+def _canCreateDependency(checkProject, dependency):
+	key = (checkProject, dependency)
+	ret = _preBuildDependencyMemo.get(key)
+	if ret is not None:
+		return ret
+
+	ret = False
+	for checkTool in checkProject.toolchain.GetAllTools():
+		if checkTool.inputFiles is None:
+			extensionSet = checkTool.inputGroups | checkTool.crossProjectInputGroups
+		else:
+			extensionSet = checkTool.inputFiles | checkTool.inputGroups | checkTool.crossProjectInputGroups
+		hasExtension = False
+		for dependentExtension in extensionSet:
+			if checkProject.inputFiles.get(dependentExtension):
+				hasExtension = True
+				break
+		if hasExtension and checkProject.toolchain.CanCreateOutput(checkTool, dependency):
+			ret = True
+			break
+
+	_preBuildDependencyMemo[key] = ret
+	return ret
+
 def _checkDependenciesPreBuild(checkProject, tool, dependencies):
 	with perf_timer.PerfTimer("Dependency checks"):
 		log.Info("Checking if we can enqueue a new build for tool {} for project {}", checkProject, tool.__name__, checkProject)
 		for dependency in dependencies:
-			for checkTool in checkProject.toolchain.GetAllTools():
-				if checkTool.inputFiles is None:
-					extensionSet = checkTool.inputGroups | checkTool.crossProjectInputGroups
-				else:
-					extensionSet = checkTool.inputFiles | checkTool.inputGroups | checkTool.crossProjectInputGroups
-				hasExtension = False
-				for dependentExtension in extensionSet:
-					if checkProject.inputFiles.get(dependentExtension):
-						hasExtension = True
-						break
-				if hasExtension and checkProject.toolchain.CanCreateOutput(checkTool, dependency):
-					return False
+			if _canCreateDependency(checkProject, dependency):
+				return False
 		return True
 
-def _logThenRun(function, buildTool, buildToolchain, buildProject, inputFiles, doCompileCheck):
+def _tryEnqueueTool(buildProject, tool, pool, projectList, projectsWithCrossProjectDeps):
+	"""
+	Enqueue whatever work a tool has available in a project, if its dependencies have been met.
+
+	:param buildProject: The project
+	:type buildProject: project.Project
+	:param tool: The tool
+	:type tool: type
+	:param pool: thread pool
+	:type pool: thread_pool.ThreadPool
+	:param projectList: list of all projects
+	:type projectList: list[project.Project]
+	:param projectsWithCrossProjectDeps: List of projects that contain cross-project dependencies
+	:type projectsWithCrossProjectDeps: list[project.Project]
+	"""
+	if not buildProject.toolchain.IsToolActive(tool):
+		return
+
+	if not _dependenciesMet(buildProject, tool):
+		return
+
+	if tool.inputFiles is None:
+		_enqueueBuild(buildProject, tool, None, pool, projectList, projectsWithCrossProjectDeps, None)
+	else:
+		for ext in tool.inputFiles:
+			with perf_timer.PerfTimer("Enqueuing single-input builds"):
+				for projectInput in _readiness.GetPending(buildProject, tool, ext):
+					_enqueueBuild(buildProject, tool, projectInput, pool, projectList, projectsWithCrossProjectDeps, ext)
+
+	if not tool.inputGroups and not tool.crossProjectInputGroups:
+		return
+
+	# Check for group inputs that have been freed and queue up if all are free
+	fileList = _getGroupInputFiles(buildProject, tool)
+
+	if not fileList:
+		return
+
+	_enqueueBuild(buildProject, tool, fileList, pool, projectList, projectsWithCrossProjectDeps, None)
+
+def _runTask(estimate, function, buildTool, buildToolchain, buildProject, inputFiles, doCompileCheck):
+	try:
+		return _logThenRun(function, buildTool, buildToolchain, buildProject, inputFiles, doCompileCheck)
+	finally:
+		_releaseRemainingWork(estimate)
+
+def _usesBatches(tool):
+	if tool.RunBatch is None:
+		return False
+	# A tool with a coroutine runs that instead when it can
+	return tool.RunAsync is None or _asyncRunner is None
+
+class _PendingBatch(object):
+	"""
+	Inputs collected for a single RunBatch() call
+
+	:param priority: Priority for ThreadPool.AddTask
+	:type priority: numbers.Number or tuple
+	"""
+	def __init__(self, priority):
+		self.priority = priority
+		# (input, input extension, doCompileCheck, estimate) for each input
+		self.entries = []
+
+def _addToBatch(pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, buildInput, inputExtension, doCompileCheck, estimate, priority):
+	"""
+	Add an input to the pending batch for a tool, starting the batch if it's full or scheduling it to start once the
+	tool's batch window has passed if it's the batch's first input.
+
+	:type buildProject: project.Project
+	"""
+	key = (buildProject, tool)
+	batch = _pendingBatches.get(key)
+	if batch is None:
+		batch = _PendingBatch(priority)
+		_pendingBatches[key] = batch
+		flush = functools.partial(_flushBatch, pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, batch)
+		if tool.batchWindow > 0:
+			timer = threading.Timer(tool.batchWindow, pool.callbackQueue.Put, (flush,))
+			timer.daemon = True
+			timer.start()
+		else:
+			# Anything else that becomes ready while handling the current callback will join the batch before this runs
+			pool.callbackQueue.Put(flush)
+
+	batch.entries.append((buildInput, inputExtension, doCompileCheck, estimate))
+	if tool.maxBatchSize > 0 and len(batch.entries) >= tool.maxBatchSize:
+		_flushBatch(pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, batch)
+
+def _flushBatch(pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, batch):
+	"""
+	Start a pending batch, if it hasn't been started already
+
+	:type buildProject: project.Project
+	:type batch: _PendingBatch
+	"""
+	key = (buildProject, tool)
+	if _pendingBatches.get(key) is not batch:
+		return
+	del _pendingBatches[key]
+
+	global _runningBuilds
+	# Each input was counted as a running build so the build couldn't finish while they were pending, but the batch
+	# is a single task as far as the thread pool (and its failure handling) is concerned.
+	_runningBuilds -= len(batch.entries) - 1
+
+	log.Info("Enqueuing batch of {} inputs using {} for project {}", len(batch.entries), tool.__name__, buildProject)
+	pool.AddTask(
+		(_runBatchTask, tool, buildProject.toolchain, buildProject, batch.entries),
+		(_batchFinished, pool, projectList, projectsWithCrossProjectDeps, buildProject, tool, batch.entries),
+		priority=batch.priority,
+		lane=_getLane(tool)
+	)
+
+def _runBatchTask(buildTool, buildToolchain, buildProject, entries):
+	"""
+	Run a batch, passing whichever of its inputs aren't up to date to the tool's RunBatch()
+
+	:type buildProject: project.Project
+	:return: Output files and whether they were up to date, for each input
+	:rtype: list[tuple]
+	"""
+	try:
+		results = [None] * len(entries)
+		signatures = [None] * len(entries)
+		toBuild = []
+		for i, (inputFile, _, doCompileCheck, _) in enumerate(entries):
+			signatures[i] = _getSignature(buildTool, buildToolchain, buildProject, inputFile)
+			results[i] = _getPreviousResult(buildTool, buildProject, inputFile, doCompileCheck, signatures[i])
+			if results[i] is None:
+				toBuild.append(i)
+
+		if not toBuild:
+			return results
+
+		with perf_timer.PerfTimer("Tool execution"):
+			inputFiles = [entries[i][0] for i in toBuild]
+			log.Info("Processing batch {} with {} for project {}", inputFiles, buildTool.__name__, buildProject)
+
+			succeeded = False
+			startTime = time.time()
+			try:
+				with buildToolchain.Use(buildTool):
+					outputs = buildTool.RunBatch(buildToolchain, buildProject, inputFiles)
+				if len(outputs) != len(inputFiles):
+					raise ValueError(
+						"{}.RunBatch() returned {} results for {} inputs".format(buildTool.__name__, len(outputs), len(inputFiles))
+					)
+				succeeded = True
+			finally:
+				# There's no way to know how the time was split between the inputs, so split it evenly.
+				duration = (time.time() - startTime) / len(inputFiles)
+				for inputFile in inputFiles:
+					shared_globals.taskHistory.Record(
+						repr(buildProject),
+						buildTool.__name__,
+						_getHistoryInputKey(inputFile),
+						duration,
+						succeeded,
+						_getInputSize(inputFile)
+					)
+
+		for i, outputFiles in zip(toBuild, outputs):
+			results[i] = (outputFiles, False)
+			_checkForUnchangedOutputs(buildTool, buildToolchain, buildProject, outputFiles)
+			_updateRecompileBaseline(buildProject, entries[i][0], entries[i][2])
+			_recordSignature(buildTool, buildProject, entries[i][0], signatures[i])
+		return results
+	finally:
+		for _, _, _, estimate in entries:
+			_releaseRemainingWork(estimate)
+
+def _batchFinished(pool, projectList, projectsWithCrossProjectDeps, buildProject, toolUsed, entries, results):
+	"""
+	Batch has finished, finish each of its inputs as if it had been built individually.
+
+	:type buildProject: project.Project
+	"""
+	global _runningBuilds
+	_runningBuilds += len(entries) - 1
+	for (inputFile, inputExtension, _, _), (outputFiles, upToDate) in zip(entries, results):
+		_buildFinished(pool, projectList, projectsWithCrossProjectDeps, buildProject, toolUsed, inputExtension, [inputFile], outputFiles, upToDate)
+
+def _startAsyncTask(estimate, function, buildTool, buildToolchain, buildProject, inputFiles, doCompileCheck, callbackQueue, callback):
+	"""
+	Check whether a task for a tool with a coroutine needs to run, and start its coroutine on the event loop if so.
+	When the coroutine finishes, the rest of the task and then the callback are put into the callback queue.
+
+	:type buildProject: project.Project
+	"""
+	try:
+		signature = _getSignature(buildTool, buildToolchain, buildProject, inputFiles)
+		ret = _getPreviousResult(buildTool, buildProject, inputFiles, doCompileCheck, signature)
+		if ret is not None:
+			_releaseRemainingWork(estimate)
+			callbackQueue.Put(functools.partial(callback, *ret))
+			return
+
+		log.Info("Processing {} with {} for project {}", "null-input build" if inputFiles is None else inputFiles, buildTool.__name__, buildProject)
+		inputSize = _getInputSize(inputFiles)
+		startTime = time.time()
+		with buildToolchain.Use(buildTool):
+			coroutine = function(buildToolchain, buildProject, inputFiles)
+	except:
+		_releaseRemainingWork(estimate)
+		raise
+
+	def _onDone(result, excInfo):
+		# This runs on the event loop, so it only records how the coroutine went. The rest can block on files,
+		# subprocesses and the hash pool, which would hold up every other coroutine. It isn't given to the thread
+		# pool, which stops taking tasks once one fails, since what finished coroutines built still has to be recorded.
+		shared_globals.taskHistory.Record(
+			repr(buildProject),
+			buildTool.__name__,
+			_getHistoryInputKey(inputFiles),
+			time.time() - startTime,
+			excInfo is None,
+			inputSize
+		)
+		callbackQueue.Put(functools.partial(
+			_finishAsyncTask, estimate, buildTool, buildToolchain, buildProject, inputFiles, doCompileCheck, signature,
+			result, excInfo, callback
+		))
+
+	_asyncRunner.Submit(coroutine, buildToolchain, buildTool, _onDone)
+
+def _finishAsyncTask(estimate, buildTool, buildToolchain, buildProject, inputFiles, doCompileCheck, signature, result, excInfo, callback):
+	"""
+	Do the bookkeeping for a task whose coroutine has finished, the same as _logThenRun() does after running a tool,
+	then call the task's callback
+
+	:type buildProject: project.Project
+	"""
+	if excInfo is None:
+		try:
+			_checkForUnchangedOutputs(buildTool, buildToolchain, buildProject, result)
+			_updateRecompileBaseline(buildProject, inputFiles, doCompileCheck)
+			_recordSignature(buildTool, buildProject, inputFiles, signature)
+		except:
+			excInfo = sys.exc_info()
+	_releaseRemainingWork(estimate)
+	if excInfo is not None:
+		# Raised the same way as exceptions from the thread pool, so the build loop handles both the same way
+		Reraise(thread_pool.ThreadedTaskException(excInfo[1], excInfo[2]), excInfo[2])
+	callback(result, False)
+
+def _getChecker(buildProject, inputFiles):
 	"""
+	Get the compile checker for a task's inputs
+
+	:type buildProject: project.Project
+	:return: The checker and the inputs as a set
+	:rtype: tuple[csbuild.toolchain.CompileChecker, ordered_set.OrderedSet]
+	"""
+	if isinstance(inputFiles, ordered_set.OrderedSet):
+		extension = os.path.splitext(list(inputFiles)[0].filename)[1]
+		fileList = inputFiles
+	else:
+		extension = os.path.splitext(inputFiles.filename)[1]
+		fileList = ordered_set.OrderedSet([inputFiles])
+	return buildProject.toolchain.GetChecker(extension), fileList
+
+def _updateRecompileBaseline(buildProject, inputFiles, doCompileCheck):
+	"""
+	Let the compile checker record whatever it needs to about inputs that were just built successfully
+
 	:type buildProject: project.Project
 	"""
+	if inputFiles is None or not doCompileCheck or shared_globals.runMode == shared_globals.RunMode.GenerateSolution:
+		return
+	with perf_timer.PerfTimer("Recompile checks"):
+		checker, fileList = _getChecker(buildProject, inputFiles)
+		recompile.UpdateBaseline(buildProject, checker, fileList)
+
+def _checkForUnchangedOutputs(buildTool, buildToolchain, buildProject, outputFiles):
+	"""
+	Compare the contents of the outputs a tool just wrote with what they were the last time they were built.
+	Outputs that came out the same are added to _unchangedOutputs, so anything that uses them can treat them
+	as up to date instead of running again. Outputs that changed but whose interface didn't, according to the
+	tool's GetOutputInterface(), are added to _unchangedInterfaces, so other projects don't build again because of them.
+
+	:type buildProject: project.Project
+	:param outputFiles: Outputs returned by the tool
+	:type outputFiles: tuple[str] or str
+	"""
+	if shared_globals.runMode == shared_globals.RunMode.GenerateSolution:
+		return
+	if not isinstance(outputFiles, tuple):
+		outputFiles = (outputFiles, )
+	with perf_timer.PerfTimer("Output digests"):
+		for outputFile in outputFiles:
+			digest = recompile.GetOutputDigest(outputFile)
+			if digest is None:
+				continue
+			if not buildProject.UpdateOutputDigest(outputFile, digest):
+				log.Info("{} is unchanged from the last build", outputFile)
+				_unchangedOutputs.add(outputFile)
+			elif buildTool.GetOutputInterface is not None:
+				with buildToolchain.Use(buildTool):
+					interface = buildTool.GetOutputInterface(buildToolchain, buildProject, outputFile)
+				interfaceDigest = recompile.GetSignatureDigest(interface)
+				if interfaceDigest is not None and not buildProject.UpdateInterfaceDigest(outputFile, interfaceDigest):
+					log.Info("{} has changed, but its interface is unchanged from the last build", outputFile)
+					_unchangedInterfaces.add(outputFile)
+
+def _needsCrossProjectRebuild(buildTool, buildProject):
+	"""
+	Check whether any of the projects a project depends on built anything the tool depends on this run
+
+	:type buildProject: project.Project
+	:rtype: bool
+	"""
+	for dep in buildTool.crossProjectDependencies:
+		log.Info("Checking cross-project dependency '{}'", dep)
+		for otherProj in buildProject.dependencies:
+			log.Info("Checking up-stream project {}, which has built files of type {} this run", otherProj.name, otherProj.builtThisRun.keys())
+			if dep in otherProj.builtThisRun:
+				log.Info("Found a cross-project recompile trigger, recompiling")
+				return True
+	return False
+
+def _getSignature(buildTool, buildToolchain, buildProject, inputFiles):
+	"""
+	Get the digest of the command signature a tool would build the given inputs with
+
+	:type buildProject: project.Project
+	:return: The digest, or None if the tool doesn't provide a signature
+	:rtype: str or None
+	"""
+	if buildTool.GetCommandSignature is None or inputFiles is None \
+			or shared_globals.runMode == shared_globals.RunMode.GenerateSolution:
+		return None
+	with perf_timer.PerfTimer("Command signatures"):
+		with buildToolchain.Use(buildTool):
+			signature = buildTool.GetCommandSignature(buildToolchain, buildProject, inputFiles)
+		return recompile.GetSignatureDigest(signature)
+
+def _signatureChanged(buildTool, buildProject, inputFiles, signature):
+	"""
+	Check whether a tool's command signature for the given inputs is different from the last time it built them.
+	Inputs with no recorded signature are assumed not to have changed.
+
+	:type buildProject: project.Project
+	:rtype: bool
+	"""
+	if signature is None:
+		return False
+	lastSignature = buildProject.GetLastSignature(inputFiles, buildTool.__name__)
+	if lastSignature is not None and lastSignature != signature:
+		log.Info("Command signature for {} using {} has changed, recompiling", inputFiles, buildTool.__name__)
+		return True
+	return False
+
+def _recordSignature(buildTool, buildProject, inputFiles, signature):
+	"""
+	Record the command signature the given inputs were built with, or found up to date with
+
+	:type buildProject: project.Project
+	"""
+	if signature is not None:
+		buildProject.AddSignature(inputFiles, buildTool.__name__, signature)
+
+def _getPreviousResult(buildTool, buildProject, inputFiles, doCompileCheck, signature):
+	"""
+	Get the result of the last build of the given inputs, if there's no need to build them again.
+
+	:type buildProject: project.Project
+	:return: The previous result and True, or None if the inputs need to be built
+	:rtype: tuple or None
+	"""
 	if inputFiles is not None:
-		forceRebuild = False
 		log.Info("Checking whether to recompile {} for tool {} with cross-project dependencies {}", inputFiles, buildTool.__name__, buildTool.crossProjectDependencies)
-		for dep in buildTool.crossProjectDependencies:
-			log.Info("Checking cross-project dependency '{}'", dep)
-			for otherProj in buildProject.dependencies:
-				log.Info("Checking up-stream project {}, which has built files of type {} this run", otherProj.name, otherProj.builtThisRun.keys())
-				if dep in otherProj.builtThisRun:
-					log.Info("Found a cross-project recompile trigger, recompiling")
-					forceRebuild = True
-					break
-			if forceRebuild:
-				break
-		if not forceRebuild:
+		if not _needsCrossProjectRebuild(buildTool, buildProject) \
+				and not _signatureChanged(buildTool, buildProject, inputFiles, signature):
 			if doCompileCheck:
 				with perf_timer.PerfTimer("Recompile checks"):
-					if isinstance(inputFiles, ordered_set.OrderedSet):
-						extension = os.path.splitext(list(inputFiles)[0].filename)[1]
-						fileList = inputFiles
-					else:
-						extension = os.path.splitext(inputFiles.filename)[1]
-						fileList = ordered_set.OrderedSet([inputFiles])
+					checker, fileList = _getChecker(buildProject, inputFiles)
 
 					lastResult = buildProject.GetLastResult(inputFiles)
 					if lastResult is not None \
-							and not recompile.ShouldRecompile(buildProject, buildProject.toolchain.GetChecker(extension), fileList):
+							and not recompile.ShouldRecompile(buildProject, checker, fileList):
 						log.Info("Previous result exists and input has not changed. Returning previous result.")
+						_recordSignature(buildTool, buildProject, inputFiles, signature)
 						return tuple(lastResult), True
 			else:
 				if isinstance(inputFiles, ordered_set.OrderedSet):
@@ -208,14 +905,42 @@ def _logThenRun(function, buildTool, buildToolchain, buildProject, inputFiles, d
 					filesNeedingBuild = [f for f in fileList if not f.upToDate]
 					if not filesNeedingBuild:
 						log.Info("Previous result exists and input has not changed. Returning previous result.")
+						_recordSignature(buildTool, buildProject, inputFiles, signature)
 						return tuple(lastResult), True
+	return None
 
+def _logThenRun(function, buildTool, buildToolchain, buildProject, inputFiles, doCompileCheck):
+	"""
+	:type buildProject: project.Project
+	"""
+	signature = _getSignature(buildTool, buildToolchain, buildProject, inputFiles)
+	ret = _getPreviousResult(buildTool, buildProject, inputFiles, doCompileCheck, signature)
+	if ret is not None:
+		return ret
 
 	with perf_timer.PerfTimer("Tool execution"):
 		log.Info("Processing {} with {} for project {}", "null-input build" if inputFiles is None else inputFiles, buildTool.__name__, buildProject)
 
-		with buildToolchain.Use(buildTool):
-			return function(buildToolchain, buildProject, inputFiles), False
+		inputSize = _getInputSize(inputFiles)
+		succeeded = False
+		startTime = time.time()
+		try:
+			with buildToolchain.Use(buildTool):
+				ret = function(buildToolchain, buildProject, inputFiles), False
+			succeeded = True
+			_checkForUnchangedOutputs(buildTool, buildToolchain, buildProject, ret[0])
+			_updateRecompileBaseline(buildProject, inputFiles, doCompileCheck)
+			_recordSignature(buildTool, buildProject, inputFiles, signature)
+			return ret
+		finally:
+			shared_globals.taskHistory.Record(
+				repr(buildProject),
+				buildTool.__name__,
+				_getHistoryInputKey(inputFiles),
+				time.time() - startTime,
+				succeeded,
+				inputSize
+			)
 
 @TypeChecked(
 	pool=thread_pool.ThreadPool,
@@ -252,7 +977,6 @@ def _buildFinished(pool, projectList, projectsWithCrossProjectDeps, buildProject
 	:type upToDate: bool
 	"""
 	with perf_timer.PerfTimer("Post-build processing"):
-		toolUsed.curParallel -= 1
 		global _runningBuilds
 		_runningBuilds -= 1
 		buildProject.toolchain.ReleaseReachability(toolUsed)
@@ -261,9 +985,7 @@ def _buildFinished(pool, projectList, projectsWithCrossProjectDeps, buildProject
 			if buildProject.toolchain.IsToolActive(toolUsed):
 				done = True
 
-				remainingInputs = [x for x in buildProject.inputFiles.get(inputExtension, []) if not x.WasToolUsed(toolUsed)]
-
-				if not remainingInputs:
+				if not _readiness.HasPending(buildProject, toolUsed, inputExtension):
 					# Technically this will happen before the tool is finished building, so we need the
 					# above guard to keep from doing it twice and tossing up exceptions.
 					# The important thing here is that this will stop us from doing a lot of logic further
@@ -297,7 +1019,7 @@ def _buildFinished(pool, projectList, projectsWithCrossProjectDeps, buildProject
 		if not isinstance(outputFiles, tuple):
 			outputFiles = (outputFiles, )
 
-		extensionsToCheck = set()
+		extensionsToCheck = ordered_set.OrderedSet()
 		for outputFile in outputFiles:
 			log.Info(
 				"Checking for new tasks created by {}",
@@ -308,16 +1030,22 @@ def _buildFinished(pool, projectList, projectsWithCrossProjectDeps, buildProject
 				buildProject.AddArtifact(inputFiles, outputFile)
 
 				outputExtension = os.path.splitext(outputFile)[1]
+				# Outputs that were rebuilt but came out the same are up to date as far as anything using them is concerned
+				outputUpToDate = upToDate or outputFile in _unchangedOutputs
 				if not upToDate:
+					shared_globals.statCache.Invalidate(outputFile)
+				# builtThisRun is only used to decide what to build again in other projects
+				if not outputUpToDate and outputFile not in _unchangedInterfaces:
 					buildProject.builtThisRun.setdefault(outputExtension, set()).add(outputFile)
 				extensionsToCheck.add(outputExtension)
 
 				if inputExtension == outputExtension:
-					newInput = input_file.InputFile(outputFile, inputFiles, upToDate=upToDate)
+					newInput = input_file.InputFile(outputFile, inputFiles, upToDate=outputUpToDate)
 				else:
-					newInput = input_file.InputFile(outputFile, upToDate=upToDate)
+					newInput = input_file.InputFile(outputFile, upToDate=outputUpToDate)
 
 				buildProject.inputFiles.setdefault(outputExtension, ordered_set.OrderedSet()).add(newInput)
+				_readiness.AddInput(buildProject, outputExtension, newInput)
 
 				# Enqueue this file immediately in any tools that take it as a single input, unless they're marked to delay.
 				toolList = buildProject.toolchain.GetToolsFor(outputExtension, newInput.toolsUsed)
@@ -325,95 +1053,27 @@ def _buildFinished(pool, projectList, projectsWithCrossProjectDeps, buildProject
 					if not buildProject.toolchain.IsToolActive(tool):
 						continue
 
-					if not _canRun(tool):
+					if newInput.WasToolUsed(tool):
 						continue
 
 					if not _dependenciesMet(buildProject, tool):
 						continue
 
-					if newInput.WasToolUsed(tool):
-						continue
-
 					_enqueueBuild(buildProject, tool, newInput, pool, projectList, projectsWithCrossProjectDeps, outputExtension)
 
-		for outputExtension in extensionsToCheck:
-			isActive = buildProject.toolchain.IsOutputActive(outputExtension)
-			log.Info("Checking if {} is still active... {}", outputExtension if outputExtension else "<no extension>", "yes" if isActive else "no")
-
-			# If this was the last file being built of its extension, check whether we can pass it and maybe others to relevant group input tools
-			if not isActive:
-				with perf_timer.PerfTimer("Checking for newly enabled tools"):
-					toolList = buildProject.toolchain.GetActiveTools()
-					for tool in toolList:
-						if not _canRun(tool):
-							continue
-
-						if not _dependenciesMet(buildProject, tool):
-							continue
-
-						if tool.inputFiles is None:
-							if not _canRun(tool):
-								continue
-
-							_enqueueBuild(buildProject, tool, None, pool, projectList, projectsWithCrossProjectDeps, None)
-						else:
-							for ext in tool.inputFiles:
-								with perf_timer.PerfTimer("Enqueuing single-input builds"):
-									for projectInput in [x for x in buildProject.inputFiles.get(ext, []) if not x.WasToolUsed(tool)]:
-										if not _canRun(tool):
-											break
-										_enqueueBuild(buildProject, tool, projectInput, pool, projectList, projectsWithCrossProjectDeps, ext)
-
-						if not tool.inputGroups and not tool.crossProjectInputGroups:
-							continue
-
-						# Check for group inputs that have been freed and queue up if all are free
-						fileList = _getGroupInputFiles(buildProject, tool)
-
-						if not fileList:
-							continue
-
-						_enqueueBuild(buildProject, tool, fileList, pool, projectList, projectsWithCrossProjectDeps, None)
-
-					# Check to see if we've freed up any pending builds in other projects as well
-					with perf_timer.PerfTimer("Cross-project dependency checks"):
-						for proj in projectsWithCrossProjectDeps:
-							toolList = proj.toolchain.GetActiveTools()
-							for tool in toolList:
-								if not _canRun(tool):
-									continue
-
-
-								if outputExtension not in tool.crossProjectDependencies and outputExtension not in tool.crossProjectInputGroups:
-									continue
-
-								if not _dependenciesMet(proj, tool):
-									continue
-
-								if tool.inputFiles is None:
-									if not _canRun(tool):
-										continue
-
-									_enqueueBuild(proj, tool, None, pool, projectList, projectsWithCrossProjectDeps, None)
-								else:
-									for ext in tool.inputFiles:
-										with perf_timer.PerfTimer("Enqueuing single-input builds"):
-											for projectInput in [x for x in proj.inputFiles.get(ext, []) if not x.WasToolUsed(tool)]:
-												if not _canRun(tool):
-													break
-												_enqueueBuild(proj, tool, projectInput, pool, projectList, projectsWithCrossProjectDeps, ext)
-
-								if not tool.inputGroups and not tool.crossProjectInputGroups:
-									continue
-
-								fileList = _getGroupInputFiles(proj, tool)
-
-								if not fileList:
-									continue
-
-								_enqueueBuild(proj, tool, fileList, pool, projectList, projectsWithCrossProjectDeps, None)
+		# Any extension reachable from the tool that just finished may have stopped being active, not just the ones it
+		# actually produced this time.
+		extensionsToCheck.update(_readiness.GetAffectedOutputs(buildProject, toolUsed))
+		if _completionBatch is not None:
+			_completionBatch.Defer(buildProject, extensionsToCheck)
+		else:
+			_checkNewlyEnabledTools(pool, projectList, projectsWithCrossProjectDeps, buildProject, extensionsToCheck)
 
-		shared_globals.completedBuilds += 1
+		if upToDate:
+			# Nothing was actually built, so it doesn't count toward the progress
+			shared_globals.totalBuilds -= 1
+		else:
+			shared_globals.completedBuilds += 1
 
 		if upToDate:
 			logFn = log.Info
@@ -426,14 +1086,112 @@ def _buildFinished(pool, projectList, projectsWithCrossProjectDeps, buildProject
 			[os.path.relpath(PlatformString(outputFile), mainFileDir).replace("\\", "/") for outputFile in outputFiles]
 				if isinstance(outputFiles, tuple) else os.path.relpath(outputFiles, mainFileDir).replace("\\", "/")
 		)
-		if shared_globals.verbosity > shared_globals.Verbosity.Verbose:
+		if shared_globals.verbosity > shared_globals.Verbosity.Verbose and _completionBatch is None:
 			log.UpdateProgressBar()
 
-		if _runningBuilds == 0:
-			# We have no builds running and finishing this build did not spawn a new one
-			# Time to exit.
-			pool.Stop()
+		if _completionBatch is None:
+			_stopIfFinished(pool, projectList, projectsWithCrossProjectDeps)
+
+def _checkNewlyEnabledTools(pool, projectList, projectsWithCrossProjectDeps, buildProject, extensionsToCheck):
+	"""
+	Enqueue any tools that were waiting on extensions that are no longer active.
+
+	:param pool: thread pool
+	:type pool: thread_pool.ThreadPool
+	:param projectList: list of all projects
+	:type projectList: list[project.Project]
+	:param projectsWithCrossProjectDeps: List of projects that contain cross-project dependencies
+	:type projectsWithCrossProjectDeps: list[project.Project]
+	:param buildProject: project the extensions belong to
+	:type buildProject: project.Project
+	:param extensionsToCheck: extensions that may no longer be active
+	:type extensionsToCheck: ordered_set.OrderedSet[str]
+	"""
+	for outputExtension in extensionsToCheck:
+		isActive = buildProject.toolchain.IsOutputActive(outputExtension)
+		log.Info("Checking if {} is still active... {}", outputExtension if outputExtension else "<no extension>", "yes" if isActive else "no")
+
+		# If this was the last file being built of its extension, check whether we can pass it and maybe others to relevant group input tools
+		if not isActive:
+			with perf_timer.PerfTimer("Checking for newly enabled tools"):
+				for tool in list(_readiness.GetWaitingTools(buildProject, outputExtension)):
+					_tryEnqueueTool(buildProject, tool, pool, projectList, projectsWithCrossProjectDeps)
+
+				# Check to see if we've freed up any pending builds in other projects as well
+				with perf_timer.PerfTimer("Cross-project dependency checks"):
+					for proj, tool in _readiness.GetCrossProjectWaiters(buildProject, outputExtension):
+						_tryEnqueueTool(proj, tool, pool, projectList, projectsWithCrossProjectDeps)
+
+def _stopIfFinished(pool, projectList, projectsWithCrossProjectDeps):
+	if _runningBuilds == 0:
+		# Everything that was running has settled, so nothing is active anymore. Give every tool one last look
+		# in case it was waiting on something that settled without producing an output the index was watching.
+		with perf_timer.PerfTimer("Checking for stalled tools"):
+			for proj in projectList:
+				for tool in list(proj.toolchain.GetActiveTools()):
+					_tryEnqueueTool(proj, tool, pool, projectList, projectsWithCrossProjectDeps)
+
+	if _runningBuilds == 0:
+		# We have no builds running and finishing this build did not spawn a new one
+		# Time to exit.
+		pool.Stop()
+
+class _CompletionBatch(object):
+	"""
+	Collects the checks for newly enabled tools from a batch of completions so each extension and tool only gets
+	checked once no matter how many of the batch's tasks touched it.
+	"""
+	def __init__(self):
+		self.extensionsToCheck = collections.OrderedDict()
+
+	def Defer(self, buildProject, extensionsToCheck):
+		"""
+		Add a finished task's checks to the batch
+
+		:param buildProject: project the task belonged to
+		:type buildProject: project.Project
+		:param extensionsToCheck: extensions that may no longer be active
+		:type extensionsToCheck: ordered_set.OrderedSet[str]
+		"""
+		self.extensionsToCheck.setdefault(buildProject, ordered_set.OrderedSet()).update(extensionsToCheck)
+
+	def Flush(self, pool, projectList, projectsWithCrossProjectDeps):
+		"""
+		Run all the deferred checks
+
+		:param pool: thread pool
+		:type pool: thread_pool.ThreadPool
+		:param projectList: list of all projects
+		:type projectList: list[project.Project]
+		:param projectsWithCrossProjectDeps: List of projects that contain cross-project dependencies
+		:type projectsWithCrossProjectDeps: list[project.Project]
+		"""
+		with perf_timer.PerfTimer("Flushing completion batch"):
+			# projectList is in dependency order. Walking it instead of the order the completions arrived in
+			# ensures a dependency's next tools have been enqueued (and its outputs marked active again) before
+			# any of its dependents check whether those outputs are finished.
+			for buildProject in projectList:
+				extensionsToCheck = self.extensionsToCheck.get(buildProject)
+				if extensionsToCheck:
+					_checkNewlyEnabledTools(pool, projectList, projectsWithCrossProjectDeps, buildProject, extensionsToCheck)
+
+			if shared_globals.verbosity > shared_globals.Verbosity.Verbose:
+				log.UpdateProgressBar()
+
+			_stopIfFinished(pool, projectList, projectsWithCrossProjectDeps)
+
+
+def _stopAsyncRunner():
+	global _asyncRunner
+	if _asyncRunner is not None:
+		_asyncRunner.Stop()
+		_asyncRunner = None
 
+def _stopProcessRunner():
+	global _processRunner
+	if _processRunner is not None:
+		_processRunner.Stop()
+		_processRunner = None
 
 @TypeChecked(numThreads=int, projectBuildList=list, _return=int)
 def _build(numThreads, projectBuildList):
@@ -451,12 +1209,61 @@ def _build(numThreads, projectBuildList):
 		log.Build("Starting builds")
 		buildStart = time.time()
 		global _runningBuilds
+		global _readiness
+		global _completionBatch
+		global _asyncRunner
+		global _processRunner
 		callbackQueue = queue.Queue()
-		pool = thread_pool.ThreadPool(numThreads, callbackQueue)
+		pool = thread_pool.ThreadPool(
+			numThreads,
+			callbackQueue,
+			prioritized=shared_globals.schedulingMode == shared_globals.SchedulingMode.CriticalPath
+		)
 		queuedSomething = False
+		# Anything could have changed since the projects were set up, such as by the build start hooks
+		shared_globals.statCache.Clear()
+		_unchangedOutputs.clear()
+		_unchangedInterfaces.clear()
+		_dependentProjects.clear()
+		_criticalPathMemo.clear()
+		_preBuildDependencyMemo.clear()
+		_pendingBatches.clear()
+		_readiness = readiness.ReadinessTracker(projectBuildList)
+		_remainingWork.seconds = 0.0
+		_remainingWork.unestimatedTasks = 0
+		_remainingWork.numThreads = max(numThreads, 1)
+		usesAsyncTools = False
+		usesProcessTools = False
 		for buildProject in projectBuildList:
 			for tool in buildProject.toolchain.GetAllTools():
-				tool.curParallel = 0
+				lane = _getLane(tool)
+				if lane is not None and lane not in pool.lanes:
+					# Lanes are shared by every project using the tool, since maxParallel is a global limit
+					pool.AddLane(lane, tool.maxParallel)
+				if tool.RunAsync is not None or tool.RunGroupAsync is not None:
+					usesAsyncTools = True
+				if tool.runInProcess:
+					usesProcessTools = True
+			for dependProject in buildProject.dependencies:
+				_dependentProjects.setdefault(dependProject, []).append(buildProject)
+
+		_processRunner = None
+		if usesProcessTools:
+			if not process_runner.IsSupported():
+				log.Warn("Tools with runInProcess require a platform that supports fork; running them on build threads instead")
+			else:
+				# Created before the build threads are started, since the workers are forked from this one
+				_processRunner = process_runner.ProcessRunner(max(numThreads, 1), projectBuildList)
+
+		_analyzeDependencies(projectBuildList, numThreads)
+
+		_asyncRunner = None
+		if usesAsyncTools:
+			if async_runner is None:
+				log.Warn("Tools with RunAsync or RunGroupAsync require python 3.5 or later; using Run and RunGroup instead")
+			else:
+				_asyncRunner = async_runner.AsyncRunner()
+				_asyncRunner.Start()
 
 		failures = 0
 		pool.Start()
@@ -488,9 +1295,6 @@ def _build(numThreads, projectBuildList):
 						continue
 
 					if fileList is None and extension is None:
-						if not _canRun(tool):
-							continue
-
 						if not buildProject.toolchain.IsToolActive(tool):
 							continue
 
@@ -498,9 +1302,7 @@ def _build(numThreads, projectBuildList):
 						queuedSomething = True
 					else:
 						log.Info("Looking at files {}", fileList)
-						for inputFile in list(fileList): #Make a list out of this so it doesn't get a modified-during-iteration error
-							if not _canRun(tool):
-								break
+						for inputFile in _readiness.GetPending(buildProject, tool, extension):
 							_enqueueBuild(buildProject, tool, inputFile, pool, projectBuildList, projectsWithCrossProjectDeps, extension, True)
 							queuedSomething = True
 
@@ -510,9 +1312,6 @@ def _build(numThreads, projectBuildList):
 				if not tool.inputGroups and not tool.crossProjectInputGroups:
 					continue
 
-				if not _canRun(tool):
-					continue
-
 				try:
 					for dependProject in buildProject.dependencies:
 						if not _checkDependenciesPreBuild(dependProject, tool, tool.crossProjectDependencies):
@@ -535,46 +1334,83 @@ def _build(numThreads, projectBuildList):
 	if not queuedSomething:
 		log.Build("Nothing to build.")
 		pool.Stop()
+		_stopAsyncRunner()
+		_stopProcessRunner()
 		return 0
 
 	with perf_timer.PerfTimer("Running builds"):
-		while True:
+		exiting = False
+		while not exiting:
 			with perf_timer.PerfTimer("Main thread idle"):
-				callback = callbackQueue.GetBlocking()
+				callbacks = [callbackQueue.GetBlocking()]
+
+			if shared_globals.batchCompletions:
+				# Take everything that's finished so far in one go, so the checks for what's been enabled by it
+				# can be done once for the whole batch instead of once per task.
+				with perf_timer.PerfTimer("Draining completions"):
+					while True:
+						try:
+							callbacks.append(callbackQueue.Get())
+						except IndexError:
+							break
+				_completionBatch = _CompletionBatch()
 
-			if callback is thread_pool.ThreadPool.exitEvent:
-				break
+			for callback in callbacks:
+				if callback is thread_pool.ThreadPool.exitEvent:
+					exiting = True
+					break
 
-			toReraise = None
-			try:
-				callback()
-			except thread_pool.ThreadedTaskException as e:
-				_runningBuilds -= 1
-				if _runningBuilds == 0:
-					# We have no builds running and finishing this build did not spawn a new one
-					# Time to exit.
-					pool.Stop()
-				failures += 1
-				toReraise = e
-			except:
-				pool.Abort()
-				raise
-
-			if toReraise is not None:
+				toReraise = None
 				try:
-					toReraise.Reraise()
-				except csbuild.BuildFailureException as buildExc:
-					log.Error(repr(buildExc))
+					callback()
+				except thread_pool.ThreadedTaskException as e:
+					_runningBuilds -= 1
+					if _runningBuilds == 0 and _completionBatch is None:
+						# We have no builds running and finishing this build did not spawn a new one
+						# Time to exit.
+						pool.Stop()
+					failures += 1
+					toReraise = e
 				except:
 					pool.Abort()
 					raise
 
+				if toReraise is not None:
+					try:
+						toReraise.Reraise()
+					except csbuild.BuildFailureException as buildExc:
+						log.Error(repr(buildExc))
+					except:
+						pool.Abort()
+						raise
+
+			if _completionBatch is not None:
+				batch = _completionBatch
+				_completionBatch = None
+				if not exiting:
+					batch.Flush(pool, projectBuildList, projectsWithCrossProjectDeps)
+
+	_stopAsyncRunner()
+	_stopProcessRunner()
+
 	for buildProject in projectBuildList:
 		if buildProject.toolchain.HasAnyReachability():
 			log.Error("Project {} did not finish building.", buildProject)
 			failures += 1
 
 	log.Build("Build finished. Completed {} tasks in {}", shared_globals.totalBuilds, FormatTime(time.time() - buildStart))
+
+	cache = shared_globals.artifactCache
+	if cache is not None and cache.hits + cache.misses:
+		log.Build(
+			"Artifact cache: {} hits ({} from the cache server), {} misses ({:.0%} hit rate), {} stored, {} evicted",
+			cache.hits,
+			cache.remoteHits,
+			cache.misses,
+			cache.hits / (cache.hits + cache.misses),
+			cache.stores,
+			cache.evictions
+		)
 	return failures
 
 @TypeChecked(projectCleanList=list, keepArtifactsAndDirectories=bool)
@@ -609,12 +1445,12 @@ def _clean(projectCleanList, keepArtifactsAndDirectories):
 		for cleanProject in projectCleanList:
 			log.Info("Cleaning project {}", cleanProject)
 			with perf_timer.PerfTimer("Removing artifacts"):
-				for artifacts in cleanProject.lastRunArtifacts.values():
-					for artifact in artifacts:
-						if os.access(artifact, os.F_OK):
-							log.Info("Removing {}", artifact)
-							os.remove(artifact)
-				cleanProject.lastRunArtifacts = collections.OrderedDict()
+				for artifact in cleanProject.artifactIndex.GetAllLastArtifacts():
+					if os.access(artifact, os.F_OK):
+						log.Info("Removing {}", artifact)
+						os.remove(artifact)
+				cleanProject.artifactIndex.ClearLast()
+			recompile.ClearProjectFingerprint(cleanProject)
 
 			if not keepArtifactsAndDirectories:
 				_rmDirIfPossible(cleanProject.csbuildDir)
@@ -711,6 +1547,8 @@ def Run():
 		mainFile = sys.modules['__main__'].__file__
 		scriptFiles = []
 		makefileDict = {}
+		# True in builds forked from the build daemon, which start with the makefile already executed
+		makefileLoaded = False
 
 		tools.InitTools()
 
@@ -722,7 +1560,16 @@ def Run():
 			else:
 				mainFileDir = os.path.abspath(os.getcwd())
 			scriptFiles.append(os.path.join(mainFileDir, mainFile))
-			if "-h" in sys.argv or "--help" in sys.argv:
+
+			if daemon_client.SERVER_ARG in sys.argv:
+				_execfile(mainFile, makefileDict, makefileDict)
+				_setupDefaultTargets()
+				makefileLoaded = True
+				# Only returns in the processes forked to run each build
+				build_daemon.Serve(mainFile)
+				shared_globals.startTime = time.time()
+
+			if ("-h" in sys.argv or "--help" in sys.argv) and not makefileLoaded:
 				shared_globals.runMode = csbuild.RunMode.Help
 				_execfile(mainFile, makefileDict, makefileDict)
 				_setupDefaultTargets()
@@ -866,6 +1713,12 @@ def Run():
 			help = "Very quiet. Disables all csb-specific logging.", default = 1)
 
 		parser.add_argument("-j", "--jobs", action = "store", dest = "jobs", type = int, help = "Number of simultaneous build processes")
+		parser.add_argument("--scheduler", help = "Order in which ready build tasks are started. 'critical-path' starts "
+			"the tasks with the longest chain of dependent work (including dependent projects) first, using project "
+			"priority as a tiebreaker.", action = "store", choices = ["fifo", "critical-path"], default = "fifo")
+		parser.add_argument("--batch-completions", help = "Process all build tasks that have finished at once, checking "
+			"what they've enabled once per batch rather than once per task. Reduces scheduling overhead for builds "
+			"with many small tasks.", action = "store_true")
 
 		#parser.add_argument("-g", "--gui", action = "store_true", dest = "gui", help = "Show GUI while building (experimental)")
 		#parser.add_argument("--auto-close-gui", action = "store_true", help = "Automatically close the gui on build success (will stay open on failure)")
@@ -892,6 +1745,22 @@ def Run():
 		parser.add_argument('--dg-type', '--dependency-graph-type', help="Graphviz engine to use for DG", action="store", default="dot", choices=["dot", "neato", "twopi", "circo", "fdp", "sfdp"])
 
 		parser.add_argument('--clear-cache', help="Removes cached data such as header dependency caches and artifact metadata (note: will trigger a rebuild)", action="store_true")
+		parser.add_argument('--no-cache', help="Don't restore compiled objects from the artifact cache or add new ones to it", action="store_true")
+		parser.add_argument('--cache-dir', help="Directory to keep the artifact cache in (default .csbuild/cache). "
+			"May be shared by several checkouts.", action="store")
+		parser.add_argument('--cache-size', help="Maximum size of the artifact cache, in bytes or with a K, M, G or T "
+			"suffix; the least recently used objects are evicted beyond it (default 5G, 0 for no limit)", action="store", default="5G")
+		parser.add_argument('--cache-server', help="URL of a cache server (see run_cache_server.py) to share compiled "
+			"objects through, i.e., http://buildcache:8080. Objects not in the local cache are fetched from it, and newly "
+			"compiled ones are sent to it.", action="store")
+		parser.add_argument('--cache-base-dir', help="Directory whose paths are hashed relative to it in artifact cache "
+			"keys, so checkouts at different paths share cached objects (default: the makefile's directory)", action="store")
+
+		parser.add_argument("--daemon", help="Run the build in a background daemon for this makefile, starting one if "
+			"it isn't running. The daemon keeps the tools imported and the makefile executed between builds, and "
+			"restarts when the makefile, csbuild, or the environment changes. (Not supported on Windows.)", action="store_true")
+		parser.add_argument("--stop-daemon", help="Stop the background build daemon for this makefile and exit",
+			action="store_true")
 
 		parser.add_argument("--perf-report", help="Collect and show perf report at the end of execution",
 							action = "store", choices = ["tree", "flat", "html"], default = None, const = "tree", nargs = "?")
@@ -953,15 +1822,48 @@ def Run():
 			print("Maintainer: {} - {}".format(csbuild.__maintainer__, csbuild.__email__))
 			return
 
+		if makefileLoaded and (args.generate_solution or args.dg):
+			# These change how the makefile has to be executed, so the daemon's copy of it can't be used
+			build_daemon.RunLocally(mainFile)
+
 		csbDir = os.path.join(mainFileDir, ".csbuild")
 		shared_globals.settings = settings_manager.SettingsManager(os.path.join(csbDir, "settings"))
 
+		shared_globals.taskHistory = task_history.TaskHistory(os.path.join(csbDir, "taskHistory"))
+
+		if not args.no_cache:
+			try:
+				cacheSize = artifact_cache.ParseSize(args.cache_size)
+			except ValueError:
+				log.Error("Invalid --cache-size: {}", args.cache_size)
+				system.Exit(1)
+			remote = None
+			if args.cache_server:
+				try:
+					remote = cache_server.CacheServerClient(args.cache_server)
+				except ValueError as e:
+					log.Error("{}", e)
+					system.Exit(1)
+			shared_globals.artifactCache = artifact_cache.ArtifactCache(
+				os.path.abspath(args.cache_dir) if args.cache_dir else os.path.join(csbDir, "cache"),
+				cacheSize,
+				remote,
+				os.path.abspath(args.cache_base_dir) if args.cache_base_dir else mainFileDir
+			)
+
 		if args.clear_cache:
 			shared_globals.settings.Clear()
 			args.rebuild = True
 
 		shared_globals.verbosity = args.verbosity
 		shared_globals.showCommands = args.show_commands
+		if args.scheduler == "critical-path":
+			shared_globals.schedulingMode = shared_globals.SchedulingMode.CriticalPath
+		else:
+			shared_globals.schedulingMode = shared_globals.SchedulingMode.Fifo
+		shared_globals.batchCompletions = args.batch_completions
+		# Cleaning, rebuilding, and generating solutions and graphs all need every project, changed or not
+		shared_globals.useProjectFingerprints = not (args.clean or args.rebuild or args.dg or args.generate_solution)
 		if args.perf_report is not None:
 			perf_timer.EnablePerfTracking(True)
 			if args.perf_report == "tree":
@@ -1018,8 +1920,13 @@ def Run():
 			for tool in shared_globals.allGeneratorTools:
 				csbuild.Toolchain(*shared_globals.allToolchains).AddTool(tool)
 
-		_execfile(mainFile, makefileDict, makefileDict)
-		_setupDefaultTargets()
+		if not makefileLoaded:
+			_execfile(mainFile, makefileDict, makefileDict)
+			_setupDefaultTargets()
+
+		if shared_globals.buildStartedHooks or shared_globals.buildFinishedHooks:
+			# Build hooks are given every project in the build, so none of them can be skipped
+			shared_globals.useProjectFingerprints = False
 
 		if args.generate_solution:
 			if args.generate_solution not in shared_globals.allGenerators:
@@ -1059,6 +1966,8 @@ def Run():
 		shared_globals.clearBar = "\r" +  " " * shared_globals.columns + "\r"
 
 	projectBuildList = []
+	# Every project, including stubs, which aren't built
+	allProjects = []
 
 	preparationStart = time.time()
 	shared_globals.startTime = preparationStart
@@ -1150,6 +2059,7 @@ def Run():
 						shared_globals.projectMap.setdefault(proj.toolchainName, {}) \
 							.setdefault(proj.architectureName, {}) \
 							.setdefault(proj.targetName, {})[plan.name] = proj
+						allProjects.append(proj)
 						if proj.projectType != csbuild.ProjectType.Stub or csbuild.GetRunMode() == csbuild.RunMode.GenerateSolution or args.dg:
 							projectBuildList.append(proj)
 
@@ -1239,6 +2149,16 @@ def Run():
 			log.Build("Wrote depends.png")
 		return
 
+	if shared_globals.useProjectFingerprints:
+		unchangedProjects = recompile.FindUnchangedProjects(allProjects)
+		numProjects = len(projectBuildList)
+		projectBuildList = [proj for proj in projectBuildList if proj not in unchangedProjects]
+		log.Build("Skipping {} of {} projects, which are unchanged since they were last built", numProjects - len(projectBuildList), numProjects)
+		with perf_timer.PerfTimer("File discovery"):
+			for proj in allProjects:
+				if proj not in unchangedProjects:
+					proj.RediscoverFiles()
+
 	if not args.clean or args.rebuild:
 		with perf_timer.PerfTimer("Project setup"):
 			#Now all dependencies have been resolved, so let toolchains do their post-resolution setup
@@ -1254,7 +2174,9 @@ def Run():
 	if args.clean or args.rebuild:
 		_clean(projectBuildList, args.rebuild)
 
-	if not args.clean or args.rebuild:
+	if not projectBuildList:
+		log.Build("Nothing to build.")
+	elif not args.clean or args.rebuild:
 		shared_globals.commandOutputThread = threading.Thread(target=commands.PrintStaggeredRealTimeOutput)
 		shared_globals.commandOutputThread.start()
 
@@ -1268,10 +2190,14 @@ def Run():
 		for hook in shared_globals.buildFinishedHooks:
 			hook(projectBuildList)
 
+		if shared_globals.useProjectFingerprints and not failures:
+			recompile.RecordProjectFingerprints(projectBuildList)
+
 	with perf_timer.PerfTimer("Waiting on logging to shut down"):
 		log.StopLogThread()
 
 	shared_globals.settings.Persist()
+	shared_globals.taskHistory.Flush()
 
 	totaltime = time.time() - preparationStart
 	log.Build("Total execution took {}".format(FormatTime(totaltime)))
@@ -0,0 +1,444 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: artifact_index
+	:synopsis: Persistent index of the artifacts each input or group of inputs produced, and the command signatures
+		they were built with
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import threading
+
+from .. import log
+from .._utils import ordered_set
+from .._utils.string_abc import String
+from .._testing import testcase
+
+class ArtifactIndex(object):
+	"""
+	Records the artifacts each input or group of inputs produced, the command signatures they were built with, and the
+	hash of every file they depended on, both as of the last build and for the current one.
+
+	Every path is interned as an integer ID, so a single input is keyed by its ID and a group of inputs by the set of
+	its IDs, which doesn't depend on the order the inputs arrived in and doesn't need them sorted to look up. Keys are
+	gotten once with GetKey() and can then be used for any number of lookups. Each path is stored once no matter how
+	many entries it appears in, and all of them are persisted as a single string. Only the current build's entries
+	are persisted, with the IDs renumbered to cover just the paths they use. Hash baselines are only set when inputs are
+	built, so the last one is kept for inputs that are up to date, for as long as they're part of the build.
+	"""
+	def __init__(self):
+		# Path -> ID
+		self._ids = {}
+		# ID -> path
+		self._paths = []
+		# Key -> tuple of artifact IDs, as of the last build
+		self._last = {}
+		# (Key, tool name) -> signature, as of the last build
+		self._lastSignatures = {}
+		# Key -> list of artifact IDs, for the current build
+		self._current = {}
+		# (Key, tool name) -> signature, for the current build
+		self._currentSignatures = {}
+		# Key -> {path ID: hash of the file}, as of the last build
+		self._lastHashBaselines = {}
+		# Key -> {path ID: hash of the file}, for the inputs built in the current build
+		self._currentHashBaselines = {}
+		self._lock = threading.Lock()
+
+	def __getstate__(self):
+		#pylint: disable=not-context-manager
+		with self._lock:
+			newIds = {}
+			paths = []
+			def _remap(pathId):
+				newId = newIds.get(pathId)
+				if newId is None:
+					newId = len(paths)
+					newIds[pathId] = newId
+					paths.append(self._paths[pathId])
+				return newId
+
+			def _remapKey(key):
+				if isinstance(key, frozenset):
+					return frozenset(_remap(pathId) for pathId in key)
+				if key is None:
+					return None
+				return _remap(key)
+
+			artifacts = {
+				_remapKey(key): tuple(_remap(pathId) for pathId in artifactIds)
+				for key, artifactIds in self._current.items()
+			}
+			signatures = {
+				(_remapKey(key), toolName): signature
+				for (key, toolName), signature in self._currentSignatures.items()
+			}
+			hashBaselines = {}
+			for key in self._current:
+				baseline = self._currentHashBaselines.get(key, self._lastHashBaselines.get(key))
+				if baseline is not None:
+					hashBaselines[_remapKey(key)] = {_remap(pathId): digest for pathId, digest in baseline.items()}
+			return {
+				"paths": "\0".join(paths),
+				"artifacts": artifacts,
+				"signatures": signatures,
+				"hashBaselines": hashBaselines,
+			}
+
+	def __setstate__(self, state):
+		self._paths = state["paths"].split("\0") if state["paths"] else []
+		self._ids = dict(zip(self._paths, range(len(self._paths))))
+		self._last = state["artifacts"]
+		self._lastSignatures = state["signatures"]
+		self._current = {}
+		self._currentSignatures = {}
+		self._lastHashBaselines = state.get("hashBaselines", {})
+		self._currentHashBaselines = {}
+		self._lock = threading.Lock()
+
+	def _intern(self, path):
+		pathId = self._ids.get(path)
+		if pathId is None:
+			pathId = len(self._paths)
+			self._paths.append(path)
+			self._ids[path] = pathId
+		return pathId
+
+	def GetKey(self, inputs):
+		"""
+		Get the key for an input or group of inputs. Thread-safe.
+
+		:param inputs: None for null-input tools, a single path, or an iterable of paths
+		:type inputs: str or list[str] or None
+		:return: The key
+		:rtype: int or frozenset[int] or None
+		"""
+		if inputs is None:
+			return None
+		#pylint: disable=not-context-manager
+		with self._lock:
+			if isinstance(inputs, String):
+				return self._intern(inputs)
+			ids = frozenset(map(self._intern, inputs))
+		if len(ids) == 1:
+			return next(iter(ids))
+		return ids
+
+	def AddArtifact(self, key, artifact):
+		"""
+		Record an artifact the inputs produced in the current build. Thread-safe.
+
+		:param key: Key for the inputs, from GetKey()
+		:type key: int or frozenset[int] or None
+		:param artifact: Absolute path to the artifact
+		:type artifact: str
+		:return: True if it's new for this build and different from what the inputs produced in the last build
+		:rtype: bool
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			artifacts = self._current.setdefault(key, [])
+			artifactId = self._intern(artifact)
+			if artifactId in artifacts:
+				return False
+			artifacts.append(artifactId)
+			lastArtifacts = self._last.get(key)
+			return lastArtifacts is None or tuple(artifacts) != lastArtifacts[:len(artifacts)]
+
+	def GetLastArtifacts(self, key):
+		"""
+		Get the artifacts the inputs produced in the last build
+
+		:param key: Key for the inputs, from GetKey()
+		:type key: int or frozenset[int] or None
+		:return: The artifacts, or None if the inputs weren't built in the last build
+		:rtype: ordered_set.OrderedSet[str] or None
+		"""
+		artifacts = self._last.get(key)
+		if artifacts is None:
+			return None
+		return ordered_set.OrderedSet(self._paths[pathId] for pathId in artifacts)
+
+	def GetAllLastArtifacts(self):
+		"""
+		Get every artifact produced in the last build
+
+		:return: The artifacts
+		:rtype: ordered_set.OrderedSet[str]
+		"""
+		ret = ordered_set.OrderedSet()
+		for artifacts in self._last.values():
+			ret.update(self._paths[pathId] for pathId in artifacts)
+		return ret
+
+	def GetAllArtifacts(self):
+		"""
+		Get every artifact produced in the current build
+
+		:return: The artifacts
+		:rtype: ordered_set.OrderedSet[str]
+		"""
+		ret = ordered_set.OrderedSet()
+		#pylint: disable=not-context-manager
+		with self._lock:
+			for artifacts in self._current.values():
+				ret.update(self._paths[pathId] for pathId in artifacts)
+		return ret
+
+	def ClearLast(self):
+		"""
+		Forget everything about the last build
+		"""
+		self._last = {}
+		self._lastSignatures = {}
+		self._lastHashBaselines = {}
+
+	def AddSignature(self, key, toolName, signature):
+		"""
+		Record the command signature a tool built the inputs with in the current build. Thread-safe.
+
+		:param key: Key for the inputs, from GetKey()
+		:type key: int or frozenset[int]
+		:param toolName: Name of the tool
+		:type toolName: str
+		:param signature: The signature
+		:type signature: str
+		:return: True if it's different from the signature recorded for the tool in the last build
+		:rtype: bool
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			self._currentSignatures[(key, toolName)] = signature
+			return self._lastSignatures.get((key, toolName)) != signature
+
+	def GetLastSignature(self, key, toolName):
+		"""
+		Get the command signature a tool built the inputs with in the last build
+
+		:param key: Key for the inputs, from GetKey()
+		:type key: int or frozenset[int]
+		:param toolName: Name of the tool
+		:type toolName: str
+		:return: The signature, or None if none was recorded
+		:rtype: str or None
+		"""
+		return self._lastSignatures.get((key, toolName))
+
+	def SetHashBaseline(self, key, hashes):
+		"""
+		Record the hash of every file the inputs depended on when they were built in the current build. Thread-safe.
+
+		:param key: Key for the inputs, from GetKey()
+		:type key: int or frozenset[int]
+		:param hashes: Hash of each file, by absolute path
+		:type hashes: dict[str, str]
+		:return: True if it's different from the hashes recorded in the last build
+		:rtype: bool
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			baseline = {self._intern(path): digest for path, digest in hashes.items()}
+			self._currentHashBaselines[key] = baseline
+			return self._lastHashBaselines.get(key) != baseline
+
+	def GetLastHashBaseline(self, key):
+		"""
+		Get the hash of every file the inputs depended on the last time they were built
+
+		:param key: Key for the inputs, from GetKey()
+		:type key: int or frozenset[int]
+		:return: Hash of each file, by absolute path, or None if none was recorded
+		:rtype: dict[str, str] or None
+		"""
+		baseline = self._lastHashBaselines.get(key)
+		if baseline is None:
+			return None
+		return {self._paths[pathId]: digest for pathId, digest in baseline.items()}
+
+### Unit Tests ###
+
+class TestArtifactIndex(testcase.TestCase):
+	"""Test the artifact index"""
+	# pylint: disable=invalid-name
+	def _nextBuild(self, index):
+		import pickle
+		return pickle.loads(pickle.dumps(index, 2))
+
+	def testArtifacts(self):
+		"""Test that artifacts are found by their inputs in any order in the next build, and only the current ones are kept"""
+		index = ArtifactIndex()
+		self.assertTrue(index.AddArtifact(index.GetKey("/src/a.cpp"), "/obj/a.o"))
+		self.assertTrue(index.AddArtifact(index.GetKey("/src/b.cpp"), "/obj/b.o"))
+		self.assertTrue(index.AddArtifact(index.GetKey(["/obj/a.o", "/obj/b.o"]), "/out/app"))
+		self.assertTrue(index.AddArtifact(index.GetKey(None), "/out/generated"))
+		self.assertFalse(index.AddArtifact(index.GetKey("/src/a.cpp"), "/obj/a.o"))
+		self.assertEqual(None, index.GetLastArtifacts(index.GetKey("/src/a.cpp")))
+
+		index = self._nextBuild(index)
+		self.assertEqual(["/obj/a.o"], list(index.GetLastArtifacts(index.GetKey("/src/a.cpp"))))
+		self.assertEqual(["/out/app"], list(index.GetLastArtifacts(index.GetKey(["/obj/b.o", "/obj/a.o"]))))
+		self.assertEqual(["/out/generated"], list(index.GetLastArtifacts(index.GetKey(None))))
+		self.assertEqual(None, index.GetLastArtifacts(index.GetKey(["/obj/a.o"])))
+		self.assertEqual(None, index.GetLastArtifacts(index.GetKey("/src/c.cpp")))
+
+		# Producing the same artifacts as last time isn't a change
+		self.assertFalse(index.AddArtifact(index.GetKey("/src/a.cpp"), "/obj/a.o"))
+		self.assertTrue(index.AddArtifact(index.GetKey("/src/c.cpp"), "/obj/c.o"))
+		self.assertEqual(["/obj/a.o", "/obj/c.o"], list(index.GetAllArtifacts()))
+
+		index = self._nextBuild(index)
+		self.assertEqual([], list(index.GetAllArtifacts()))
+		self.assertEqual(["/obj/a.o", "/obj/c.o"], list(index.GetAllLastArtifacts()))
+		# Paths only used by entries that weren't built again are dropped
+		self.assertEqual(4, len(index._paths)) # pylint: disable=protected-access
+		self.assertEqual(None, index.GetLastArtifacts(index.GetKey("/src/b.cpp")))
+
+	def testSignatures(self):
+		"""Test that signatures are recorded per tool and found in the next build"""
+		index = ArtifactIndex()
+		self.assertTrue(index.AddSignature(index.GetKey(["/obj/a.o", "/obj/b.o"]), "Linker", "1"))
+		self.assertTrue(index.AddSignature(index.GetKey("/src/a.cpp"), "Compiler", "2"))
+		index = self._nextBuild(index)
+		group = index.GetKey(["/obj/b.o", "/obj/a.o"])
+		self.assertEqual("1", index.GetLastSignature(group, "Linker"))
+		self.assertEqual(None, index.GetLastSignature(group, "Archiver"))
+		self.assertFalse(index.AddSignature(index.GetKey("/src/a.cpp"), "Compiler", "2"))
+		self.assertTrue(index.AddSignature(group, "Linker", "3"))
+
+	def testHashBaselines(self):
+		"""Test that hash baselines are kept for inputs that aren't rebuilt, until they're no longer built at all"""
+		index = ArtifactIndex()
+		index.AddArtifact(index.GetKey("/src/a.cpp"), "/obj/a.o")
+		index.AddArtifact(index.GetKey("/src/b.cpp"), "/obj/b.o")
+		self.assertTrue(index.SetHashBaseline(index.GetKey("/src/a.cpp"), {"/src/a.cpp": "1", "/src/a.h": "2"}))
+		self.assertTrue(index.SetHashBaseline(index.GetKey("/src/b.cpp"), {"/src/b.cpp": "3"}))
+
+		# a.cpp is up to date and b.cpp is rebuilt
+		index = self._nextBuild(index)
+		self.assertEqual({"/src/a.cpp": "1", "/src/a.h": "2"}, index.GetLastHashBaseline(index.GetKey("/src/a.cpp")))
+		index.AddArtifact(index.GetKey("/src/a.cpp"), "/obj/a.o")
+		index.AddArtifact(index.GetKey("/src/b.cpp"), "/obj/b.o")
+		self.assertFalse(index.SetHashBaseline(index.GetKey("/src/b.cpp"), {"/src/b.cpp": "3"}))
+		self.assertTrue(index.SetHashBaseline(index.GetKey("/src/b.cpp"), {"/src/b.cpp": "4"}))
+
+		# b.cpp is removed
+		index = self._nextBuild(index)
+		self.assertEqual({"/src/a.cpp": "1", "/src/a.h": "2"}, index.GetLastHashBaseline(index.GetKey("/src/a.cpp")))
+		self.assertEqual({"/src/b.cpp": "4"}, index.GetLastHashBaseline(index.GetKey("/src/b.cpp")))
+		index.AddArtifact(index.GetKey("/src/a.cpp"), "/obj/a.o")
+
+		index = self._nextBuild(index)
+		self.assertEqual({"/src/a.cpp": "1", "/src/a.h": "2"}, index.GetLastHashBaseline(index.GetKey("/src/a.cpp")))
+		self.assertEqual(None, index.GetLastHashBaseline(index.GetKey("/src/b.cpp")))
+
+	def testCompactIndexBenchmark(self):
+		"""Benchmark loading and looking up the artifacts of a 50k file project, with sorted tuples vs. IDs"""
+		import collections
+		import gc
+		import pickle
+		import random
+		import time
+
+		try:
+			import tracemalloc
+		except ImportError:
+			tracemalloc = None
+
+		count = 50000
+		sources = ["/project/src/module{}/file{}.cpp".format(i % 100, i) for i in range(count)]
+		objects = ["/project/intermediate/module{}/file{}.o".format(i % 100, i) for i in range(count)]
+
+		# The way artifacts used to be stored, keyed by sorted tuples of paths
+		tuples = collections.OrderedDict()
+		for source, obj in zip(sources, objects):
+			tuples.setdefault((source, ), ordered_set.OrderedSet()).add(obj)
+		tuples.setdefault(tuple(sorted(objects)), ordered_set.OrderedSet()).add("/project/out/app")
+		tupleData = pickle.dumps(tuples, 2)
+
+		index = ArtifactIndex()
+		for source, obj in zip(sources, objects):
+			index.AddArtifact(index.GetKey(source), obj)
+		index.AddArtifact(index.GetKey(objects), "/project/out/app")
+		indexData = pickle.dumps(index, 2)
+		del tuples, index
+
+		def _load(data):
+			if tracemalloc is not None:
+				tracemalloc.start()
+			start = time.time()
+			ret = pickle.loads(data)
+			elapsed = time.time() - start
+			memory = 0
+			if tracemalloc is not None:
+				memory = tracemalloc.get_traced_memory()[0]
+				tracemalloc.stop()
+			return ret, elapsed, memory
+
+		# Group inputs arrive in whatever order they finished building in
+		group = list(objects)
+		random.Random(0).shuffle(group)
+
+		# A group's inputs are looked up several times each build: for the command signature, the last result, and
+		# recording the new ones. The sorted tuple was built for each lookup, but the key only has to be gotten once.
+		lookups = 5
+		def _timeTupleLookups():
+			start = time.time()
+			for _ in range(lookups):
+				result = tuples.get(tuple(sorted(group)))
+			return result, time.time() - start
+
+		def _timeIndexLookups():
+			start = time.time()
+			key = index.GetKey(group)
+			for _ in range(lookups):
+				result = index.GetLastArtifacts(key)
+			return result, time.time() - start
+
+		gc.disable()
+		try:
+			tuples, tupleLoadTime, tupleMemory = _load(tupleData)
+			index, indexLoadTime, indexMemory = _load(indexData)
+			tupleResult, tupleLookupTime = _timeTupleLookups()
+			indexResult, indexLookupTime = _timeIndexLookups()
+		finally:
+			gc.enable()
+
+		self.assertEqual(list(tupleResult), list(indexResult))
+		log.Test(
+			"Artifacts for {} files, sorted tuples vs. IDs: {} vs. {} bytes on disk, {} vs. {} bytes in memory, "
+			"loaded in {:.3f}s vs. {:.3f}s, {} lookups of the whole group in {:.2f}ms vs. {:.2f}ms",
+			count,
+			len(tupleData),
+			len(indexData),
+			tupleMemory,
+			indexMemory,
+			tupleLoadTime,
+			indexLoadTime,
+			lookups,
+			tupleLookupTime * 1000,
+			indexLookupTime * 1000
+		)
+		# The times depend on the machine and what else it's doing, so they're only logged
+		self.assertLess(len(indexData), len(tupleData))
+		self.assertLess(indexMemory, tupleMemory or 1)
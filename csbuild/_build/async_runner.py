@@ -0,0 +1,246 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: async_runner
+	:synopsis: Event loop thread that runs the coroutines of tools implementing RunAsync or RunGroupAsync.
+		Requires python 3.5 or later; csbuild only imports it on interpreters that support it.
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import asyncio
+import sys
+import threading
+
+from .._testing import testcase
+
+class _ToolContextAwaitable(object):
+	"""
+	Awaits a tool's coroutine one step at a time, entering the tool's context around each step. Other tools'
+	coroutines run on the same thread in between those steps, so the context can't just be entered once around
+	the whole coroutine the way it is for a synchronous Run().
+
+	:param coroutine: The coroutine returned by the tool's RunAsync or RunGroupAsync
+	:type coroutine: coroutine
+	:param toolchain: The toolchain the tool belongs to
+	:type toolchain: csbuild.toolchain.Toolchain
+	:param tool: The tool
+	:type tool: type
+	"""
+	def __init__(self, coroutine, toolchain, tool):
+		self._coroutine = coroutine
+		self._toolchain = toolchain
+		self._tool = tool
+
+	def __await__(self):
+		coroutine = self._coroutine
+		sendValue = None
+		exception = None
+		while True:
+			try:
+				with self._toolchain.Use(self._tool):
+					if exception is not None:
+						toThrow = exception
+						exception = None
+						yielded = coroutine.throw(toThrow)
+					else:
+						yielded = coroutine.send(sendValue)
+			except StopIteration as e:
+				return e.value
+
+			try:
+				sendValue = yield yielded
+			except GeneratorExit:
+				coroutine.close()
+				raise
+			except BaseException as e: # pylint: disable=broad-except
+				sendValue = None
+				exception = e
+
+class AsyncRunner(object):
+	"""
+	Runs tool coroutines on an asyncio event loop in a dedicated thread, so any number of them can be waiting on
+	I/O at once without each one holding onto a thread.
+	"""
+	def __init__(self):
+		self._loop = asyncio.new_event_loop()
+		self._thread = threading.Thread(target=self._run, name="AsyncToolRunner")
+		self._thread.daemon = True
+		# Per-tool semaphores enforcing maxParallel, only touched on the loop thread
+		self._semaphores = {}
+
+	def Start(self):
+		"""
+		Start the event loop thread
+		"""
+		self._thread.start()
+
+	def Stop(self):
+		"""
+		Stop the event loop and join its thread. Coroutines still in progress are abandoned.
+		"""
+		self._loop.call_soon_threadsafe(self._loop.stop)
+		self._thread.join()
+		self._loop.close()
+
+	def _run(self):
+		asyncio.set_event_loop(self._loop)
+		self._loop.run_forever()
+
+	def Submit(self, coroutine, toolchain, tool, onDone):
+		"""
+		Run a tool's coroutine on the event loop. This is safe to call from any thread.
+
+		:param coroutine: The coroutine returned by the tool's RunAsync or RunGroupAsync
+		:type coroutine: coroutine
+		:param toolchain: The toolchain the tool belongs to
+		:type toolchain: csbuild.toolchain.Toolchain
+		:param tool: The tool. If it has a maxParallel value, no more than that many of its coroutines will run at once.
+		:type tool: type
+		:param onDone: Called on the event loop thread when the coroutine finishes, with the coroutine's result and
+			None if it succeeded, or None and the exception info from sys.exc_info() if it failed.
+		:type onDone: Callable
+		"""
+		asyncio.run_coroutine_threadsafe(self._runTool(coroutine, toolchain, tool, onDone), self._loop)
+
+	async def _runTool(self, coroutine, toolchain, tool, onDone):
+		try:
+			if tool.maxParallel > 0:
+				semaphore = self._semaphores.get(tool)
+				if semaphore is None:
+					semaphore = asyncio.Semaphore(tool.maxParallel)
+					self._semaphores[tool] = semaphore
+				async with semaphore:
+					result = await _ToolContextAwaitable(coroutine, toolchain, tool)
+			else:
+				result = await _ToolContextAwaitable(coroutine, toolchain, tool)
+		except: # pylint: disable=bare-except
+			onDone(None, sys.exc_info())
+			return
+		onDone(result, None)
+
+### Unit Tests ###
+
+class TestAsyncRunner(testcase.TestCase):
+	"""Test the async tool runner"""
+
+	class _FakeToolchain(object):
+		def __init__(self):
+			self.active = threading.local()
+
+		def Use(self, tool):
+			"""Stand-in for Toolchain.Use that tracks the active tool in a thread local"""
+			toolchain = self
+
+			class _context(object):
+				def __enter__(self):
+					self.old = getattr(toolchain.active, "tool", None)
+					toolchain.active.tool = tool
+
+				def __exit__(self, excType, excVal, tb):
+					toolchain.active.tool = self.old
+					return False
+
+			return _context()
+
+	def _runAll(self, runner, submissions):
+		results = {}
+		done = threading.Event()
+
+		def _makeOnDone(key):
+			def _onDone(result, excInfo):
+				results[key] = (result, excInfo)
+				if len(results) == len(submissions):
+					done.set()
+			return _onDone
+
+		for key, (coroutine, toolchain, tool) in submissions.items():
+			runner.Submit(coroutine, toolchain, tool, _makeOnDone(key))
+		self.assertTrue(done.wait(10))
+		return results
+
+	# pylint: disable=invalid-name
+	def testContextPerStep(self):
+		"""Test that each tool's context is active whenever its coroutine runs, even when they interleave"""
+		toolchain = TestAsyncRunner._FakeToolchain()
+
+		def _makeTool(name):
+			return type(str(name), (object,), {"maxParallel": 0})
+
+		async def _run(expected, steps):
+			seen = []
+			for _ in range(steps):
+				seen.append(toolchain.active.tool)
+				await asyncio.sleep(0.001)
+			seen.append(toolchain.active.tool)
+			if any(tool is not expected for tool in seen):
+				raise AssertionError("Wrong tool active")
+			return expected.__name__
+
+		tools = [_makeTool("Tool{}".format(i)) for i in range(20)]
+		runner = AsyncRunner()
+		runner.Start()
+		try:
+			results = self._runAll(runner, {tool: (_run(tool, 5), toolchain, tool) for tool in tools})
+		finally:
+			runner.Stop()
+
+		for tool in tools:
+			self.assertEqual((tool.__name__, None), results[tool])
+
+	def testExceptionsAndMaxParallel(self):
+		"""Test that failures are reported to onDone and that maxParallel limits how many coroutines run at once"""
+		toolchain = TestAsyncRunner._FakeToolchain()
+		Limited = type(str("Limited"), (object,), {"maxParallel": 2})
+		Failing = type(str("Failing"), (object,), {"maxParallel": 0})
+
+		class _state(object):
+			running = 0
+			maxRunning = 0
+
+		async def _limited():
+			_state.running += 1
+			_state.maxRunning = max(_state.maxRunning, _state.running)
+			await asyncio.sleep(0.01)
+			_state.running -= 1
+
+		async def _failing():
+			await asyncio.sleep(0.001)
+			raise RuntimeError("Failed!")
+
+		submissions = {i: (_limited(), toolchain, Limited) for i in range(10)}
+		submissions["failing"] = (_failing(), toolchain, Failing)
+
+		runner = AsyncRunner()
+		runner.Start()
+		try:
+			results = self._runAll(runner, submissions)
+		finally:
+			runner.Stop()
+
+		self.assertEqual(2, _state.maxRunning)
+		result, excInfo = results["failing"]
+		self.assertIsNone(result)
+		self.assertIsInstance(excInfo[1], RuntimeError)
+		for i in range(10):
+			self.assertEqual((None, None), results[i])
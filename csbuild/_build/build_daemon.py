@@ -0,0 +1,272 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: build_daemon
+	:synopsis: Resident build daemon that keeps the tools imported and the makefile executed between builds, and
+		runs each build forwarded to it by the client in daemon_client in a process forked from itself.
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import select
+import signal
+import socket
+import sys
+import time
+
+from .. import log
+from .._testing import testcase
+from .._utils import system, daemon_client
+
+# The daemon shuts itself down after this many seconds without a build
+_IDLE_TIMEOUT = 60 * 60
+# Seconds between checks for the idle timeout and for the daemon's socket having been removed
+_POLL_INTERVAL = 10
+
+# Environment variables that change from one shell to the next without meaning anything to a makefile
+_IGNORED_ENVIRONMENT = {"PWD", "OLDPWD", "SHLVL", "_"}
+
+def _filterEnvironment(environment):
+	return {key: value for key, value in environment.items() if key not in _IGNORED_ENVIRONMENT}
+
+def RunLocally(mainFile):
+	"""
+	Replace the current process with a normal build with the same arguments, for the runs a build forked from the
+	daemon can't handle because they need the makefile to be executed differently.
+
+	:param mainFile: The makefile, relative to the working directory
+	:type mainFile: str
+	"""
+	sys.stdout.flush()
+	sys.stderr.flush()
+	os.execv(sys.executable, [sys.executable, mainFile] + sys.argv[1:])
+
+def _getMtime(filename):
+	try:
+		return os.stat(filename).st_mtime
+	except OSError:
+		return None
+
+class _Snapshot(object):
+	"""
+	Everything the daemon's state was derived from: the makefile, every python module that was loaded in executing
+	it, the makefile's directory, and the environment.
+
+	:param mainFile: The makefile, relative to the working directory
+	:type mainFile: str
+	"""
+	def __init__(self, mainFile):
+		self.executable = sys.executable
+		self.environment = _filterEnvironment(os.environ)
+		filenames = {os.path.abspath(mainFile)}
+		for module in list(sys.modules.values()):
+			filename = getattr(module, "__file__", None)
+			if filename:
+				filenames.add(os.path.abspath(filename))
+		self.files = {filename: _getMtime(filename) for filename in filenames}
+		self.directory = os.path.dirname(os.path.abspath(mainFile))
+		self.directoryMtime = _getMtime(self.directory)
+
+	def RefreshDirectory(self):
+		"""
+		Take the directory's current modification date as its original one. Called after each build, since building
+		creates the output and intermediate directories in it.
+		"""
+		self.directoryMtime = _getMtime(self.directory)
+
+	def GetStaleReason(self, request):
+		"""
+		Check whether anything the daemon's state was derived from has changed
+
+		:param request: The build request from the client
+		:type request: dict
+		:return: A description of what changed, or None if nothing has
+		:rtype: str or None
+		"""
+		if request["executable"] != self.executable:
+			return "python executable changed"
+		if _filterEnvironment(request["environment"]) != self.environment:
+			return "environment changed"
+		for filename, mtime in self.files.items():
+			if _getMtime(filename) != mtime:
+				return "{} changed".format(os.path.basename(filename))
+		if _getMtime(self.directory) != self.directoryMtime:
+			return "makefile directory changed"
+		return None
+
+def _getSocketId():
+	try:
+		stat = os.stat(daemon_client.GetSocketPath())
+	except OSError:
+		return None
+	return stat.st_dev, stat.st_ino
+
+def _shutDown(listener):
+	try:
+		os.remove(daemon_client.GetSocketPath())
+	except OSError:
+		pass
+	listener.close()
+
+def _waitForBuild(pid, conn, finishedPipe):
+	# The build process holds the write end of finishedPipe, so it becomes readable the moment the process exits.
+	# The connection becomes readable if the client goes away, in which case there's nobody to build for.
+	while True:
+		readable, _, _ = select.select([conn, finishedPipe], [], [])
+		if finishedPipe in readable:
+			break
+		if not conn.recv(1):
+			log.Build("Client disconnected; stopping build.")
+			try:
+				os.kill(pid, signal.SIGTERM)
+			except OSError:
+				pass
+			break
+	_, status = os.waitpid(pid, 0)
+	if os.WIFEXITED(status):
+		return os.WEXITSTATUS(status)
+	return 1
+
+def Serve(mainFile):
+	"""
+	Wait for build requests from clients and run each one in a process forked from this one, which starts with the
+	tools imported and the makefile executed. Only returns in the forked processes, with their arguments, environment
+	and standard streams replaced with the client's, to run the rest of the build. The daemon exits when something
+	its state was derived from changes, when it's told to stop, or after being idle for an hour.
+
+	:param mainFile: The makefile, relative to the working directory
+	:type mainFile: str
+	"""
+	snapshot = _Snapshot(mainFile)
+
+	listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		os.remove(daemon_client.GetSocketPath())
+	except OSError:
+		pass
+	listener.bind(daemon_client.GetSocketPath())
+	os.chmod(daemon_client.GetSocketPath(), 0o600)
+	listener.listen(8)
+	socketId = _getSocketId()
+	listener.settimeout(_POLL_INTERVAL)
+	log.Build("Build daemon ready")
+
+	lastBuild = time.time()
+	while True:
+		try:
+			conn, _ = listener.accept()
+		except socket.timeout:
+			if _getSocketId() != socketId:
+				# Deleting .csbuild or starting another daemon leaves this one unreachable
+				log.Build("Socket was removed; exiting.")
+				listener.close()
+				system.Exit(0)
+			if time.time() - lastBuild >= _IDLE_TIMEOUT:
+				log.Build("Idle for {} seconds; exiting.", _IDLE_TIMEOUT)
+				_shutDown(listener)
+				system.Exit(0)
+			continue
+
+		conn.settimeout(None)
+		request, fds = daemon_client.Recv(conn)
+		if request is None:
+			conn.close()
+			continue
+
+		if request.get("stop"):
+			log.Build("Stopped by client; exiting.")
+			_shutDown(listener)
+			daemon_client.Send(conn, {"exitCode": 0})
+			conn.close()
+			system.Exit(0)
+
+		staleReason = snapshot.GetStaleReason(request)
+		if staleReason is None and len(fds) != 3:
+			staleReason = "client did not send its standard streams"
+		if staleReason is not None:
+			log.Build("{}; exiting.", staleReason)
+			# The socket's removed before replying so the client's next attempt starts a new daemon
+			_shutDown(listener)
+			daemon_client.Send(conn, {"stale": staleReason})
+			conn.close()
+			system.Exit(0)
+
+		log.Build("Building: {}", " ".join(request["argv"]))
+		sys.stdout.flush()
+		sys.stderr.flush()
+		finishedRead, finishedWrite = os.pipe()
+		pid = os.fork()
+		if pid == 0:
+			listener.close()
+			conn.close()
+			os.close(finishedRead)
+			for target, fd in enumerate(fds):
+				os.dup2(fd, target)
+				os.close(fd)
+			os.environ.clear()
+			os.environ.update(request["environment"])
+			sys.argv = [mainFile] + request["argv"]
+			return
+
+		os.close(finishedWrite)
+		for fd in fds:
+			os.close(fd)
+		exitCode = _waitForBuild(pid, conn, finishedRead)
+		os.close(finishedRead)
+		snapshot.RefreshDirectory()
+		log.Build("Finished with exit code {}", exitCode)
+		try:
+			daemon_client.Send(conn, {"exitCode": exitCode})
+		except (IOError, OSError):
+			pass
+		conn.close()
+		lastBuild = time.time()
+
+### Unit Tests ###
+
+class TestBuildDaemon(testcase.TestCase):
+	"""Test the build daemon's invalidation"""
+	# pylint: disable=invalid-name
+	def testSnapshot(self):
+		"""Test that changes to the makefile or the environment make the daemon stale"""
+		import tempfile
+		import shutil
+		tempDir = tempfile.mkdtemp()
+		try:
+			mainFile = os.path.join(tempDir, "make.py")
+			with open(mainFile, "w") as f:
+				f.write("")
+			snapshot = _Snapshot(mainFile)
+			request = {"executable": sys.executable, "environment": dict(os.environ, PWD="/")}
+			self.assertIsNone(snapshot.GetStaleReason(request))
+
+			self.assertEqual(
+				"environment changed",
+				snapshot.GetStaleReason({"executable": sys.executable, "environment": dict(os.environ, CSBUILD_TEST="1")})
+			)
+
+			os.utime(mainFile, (os.path.getatime(mainFile), os.path.getmtime(mainFile) + 10))
+			self.assertEqual("make.py changed", snapshot.GetStaleReason(request))
+		finally:
+			shutil.rmtree(tempDir)
@@ -0,0 +1,382 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: dependency_index
+	:synopsis: Persistent index of the files each set of inputs depends on, and the reverse, for finding
+		everything that's out of date without walking every input's dependencies
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import itertools
+import os
+import threading
+
+from .. import perf_timer
+from .._utils import shared_globals
+from .._testing import testcase
+
+class DependencyIndex(object):
+	"""
+	Records, for each set of inputs that was up to date as of the last build, every file it depended on and that file's
+	modification date and size then, along with the reverse: the inputs that depend on each file.
+
+	The first time it's asked about anything in a build, every file in the index is checked once, and every set of
+	inputs that depends on a file whose modification date or size is different from when it was recorded is marked dirty
+	in one pass. Any difference counts, not just a newer date, since copying, extracting or restoring a file can give it
+	an older one. Anything that isn't dirty is known to be up to date without looking at its dependencies. Dirty inputs
+	are dropped from the index; they only become up to date again when they're recorded themselves.
+
+	Each set of inputs is a separate record, so it can be persisted as its own row: see TakeChanges().
+
+	:param records: Records to load the index from, as returned by GetData() or TakeChanges(), or None for an empty index
+	:type records: dict or None
+	"""
+	def __init__(self, records=None):
+		# Inputs key -> {path it depends on, including the inputs themselves: (modification date, size) when it was
+		# recorded, or None if it didn't exist}
+		self._dependencies = {}
+		# Path -> inputs keys that depend on it
+		self._dependents = {}
+		# Path -> the (modification date, size) every input depending on it recorded, or None if they didn't all
+		# record the same one, in which case each of them is checked. It isn't set again when things are removed, so
+		# it can be None when it doesn't need to be, but never wrong.
+		self._files = {}
+		self._stamps = {}
+		self._dirty = None
+		# Keys recorded or removed since the last TakeChanges()
+		self._changed = set()
+		self._lock = threading.Lock()
+
+		# Records loaded separately each have their own copy of every path, so they're shared again here
+		paths = {}
+		for key, stamps in (records or {}).items():
+			stamps = {paths.setdefault(filename, filename): stamp for filename, stamp in stamps.items()}
+			self._add(key, stamps)
+
+	def GetData(self):
+		"""
+		:return: All of the index's records
+		:rtype: dict
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			return dict(self._dependencies)
+
+	def TakeChanges(self):
+		"""
+		Get the records that have changed since the last call, to persist them
+
+		:return: The new record for each key that was recorded, and None for each key that was removed
+		:rtype: dict
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			changes = {key: self._dependencies.get(key) for key in self._changed}
+			self._changed = set()
+			return changes
+
+	def _getStamp(self, filename):
+		if filename in self._stamps:
+			return self._stamps[filename]
+		stat = shared_globals.statCache.Stat(filename)
+		stamp = (stat.st_mtime, stat.st_size) if stat is not None else None
+		self._stamps[filename] = stamp
+		return stamp
+
+	def _computeDirty(self):
+		with perf_timer.PerfTimer("Dependency index dirty set"):
+			dirty = set()
+			for filename, recorded in self._files.items():
+				stamp = self._getStamp(filename)
+				if stamp is not None and stamp == recorded:
+					continue
+				# Anything depending on a file that's gone is out of date
+				dirty.update(
+					key for key in self._dependents[filename]
+					if stamp is None or stamp != self._dependencies[key][filename]
+				)
+			for key in dirty:
+				self._remove(key)
+			self._dirty = dirty
+
+	def IsUpToDate(self, key):
+		"""
+		Check whether a set of inputs is known to be up to date
+
+		:param key: Key for the inputs
+		:type key: tuple[str]
+		:return: True if the inputs and everything they depended on last time are unchanged since they were recorded,
+			False if they've changed or aren't in the index
+		:rtype: bool
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			if self._dirty is None:
+				self._computeDirty()
+			return key in self._dependencies
+
+	def HasChanges(self):
+		"""
+		Check whether anything in the index has changed
+
+		:return: True if any file recorded in the index has changed since it was recorded
+		:rtype: bool
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			if self._dirty is None:
+				self._computeDirty()
+			return bool(self._dirty)
+
+	def Record(self, key, filenames):
+		"""
+		Record that a set of inputs is up to date, along with everything it depends on. Each file's modification date
+		and size are taken from the first time the index saw it this build, so changes made since then, during the
+		build, are still seen as changes next time.
+
+		:param key: Key for the inputs
+		:type key: tuple[str]
+		:param filenames: Absolute paths to the inputs and everything they depend on
+		:type filenames: set[str]
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			if self._dirty is None:
+				self._computeDirty()
+			self._forget(key)
+			self._add(key, {filename: self._getStamp(filename) for filename in filenames})
+			self._changed.add(key)
+
+	def Remove(self, key):
+		"""
+		Forget a set of inputs, so it's no longer known to be up to date
+
+		:param key: Key for the inputs
+		:type key: tuple[str]
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			self._remove(key)
+
+	def RemoveMissingInputs(self):
+		"""
+		Forget every set of inputs that includes a file that no longer exists, so inputs that were deleted don't
+		keep the index changed forever
+
+		:return: True if anything was removed
+		:rtype: bool
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			if self._dirty is None:
+				self._computeDirty()
+			missing = {
+				key for key in itertools.chain(self._dependencies, self._dirty)
+				if not all(shared_globals.statCache.Exists(filename) for filename in key)
+			}
+			for key in missing:
+				self._remove(key)
+				self._dirty.discard(key)
+			return bool(missing)
+
+	def _add(self, key, stamps):
+		self._dependencies[key] = stamps
+		for filename, stamp in stamps.items():
+			self._dependents.setdefault(filename, set()).add(key)
+			if filename not in self._files:
+				self._files[filename] = stamp
+			elif self._files[filename] != stamp:
+				self._files[filename] = None
+
+	def _remove(self, key):
+		if self._forget(key):
+			self._changed.add(key)
+
+	def _forget(self, key):
+		record = self._dependencies.pop(key, None)
+		if record is None:
+			return False
+		for filename in record:
+			dependents = self._dependents[filename]
+			dependents.discard(key)
+			if not dependents:
+				del self._dependents[filename]
+				del self._files[filename]
+		return True
+
+### Unit Tests ###
+
+class TestDependencyIndex(testcase.TestCase):
+	"""Test the dependency index"""
+	# pylint: disable=invalid-name
+	def setUp(self):
+		import tempfile
+		self.tempDir = tempfile.mkdtemp()
+		self.files = {}
+		for name in ("a.cpp", "b.cpp", "common.h", "a.h"):
+			self.files[name] = os.path.join(self.tempDir, name)
+			with open(self.files[name], "w") as f:
+				f.write(name)
+
+	def tearDown(self):
+		import shutil
+		shutil.rmtree(self.tempDir)
+
+	def _touch(self, name):
+		filename = self.files[name]
+		os.utime(filename, (os.path.getatime(filename), os.path.getmtime(filename) + 10))
+		shared_globals.statCache.Invalidate(filename)
+
+	def _record(self, index):
+		index.Record(("a.cpp", ), {self.files["a.cpp"], self.files["common.h"], self.files["a.h"]})
+		index.Record(("b.cpp", ), {self.files["b.cpp"], self.files["common.h"]})
+
+	def testDirtySet(self):
+		"""Test that changing a file makes exactly the inputs that depend on it dirty"""
+		index = DependencyIndex()
+		self._record(index)
+		self.assertTrue(DependencyIndex(index.GetData()).IsUpToDate(("a.cpp", )))
+		self.assertFalse(DependencyIndex(index.GetData()).IsUpToDate(("c.cpp", )))
+
+		self._touch("a.h")
+		nextBuild = DependencyIndex(index.GetData())
+		self.assertFalse(nextBuild.IsUpToDate(("a.cpp", )))
+		self.assertTrue(nextBuild.IsUpToDate(("b.cpp", )))
+
+		self._touch("common.h")
+		nextBuild = DependencyIndex(index.GetData())
+		self.assertFalse(nextBuild.IsUpToDate(("a.cpp", )))
+		self.assertFalse(nextBuild.IsUpToDate(("b.cpp", )))
+
+		os.remove(self.files["b.cpp"])
+		shared_globals.statCache.Invalidate(self.files["b.cpp"])
+		self.assertFalse(DependencyIndex(index.GetData()).IsUpToDate(("b.cpp", )))
+
+	def testAnyDifferenceIsAChange(self):
+		"""Test that a file with an older modification date, or a different size and the same one, is a change"""
+		index = DependencyIndex()
+		self._record(index)
+
+		# As when a file is restored from a backup, or copied or extracted keeping its original date
+		filename = self.files["a.h"]
+		os.utime(filename, (os.path.getatime(filename), os.path.getmtime(filename) - 10))
+		shared_globals.statCache.Invalidate(filename)
+		nextBuild = DependencyIndex(index.GetData())
+		self.assertFalse(nextBuild.IsUpToDate(("a.cpp", )))
+		self.assertTrue(nextBuild.IsUpToDate(("b.cpp", )))
+
+		self._record(nextBuild)
+		mtime = os.path.getmtime(filename)
+		with open(filename, "w") as f:
+			f.write("a longer a.h")
+		os.utime(filename, (os.path.getatime(filename), mtime))
+		shared_globals.statCache.Invalidate(filename)
+		self.assertFalse(DependencyIndex(nextBuild.GetData()).IsUpToDate(("a.cpp", )))
+
+	def testRecordUsesMtimeFromStartOfBuild(self):
+		"""Test that a file changed in the middle of a build is still seen as changed by the next one"""
+		index = DependencyIndex()
+		self._record(index)
+
+		nextBuild = DependencyIndex(index.GetData())
+		self.assertTrue(nextBuild.IsUpToDate(("a.cpp", )))
+		self._touch("a.h")
+		self._record(nextBuild)
+		self.assertFalse(DependencyIndex(nextBuild.GetData()).IsUpToDate(("a.cpp", )))
+
+	def testPartialRebuild(self):
+		"""Test that recording one of the inputs depending on a changed file doesn't make the others up to date"""
+		index = DependencyIndex()
+		self._record(index)
+
+		self._touch("common.h")
+		nextBuild = DependencyIndex(index.GetData())
+		self.assertFalse(nextBuild.IsUpToDate(("a.cpp", )))
+		nextBuild.Record(("b.cpp", ), {self.files["b.cpp"], self.files["common.h"]})
+		self.assertFalse(DependencyIndex(nextBuild.GetData()).IsUpToDate(("a.cpp", )))
+		self.assertTrue(DependencyIndex(nextBuild.GetData()).IsUpToDate(("b.cpp", )))
+
+		# The same, when nothing's been asked about before the first input is recorded
+		index = DependencyIndex()
+		self._record(index)
+		self._touch("common.h")
+		nextBuild = DependencyIndex(index.GetData())
+		nextBuild.Record(("b.cpp", ), {self.files["b.cpp"], self.files["common.h"]})
+		self.assertFalse(DependencyIndex(nextBuild.GetData()).IsUpToDate(("a.cpp", )))
+
+	def testIncrementalUpdate(self):
+		"""Test that dropped dependencies and removed inputs are removed from the index"""
+		index = DependencyIndex()
+		self._record(index)
+		index.Record(("a.cpp", ), {self.files["a.cpp"], self.files["common.h"]})
+		self.assertNotIn(self.files["a.h"], index.GetData()[("a.cpp", )])
+
+		self._touch("a.h")
+		self.assertTrue(DependencyIndex(index.GetData()).IsUpToDate(("a.cpp", )))
+
+		index.Remove(("a.cpp", ))
+		index.Remove(("b.cpp", ))
+		self.assertEqual({}, index.GetData())
+
+	def testTakeChanges(self):
+		"""Test that the changes include what was recorded, removed, and dropped for being out of date"""
+		index = DependencyIndex()
+		self._record(index)
+		self.assertEqual(index.GetData(), index.TakeChanges())
+		self.assertEqual({}, index.TakeChanges())
+
+		self._touch("common.h")
+		nextBuild = DependencyIndex(index.GetData())
+		self.assertEqual({}, nextBuild.TakeChanges())
+		nextBuild.Record(("b.cpp", ), {self.files["b.cpp"], self.files["common.h"]})
+		changes = nextBuild.TakeChanges()
+		self.assertEqual({("a.cpp", ), ("b.cpp", )}, set(changes))
+		self.assertEqual(None, changes[("a.cpp", )])
+		self.assertEqual(nextBuild.GetData()[("b.cpp", )], changes[("b.cpp", )])
+
+		# Persisting only the changes gives the same index as persisting everything
+		persisted = index.GetData()
+		for key, record in changes.items():
+			if record is None:
+				del persisted[key]
+			else:
+				persisted[key] = record
+		self.assertEqual(nextBuild.GetData(), DependencyIndex(persisted).GetData())
+
+	def testMissingInputs(self):
+		"""Test that deleting an input leaves the index changed until the input is removed from it"""
+		index = DependencyIndex()
+		index.Record((self.files["a.cpp"], ), {self.files["a.cpp"], self.files["common.h"]})
+		index.Record((self.files["b.cpp"], ), {self.files["b.cpp"], self.files["common.h"]})
+		self.assertFalse(DependencyIndex(index.GetData()).HasChanges())
+		self.assertFalse(index.RemoveMissingInputs())
+
+		os.remove(self.files["b.cpp"])
+		shared_globals.statCache.Invalidate(self.files["b.cpp"])
+		nextBuild = DependencyIndex(index.GetData())
+		self.assertTrue(nextBuild.HasChanges())
+		self.assertTrue(nextBuild.RemoveMissingInputs())
+		self.assertFalse(nextBuild.HasChanges())
+		self.assertFalse(DependencyIndex(nextBuild.GetData()).HasChanges())
+		self.assertTrue(DependencyIndex(nextBuild.GetData()).IsUpToDate((self.files["a.cpp"], )))
@@ -146,11 +146,19 @@ class InputFile(object):
 	@property
 	def uniqueDirectoryId(self):
 		"""
-		Get the unique identifier for the directory containing the file.
+		Get the unique identifier for the directory containing the file. It's derived from the directory's path
+		relative to the makefile's, so intermediate paths, and the commands and artifact cache keys that contain them,
+		are the same in every checkout.
 
 		:return: Directory unique identifier.
 		:rtype: str
 		"""
 		if self._uniqueDirectoryId is None:
-			self._uniqueDirectoryId = hashlib.md5(PlatformBytes(os.path.dirname(self.filename))).hexdigest()
+			directory = os.path.dirname(self.filename)
+			try:
+				directory = os.path.relpath(directory)
+			except ValueError:
+				# On a different drive from the makefile
+				pass
+			self._uniqueDirectoryId = hashlib.md5(PlatformBytes(directory)).hexdigest()
 		return self._uniqueDirectoryId
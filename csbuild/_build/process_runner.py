@@ -0,0 +1,352 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: process_runner
+	:synopsis: Pool of forked worker processes that runs the Run() and RunGroup() methods of tools with runInProcess set,
+		so CPU-bound python tools aren't serialized by the GIL.
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import traceback
+
+import csbuild
+
+from . import input_file, project
+from .. import log
+from .._testing import testcase
+from .._utils import ordered_set, queue
+
+_SUCCEEDED = 0
+_BUILD_FAILED = 1
+_RAISED = 2
+
+def IsSupported():
+	"""
+	Check whether tools can be run in worker processes on this platform. Projects and tools can't be pickled, since
+	toolchains and the tools defined in makefiles are created on the fly, so the workers have to be forked to get them.
+
+	:return: True if worker processes can be forked
+	:rtype: bool
+	"""
+	if sys.version_info < (3, 4):
+		return False
+	return "fork" in multiprocessing.get_all_start_methods()
+
+class WorkerProcessError(Exception):
+	"""
+	An exception other than a build failure was raised by a tool running in a worker process, or the process died
+
+	:param toolName: Name of the tool
+	:type toolName: str
+	:param remoteTraceback: The formatted traceback from the worker process
+	:type remoteTraceback: str
+	"""
+	def __init__(self, toolName, remoteTraceback):
+		Exception.__init__(self, "{} raised an exception in a worker process:\n{}".format(toolName, remoteTraceback))
+		self.remoteTraceback = remoteTraceback
+
+def _getInputState(inputFiles):
+	# Input files refer back to things that can't be pickled, so only what the tools need of them is sent
+	if inputFiles is None:
+		return None
+	if isinstance(inputFiles, input_file.InputFile):
+		return inputFiles.filename, inputFiles.upToDate
+	return [(inputFile.filename, inputFile.upToDate) for inputFile in inputFiles]
+
+def _getInputFiles(inputState):
+	if inputState is None:
+		return None
+	if isinstance(inputState, list):
+		return ordered_set.OrderedSet([input_file.InputFile(filename, upToDate=upToDate) for filename, upToDate in inputState])
+	return input_file.InputFile(inputState[0], upToDate=inputState[1])
+
+def _runInWorker(workerProjects, projectIndex, toolIndex, inputState):
+	buildProject, tools = workerProjects[projectIndex]
+	buildTool = tools[toolIndex]
+	inputFiles = _getInputFiles(inputState)
+	function = buildTool.RunGroup if isinstance(inputState, list) else buildTool.Run
+
+	try:
+		with buildProject.toolchain.Use(buildTool):
+			return _SUCCEEDED, function(buildProject.toolchain, buildProject, inputFiles)
+	except csbuild.BuildFailureException as e:
+		# Null-input tools name whatever they like as the inputs that failed, so that's sent back too
+		return _BUILD_FAILED, (_getInputState(e.inputFile), e.info)
+	except: # pylint: disable=bare-except
+		return _RAISED, traceback.format_exc()
+
+def _workerMain(connection, workerProjects):
+	# Interrupts are handled by the build process, which takes the workers down with it. The build process's own
+	# handlers would try to clean up a build that isn't running here.
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	signal.signal(signal.SIGTERM, signal.SIG_DFL)
+	log.CaptureLogs()
+	while True:
+		try:
+			task = connection.recv()
+		except EOFError:
+			return
+		if task is None:
+			return
+		outcome = _runInWorker(workerProjects, *task)
+		connection.send((outcome, log.TakeCapturedLogs()))
+
+class ProcessRunner(object):
+	"""
+	Runs tools in a pool of worker processes. The workers are forked when the runner is created, which is how the
+	projects and the state of their toolchains get to them: each worker gets a copy of them as they are at that point,
+	once, rather than having them sent along with every task. Only the inputs are sent for each task, and only the
+	results and whatever the tool logged are sent back.
+
+	Only plain values are ever pickled. Builds usually run while the makefile is still importing csbuild, so pickling
+	anything by reference to a csbuild module (as multiprocessing.Pool does with its task functions) would wait on
+	the import lock held by the main thread forever.
+
+	:param numProcesses: Number of worker processes
+	:type numProcesses: int
+	:param projects: Every project whose tools might be run in the pool
+	:type projects: list[csbuild._build.project.Project]
+	"""
+	def __init__(self, numProcesses, projects):
+		self._projectIndices = {}
+		self._toolIndices = {}
+		workerProjects = []
+		for projectIndex, buildProject in enumerate(projects):
+			tools = list(buildProject.toolchain.GetAllTools())
+			self._projectIndices[buildProject] = projectIndex
+			for toolIndex, tool in enumerate(tools):
+				self._toolIndices[(projectIndex, tool)] = toolIndex
+			workerProjects.append((buildProject, tools))
+
+		context = multiprocessing.get_context("fork")
+		self._processes = []
+		self._idle = queue.Queue()
+		self._numAlive = numProcesses
+		self._lock = threading.Lock()
+		for _ in range(numProcesses):
+			parentEnd, childEnd = context.Pipe()
+			# Forked processes inherit their arguments directly, so the projects are never pickled
+			process = context.Process(target=_workerMain, args=(childEnd, workerProjects))
+			process.daemon = True
+			process.start()
+			childEnd.close()
+			self._processes.append((process, parentEnd))
+			self._idle.Put(parentEnd)
+
+	def Stop(self):
+		"""
+		Shut down the worker processes
+		"""
+		for process, connection in self._processes:
+			try:
+				connection.send(None)
+			except (IOError, OSError):
+				pass
+			process.join()
+			connection.close()
+		self._processes = []
+
+	def Run(self, buildTool, buildToolchain, buildProject, inputFiles):
+		"""
+		Run a tool's Run() or RunGroup() in a worker process and wait for it to finish. This has the same signature
+		as Run() and RunGroup() once the tool is bound, so it can be called in their place.
+
+		The tool gets copies of its inputs that only carry their filenames and whether they were up to date.
+
+		:param buildTool: The tool
+		:type buildTool: type
+		:param buildToolchain: The project's toolchain; unused, since the worker has its own copy
+		:type buildToolchain: csbuild.toolchain.Toolchain
+		:param buildProject: The project
+		:type buildProject: csbuild._build.project.Project
+		:param inputFiles: The input, the inputs for RunGroup(), or None for a null-input build
+		:type inputFiles: input_file.InputFile or ordered_set.OrderedSet or None
+		:return: Whatever the tool returned
+		:rtype: str or tuple[str]
+		"""
+		del buildToolchain
+		projectIndex = self._projectIndices[buildProject]
+		inputState = _getInputState(inputFiles)
+
+		connection = self._idle.GetBlocking()
+		if connection is None:
+			# Put back for anything else waiting on a worker
+			self._idle.Put(None)
+			raise WorkerProcessError(buildTool.__name__, "Every worker process has exited")
+		try:
+			connection.send((projectIndex, self._toolIndices[(projectIndex, buildTool)], inputState))
+			(status, value), captured = connection.recv()
+		except (EOFError, IOError, OSError):
+			# The worker's gone, so it's dropped rather than given more tasks that would fail the same way
+			self._dropWorker(connection)
+			raise WorkerProcessError(buildTool.__name__, "The worker process exited unexpectedly")
+		self._idle.Put(connection)
+		log.ReplayLogs(captured)
+
+		if status == _BUILD_FAILED:
+			failedState, info = value
+			if inputFiles is None:
+				inputFiles = _getInputFiles(failedState)
+				if inputFiles is None:
+					inputFiles = ordered_set.OrderedSet()
+			raise csbuild.BuildFailureException(buildProject, inputFiles, info)
+		if status != _SUCCEEDED:
+			raise WorkerProcessError(buildTool.__name__, value)
+		return value
+
+	def _dropWorker(self, connection):
+		connection.close()
+		#pylint: disable=not-context-manager
+		with self._lock:
+			self._numAlive -= 1
+			if self._numAlive == 0:
+				# Nothing would ever be put back on the idle queue again, so anything waiting on it is woken up instead
+				self._idle.Put(None)
+
+### Unit Tests ###
+
+class TestProcessRunner(testcase.TestCase):
+	"""Test the worker process pool"""
+
+	class _FakeToolchain(object):
+		def __init__(self, tools):
+			self.tools = tools
+
+		def GetAllTools(self):
+			"""Stand-in for Toolchain.GetAllTools"""
+			return self.tools
+
+		def Use(self, tool):
+			"""Stand-in for Toolchain.Use"""
+			del tool
+
+			class _context(object):
+				def __enter__(self):
+					pass
+
+				def __exit__(self, excType, excVal, tb):
+					return False
+
+			return _context()
+
+	class _FakeProject(project.Project):
+		# pylint: disable=super-init-not-called
+		def __init__(self, toolchain):
+			self.toolchain = toolchain
+
+	class _PidTool(object):
+		@staticmethod
+		def Run(toolchain, inputProject, inputFile):
+			"""Return the pid of the process the tool ran in"""
+			del toolchain, inputProject
+			return "{}:{}".format(os.path.basename(inputFile.filename), os.getpid())
+
+		@staticmethod
+		def RunGroup(toolchain, inputProject, inputFiles):
+			"""Return the inputs in order"""
+			del toolchain, inputProject
+			return tuple(os.path.basename(inputFile.filename) for inputFile in inputFiles)
+
+	class _RaisingTool(object):
+		@staticmethod
+		def Run(toolchain, inputProject, inputFile):
+			"""Raise an exception"""
+			del toolchain, inputProject, inputFile
+			raise ValueError("Raised on purpose")
+
+	class _FailingTool(object):
+		@staticmethod
+		def Run(toolchain, inputProject, inputFile):
+			"""Fail the build, naming the files a null-input tool would have made as the inputs"""
+			del toolchain, inputFile
+			raise csbuild.BuildFailureException(inputProject, ordered_set.OrderedSet([input_file.InputFile("generated.txt")]), "Failed on purpose")
+
+	def _makeRunner(self):
+		if not IsSupported():
+			self.skipTest("Worker processes are not supported on this platform")
+		tools = [TestProcessRunner._PidTool, TestProcessRunner._RaisingTool, TestProcessRunner._FailingTool]
+		buildProject = TestProcessRunner._FakeProject(TestProcessRunner._FakeToolchain(tools))
+		return ProcessRunner(2, [buildProject]), buildProject
+
+	# pylint: disable=invalid-name
+	def testRun(self):
+		"""Test that tools run in another process and their results come back"""
+		runner, buildProject = self._makeRunner()
+		try:
+			result = runner.Run(TestProcessRunner._PidTool, buildProject.toolchain, buildProject, input_file.InputFile("a.txt"))
+			name, pid = result.split(":")
+			self.assertEqual("a.txt", name)
+			self.assertNotEqual(os.getpid(), int(pid))
+
+			inputs = ordered_set.OrderedSet([input_file.InputFile("b.txt"), input_file.InputFile("c.txt")])
+			self.assertEqual(("b.txt", "c.txt"), runner.Run(TestProcessRunner._PidTool, buildProject.toolchain, buildProject, inputs))
+		finally:
+			runner.Stop()
+
+	def testException(self):
+		"""Test that exceptions raised in a worker are raised again in the parent with the worker's traceback"""
+		runner, buildProject = self._makeRunner()
+		try:
+			with self.assertRaises(WorkerProcessError) as context:
+				runner.Run(TestProcessRunner._RaisingTool, buildProject.toolchain, buildProject, input_file.InputFile("a.txt"))
+			self.assertIn("Raised on purpose", context.exception.remoteTraceback)
+		finally:
+			runner.Stop()
+
+	def testNullInputBuildFailure(self):
+		"""Test that a null-input tool failing the build fails it in the parent too, with the inputs it named"""
+		runner, buildProject = self._makeRunner()
+		try:
+			with self.assertRaises(csbuild.BuildFailureException) as context:
+				runner.Run(TestProcessRunner._FailingTool, buildProject.toolchain, buildProject, None)
+			self.assertEqual("Failed on purpose", context.exception.info)
+			self.assertEqual(["generated.txt"], [os.path.basename(inputFile.filename) for inputFile in context.exception.inputFile])
+		finally:
+			runner.Stop()
+
+	def testDeadWorkers(self):
+		"""Test that workers that die are dropped, and tasks fail rather than wait once they're all gone"""
+		runner, buildProject = self._makeRunner()
+		try:
+			processes = [process for process, _ in runner._processes] # pylint: disable=protected-access
+			processes[0].terminate()
+			processes[0].join()
+			with self.assertRaises(WorkerProcessError):
+				runner.Run(TestProcessRunner._PidTool, buildProject.toolchain, buildProject, input_file.InputFile("a.txt"))
+			for _ in range(3):
+				result = runner.Run(TestProcessRunner._PidTool, buildProject.toolchain, buildProject, input_file.InputFile("a.txt"))
+				self.assertEqual(processes[1].pid, int(result.split(":")[1]))
+
+			processes[1].terminate()
+			processes[1].join()
+			for _ in range(2):
+				with self.assertRaises(WorkerProcessError):
+					runner.Run(TestProcessRunner._PidTool, buildProject.toolchain, buildProject, input_file.InputFile("a.txt"))
+		finally:
+			runner.Stop()
@@ -35,7 +35,7 @@ from .. import log, perf_timer
 from .._utils import ordered_set, shared_globals, StrType, BytesType, PlatformString, PlatformUnicode
 from .._utils.decorators import TypeChecked
 from .._utils.string_abc import String
-from .._build import input_file
+from .._build import input_file, artifact_index
 from ..toolchain.toolchain import Toolchain
 
 class UserData(object):
@@ -203,9 +203,17 @@ class Project(object):
 			if not os.access(self.csbuildDir, os.F_OK):
 				os.makedirs(self.csbuildDir)
 
-			self.lastRunArtifacts = shared_globals.settings.Get(repr(self)+".artifacts", collections.OrderedDict())
+			#: type: artifact_index.ArtifactIndex
+			self.artifactIndex = shared_globals.settings.Get(repr(self)+".artifactIndex", None)
+			if self.artifactIndex is None:
+				self.artifactIndex = artifact_index.ArtifactIndex()
 
-			self.artifacts = collections.OrderedDict()
+			# id() of a group of inputs -> (the group, its artifact index key)
+			self._artifactKeys = {}
+
+			self.outputDigests = shared_globals.settings.Get(repr(self)+".outputDigests", {})
+
+			self.interfaceDigests = shared_globals.settings.Get(repr(self)+".interfaceDigests", {})
 
 			self.outputName = self.settings.get("outputName", self.name)
 
@@ -219,7 +227,9 @@ class Project(object):
 			#: type: dict[str, set[csbuild._build.input_file.InputFile]]
 			self.inputFiles = {}
 
-			self.RediscoverFiles()
+			# When fingerprints are in use, files are only discovered once it's known the project isn't being skipped
+			if not shared_globals.useProjectFingerprints:
+				self.RediscoverFiles()
 
 	def __repr__(self):
 		return "{} ({}-{}-{})".format(self.name, self.toolchainName, self.architectureName, self.targetName)
@@ -278,18 +288,104 @@ class Project(object):
 		:param artifact: absolute path to the file
 		:type artifact: str
 		"""
-		if shared_globals.runMode == shared_globals.RunMode.GenerateSolution:
-			if artifact not in self.artifacts.get(inputs, {}):
-				self.artifacts.setdefault(inputs, ordered_set.OrderedSet()).add(artifact)
-			return
-
-		if inputs is not None:
-			if isinstance(inputs, input_file.InputFile):
-				inputs = [inputs]
-			inputs = tuple(sorted(i.filename for i in inputs))
-		if artifact not in self.artifacts.get(inputs, {}):
-			self.artifacts.setdefault(inputs, ordered_set.OrderedSet()).add(artifact)
-			shared_globals.settings.Save(repr(self)+".artifacts", self.artifacts)
+		if self.artifactIndex.AddArtifact(self._getArtifactKey(inputs), artifact) \
+				and shared_globals.runMode != shared_globals.RunMode.GenerateSolution:
+			shared_globals.settings.Save(repr(self)+".artifactIndex", self.artifactIndex)
+
+	@TypeChecked(inputs=(input_file.InputFile, list, ordered_set.OrderedSet), toolName=String, signature=String)
+	def AddSignature(self, inputs, toolName, signature):
+		"""
+		Record the digest of the command signature a tool built a set of inputs with, as returned by
+		recompile.GetSignatureDigest(). Thread-safe.
+
+		:param inputs: The input or inputs that were built
+		:type inputs: input_file.InputFile or list[input_file.InputFile] or ordered_set.OrderedSet[input_file.InputFile]
+		:param toolName: Name of the tool that built them
+		:type toolName: str
+		:param signature: The digest
+		:type signature: str
+		"""
+		if self.artifactIndex.AddSignature(self._getArtifactKey(inputs), toolName, signature):
+			shared_globals.settings.Save(repr(self)+".artifactIndex", self.artifactIndex)
+
+	@TypeChecked(inputs=(input_file.InputFile, list, ordered_set.OrderedSet), toolName=String)
+	def GetLastSignature(self, inputs, toolName):
+		"""
+		Get the digest of the command signature a tool built a set of inputs with in the last run.
+
+		:param inputs: The input or inputs being built
+		:type inputs: input_file.InputFile or list[input_file.InputFile] or ordered_set.OrderedSet[input_file.InputFile]
+		:param toolName: Name of the tool building them
+		:type toolName: str
+		:return: The digest, or None if none was recorded
+		:rtype: str or None
+		"""
+		return self.artifactIndex.GetLastSignature(self._getArtifactKey(inputs), toolName)
+
+	@TypeChecked(inputs=(input_file.InputFile, list, ordered_set.OrderedSet), hashes=dict)
+	def SetHashBaseline(self, inputs, hashes):
+		"""
+		Record the hash of every file a set of inputs depended on when it was built, for HashCompileChecker to compare
+		against in later runs. Thread-safe.
+
+		:param inputs: The input or inputs that were built
+		:type inputs: input_file.InputFile or list[input_file.InputFile] or ordered_set.OrderedSet[input_file.InputFile]
+		:param hashes: Hash of each file, by absolute path
+		:type hashes: dict[str, str]
+		"""
+		if self.artifactIndex.SetHashBaseline(self._getArtifactKey(inputs), hashes):
+			shared_globals.settings.Save(repr(self)+".artifactIndex", self.artifactIndex)
+
+	@TypeChecked(inputs=(input_file.InputFile, list, ordered_set.OrderedSet))
+	def GetLastHashBaseline(self, inputs):
+		"""
+		Get the hash of every file a set of inputs depended on the last time it was built.
+
+		:param inputs: The input or inputs being built
+		:type inputs: input_file.InputFile or list[input_file.InputFile] or ordered_set.OrderedSet[input_file.InputFile]
+		:return: Hash of each file, by absolute path, or None if none was recorded
+		:rtype: dict[str, str] or None
+		"""
+		return self.artifactIndex.GetLastHashBaseline(self._getArtifactKey(inputs))
+
+	@TypeChecked(outputFile=String, digest=String, _return=bool)
+	def UpdateOutputDigest(self, outputFile, digest):
+		"""
+		Record the digest of the contents of an output that was just built, as returned by
+		recompile.GetOutputDigest(). Thread-safe.
+
+		:param outputFile: The output
+		:type outputFile: str
+		:param digest: The digest
+		:type digest: str
+		:return: True if the contents are different from the last time the output was built, or it's never been built
+		:rtype: bool
+		"""
+		return self._updateDigest(self.outputDigests, ".outputDigests", outputFile, digest)
+
+	@TypeChecked(outputFile=String, digest=String, _return=bool)
+	def UpdateInterfaceDigest(self, outputFile, digest):
+		"""
+		Record the digest of the interface of an output that was just built, as returned by the GetOutputInterface()
+		method of the tool that built it. Thread-safe.
+
+		:param outputFile: The output
+		:type outputFile: str
+		:param digest: The digest
+		:type digest: str
+		:return: True if the interface is different from the last time the output was built, or it's never been built
+		:rtype: bool
+		"""
+		return self._updateDigest(self.interfaceDigests, ".interfaceDigests", outputFile, digest)
+
+	def _updateDigest(self, digests, settingName, outputFile, digest):
+		#pylint: disable=not-context-manager
+		with Project._lock:
+			if digests.get(outputFile) == digest:
+				return False
+			digests[outputFile] = digest
+			shared_globals.settings.Save(repr(self)+settingName, digests)
+			return True
 
 	@TypeChecked(inputs=(input_file.InputFile, list, ordered_set.OrderedSet))
 	def GetLastResult(self, inputs):
@@ -301,14 +397,26 @@ class Project(object):
 		:return: The list of outputs from the last run
 		:rtype: ordered_set.OrderedSet[str]
 		"""
+		return self.artifactIndex.GetLastArtifacts(self._getArtifactKey(inputs))
+
+	def _getArtifactKey(self, inputs):
+		if inputs is None:
+			return None
 		if isinstance(inputs, input_file.InputFile):
-			inputs = [inputs]
-		inputs = tuple(sorted(i.filename for i in inputs))
-		return self.lastRunArtifacts.get(inputs, None)
+			return self.artifactIndex.GetKey(inputs.filename)
+		if len(inputs) == 1:
+			return self.artifactIndex.GetKey(next(iter(inputs)).filename)
+		# Groups are looked up several times each build, so their keys are only gotten once. Holding onto the group
+		# keeps its id() from being reused.
+		memo = self._artifactKeys.get(id(inputs))
+		if memo is None or memo[0] is not inputs:
+			memo = (inputs, self.artifactIndex.GetKey(inputFile.filename for inputFile in inputs))
+			self._artifactKeys[id(inputs)] = memo
+		return memo[1]
 
 	def ClearArtifacts(self):
 		"""Remove the artifacts for this project from the settings"""
-		shared_globals.settings.Delete(repr(self)+".artifacts")
+		shared_globals.settings.Delete(repr(self)+".artifactIndex")
 
 	@TypeChecked(inputFile=input_file.InputFile, _return=StrType)
 	def GetIntermediateDirectory(self, inputFile):
@@ -323,15 +431,58 @@ class Project(object):
 		directory = os.path.join(self.intermediateDir, self.name, inputFile.uniqueDirectoryId)
 
 		#TODO: Investigate a lock-free solution to creating this directory.
-		if not os.access(directory, os.F_OK):
+		if not shared_globals.statCache.Exists(directory):
 			# Lock in case multiple threads get here at the same time.
 			#pylint: disable=not-context-manager
 			with Project._lock:
 				# If the directory still does not exist, create it.
 				if not os.access(directory, os.F_OK):
 					os.makedirs(directory)
+					shared_globals.statCache.Invalidate(directory)
 		return PlatformUnicode(directory)
 
+	def GetSearchDirectories(self):
+		"""
+		Get the directories file discovery searches for source files
+
+		:return: The directories
+		:rtype: ordered_set.OrderedSet[str]
+		"""
+		searchDirectories = ordered_set.OrderedSet(self.sourceDirs)
+
+		if self.autoDiscoverSourceFiles:
+			searchDirectories |= ordered_set.OrderedSet([self.workingDirectory])
+
+		return searchDirectories
+
+	def IsExcludedDirectory(self, directory):
+		"""
+		Check whether file discovery skips the files in a directory, either because it's been excluded or because it
+		holds csbuild's own files or the build's intermediate files or outputs
+
+		:param directory: The directory
+		:type directory: str
+		:return: True if its files aren't source files for this project
+		:rtype: bool
+		"""
+		absdir = os.path.abspath(directory)
+		if absdir in self.excludeDirs:
+			if absdir != self.csbuildDir:
+				log.Info("Skipping dir {}", directory)
+			return True
+		if ".csbuild" in directory \
+				or directory.startswith(self.intermediateDir) \
+				or (directory.startswith(self.outputDir) and self.outputDir != self.workingDirectory):
+			return True
+		if absdir == self.csbuildDir or absdir.startswith(self.csbuildDir):
+			return True
+		for testDir in self.excludeDirs:
+			if absdir.startswith(testDir):
+				if not absdir.startswith(self.csbuildDir):
+					log.Info("Skipping directory {}", directory)
+				return True
+		return False
+
 	def RediscoverFiles(self):
 		"""
 		(Re)-Run source file discovery.
@@ -345,11 +496,6 @@ class Project(object):
 			log.Info("Discovering files for {}...", self)
 			self.inputFiles = {}
 
-			searchDirectories = ordered_set.OrderedSet(self.sourceDirs)
-
-			if self.autoDiscoverSourceFiles:
-				searchDirectories |= ordered_set.OrderedSet([self.workingDirectory])
-
 			extensionList = self.toolchain.GetSearchExtensions()
 
 			excludeFiles = [
@@ -358,31 +504,14 @@ class Project(object):
 			]
 
 			with perf_timer.PerfTimer("Walking working dir"):
-				for sourceDir in searchDirectories:
+				for sourceDir in self.GetSearchDirectories():
 					log.Build("Collecting files from {}", sourceDir)
-					for root, _, filenames in os.walk(sourceDir):
+					for root, _, filenames in shared_globals.statCache.Walk(sourceDir):
 						if not filenames:
 							continue
-						absroot = os.path.abspath(root)
-						if absroot in self.excludeDirs:
-							if absroot != self.csbuildDir:
-								log.Info("Skipping dir {}", root)
-							continue
-						if ".csbuild" in root \
-								or root.startswith(self.intermediateDir) \
-								or (root.startswith(self.outputDir) and self.outputDir != self.workingDirectory):
-							continue
-						if absroot == self.csbuildDir or absroot.startswith(self.csbuildDir):
-							continue
-						found = False
-						for testDir in self.excludeDirs:
-							if absroot.startswith(testDir):
-								found = True
-								continue
-						if found:
-							if not absroot.startswith(self.csbuildDir):
-								log.Info("Skipping directory {}", root)
+						if self.IsExcludedDirectory(root):
 							continue
+						absroot = os.path.abspath(root)
 						log.Info("Looking in directory {}", root)
 						with perf_timer.PerfTimer("Collecting files"):
 							for extension in extensionList:
@@ -392,7 +521,6 @@ class Project(object):
 										input_file.InputFile(
 											os.path.join(absroot, filename)
 										) for filename in filenames if os.path.splitext(filename)[1] == extension
-										and os.path.join(absroot, filename) not in self.lastRunArtifacts
 										and os.path.join(absroot, filename) not in excludeFiles
 									]
 								)
@@ -0,0 +1,369 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: readiness
+	:synopsis: Index of which build tasks may have become ready to run
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+from .. import log
+from .._utils import ordered_set
+from .._testing import testcase
+
+class ReadinessTracker(object):
+	"""
+	Keeps track of which inputs each tool has yet to process and which tools are waiting on which outputs, so that
+	finishing a task only has to look at the tools and inputs it could actually have unblocked instead of rescanning
+	every input of every project.
+
+	The tracker must be told about every input added to or removed from a project after it's created, and about every
+	tool that's used on an input.
+
+	:param projects: All projects participating in the build
+	:type projects: list[csbuild._build.project.Project]
+	"""
+	def __init__(self, projects):
+		# (project, tool, extension) -> inputs of that extension in that project the tool hasn't been used on yet
+		self._pending = {}
+		# (project, extension) -> tools that have a pending set for that extension
+		self._trackingTools = {}
+		# input -> (project, extension) it was registered under
+		self._owners = {}
+		# (project, extension) -> tools in that project that may be able to run once the extension is no longer active
+		self._localWaiters = {}
+		# (project, extension) -> (dependent project, tool) pairs that may be able to run once the extension is no longer
+		# active in that project
+		self._crossProjectWaiters = {}
+		# (project, tool) -> extensions that may stop being active when a task for that tool finishes
+		self._affectedOutputs = {}
+
+		for project in projects:
+			tools = project.toolchain.GetAllTools()
+			allOutputs = set()
+			for tool in tools:
+				allOutputs |= tool.outputFiles
+
+			for tool in tools:
+				extensions = tool.inputGroups | tool.crossProjectInputGroups
+				if tool.inputFiles is not None:
+					extensions = extensions | tool.inputFiles
+				for extension in extensions:
+					self._pending[(project, tool, extension)] = ordered_set.OrderedSet(
+						[x for x in project.inputFiles.get(extension, []) if not x.WasToolUsed(tool)]
+					)
+					self._trackingTools.setdefault((project, extension), []).append(tool)
+
+				for extension in extensions | tool.dependencies:
+					self._localWaiters.setdefault((project, extension), ordered_set.OrderedSet()).add(tool)
+
+				crossProjectExtensions = tool.crossProjectDependencies | tool.crossProjectInputGroups
+				for dependProject in project.dependencies:
+					for extension in crossProjectExtensions:
+						self._crossProjectWaiters.setdefault((dependProject, extension), []).append((project, tool))
+
+				self._affectedOutputs[(project, tool)] = sorted(
+					[x for x in allOutputs if project.toolchain.CanCreateOutput(tool, x)]
+				)
+
+			for extension, inputs in project.inputFiles.items():
+				for inputFile in inputs:
+					self._owners[inputFile] = (project, extension)
+
+	def AddInput(self, project, extension, inputFile):
+		"""
+		Register a new input that has been added to a project
+
+		:param project: The project the input was added to
+		:type project: csbuild._build.project.Project
+		:param extension: The input's extension
+		:type extension: str
+		:param inputFile: The input
+		:type inputFile: csbuild._build.input_file.InputFile
+		"""
+		self._owners[inputFile] = (project, extension)
+		for tool in self._trackingTools.get((project, extension), ()):
+			if not inputFile.WasToolUsed(tool):
+				self._pending[(project, tool, extension)].add(inputFile)
+
+	def RemoveInput(self, project, extension, inputFile):
+		"""
+		Unregister an input that has been removed from a project
+
+		:param project: The project the input was removed from
+		:type project: csbuild._build.project.Project
+		:param extension: The input's extension
+		:type extension: str
+		:param inputFile: The input
+		:type inputFile: csbuild._build.input_file.InputFile
+		"""
+		self._owners.pop(inputFile, None)
+		for tool in self._trackingTools.get((project, extension), ()):
+			self._pending[(project, tool, extension)].discard(inputFile)
+
+	def MarkUsed(self, inputFile, tool):
+		"""
+		Record that a tool has been used on an input, so it's no longer pending for that tool
+
+		:param inputFile: The input
+		:type inputFile: csbuild._build.input_file.InputFile
+		:param tool: The tool
+		:type tool: type
+		"""
+		owner = self._owners.get(inputFile)
+		if owner is None:
+			return
+		pending = self._pending.get((owner[0], tool, owner[1]))
+		if pending is not None:
+			pending.discard(inputFile)
+
+	def HasPending(self, project, tool, extension):
+		"""
+		Check whether there are any inputs of the given extension the tool has yet to be used on
+
+		:param project: The project to check
+		:type project: csbuild._build.project.Project
+		:param tool: The tool to check
+		:type tool: type
+		:param extension: The extension to check
+		:type extension: str or None
+		:return: True if any inputs are pending
+		:rtype: bool
+		"""
+		return bool(self._pending.get((project, tool, extension)))
+
+	def GetPending(self, project, tool, extension, limit=None):
+		"""
+		Get the inputs of the given extension the tool has yet to be used on, in the order they were added
+
+		:param project: The project to check
+		:type project: csbuild._build.project.Project
+		:param tool: The tool to check
+		:type tool: type
+		:param extension: The extension to check
+		:type extension: str
+		:param limit: Maximum number of inputs to return, or None to return all of them
+		:type limit: int or None
+		:return: The pending inputs
+		:rtype: list[csbuild._build.input_file.InputFile]
+		"""
+		pending = self._pending.get((project, tool, extension))
+		if not pending:
+			return []
+		if limit is None:
+			return list(pending)
+		ret = []
+		if limit <= 0:
+			return ret
+		for inputFile in pending:
+			ret.append(inputFile)
+			if len(ret) == limit:
+				break
+		return ret
+
+	def GetAffectedOutputs(self, project, tool):
+		"""
+		Get the extensions that may stop being active in a project when a task for the given tool finishes
+
+		:param project: The project the task belongs to
+		:type project: csbuild._build.project.Project
+		:param tool: The tool that ran the task
+		:type tool: type
+		:return: List of extensions
+		:rtype: list[str]
+		"""
+		return self._affectedOutputs.get((project, tool), ())
+
+	def GetWaitingTools(self, project, extension):
+		"""
+		Get the tools in a project that may be able to run once the given extension is no longer active in it
+
+		:param project: The project
+		:type project: csbuild._build.project.Project
+		:param extension: The extension
+		:type extension: str
+		:return: The tools
+		:rtype: ordered_set.OrderedSet[type]
+		"""
+		return self._localWaiters.get((project, extension), ())
+
+	def GetCrossProjectWaiters(self, project, extension):
+		"""
+		Get the tools in dependent projects that may be able to run once the given extension is no longer active
+		in a project
+
+		:param project: The project
+		:type project: csbuild._build.project.Project
+		:param extension: The extension
+		:type extension: str
+		:return: (dependent project, tool) pairs
+		:rtype: list[tuple[csbuild._build.project.Project, type]]
+		"""
+		return self._crossProjectWaiters.get((project, extension), ())
+
+### Unit Tests ###
+
+class TestReadinessTracker(testcase.TestCase):
+	"""Test the readiness tracker"""
+
+	# pylint: disable=invalid-name
+	class _Tool(object):
+		inputFiles = set()
+		inputGroups = set()
+		crossProjectInputGroups = set()
+		dependencies = set()
+		crossProjectDependencies = set()
+		outputFiles = set()
+
+	class _Toolchain(object):
+		def __init__(self, tools):
+			self.tools = tools
+
+		def GetAllTools(self):
+			"""Get the tools"""
+			return self.tools
+
+		def CanCreateOutput(self, tool, extension):
+			"""Whether the tool creates the output, directly or indirectly"""
+			if extension in tool.outputFiles:
+				return True
+			for other in self.tools:
+				if other is not tool and tool.outputFiles & (other.inputFiles | other.inputGroups) and extension in other.outputFiles:
+					return True
+			return False
+
+	class _Project(object):
+		def __init__(self, name, tools, inputFiles, dependencies=None):
+			self.name = name
+			self.toolchain = TestReadinessTracker._Toolchain(tools)
+			self.inputFiles = inputFiles
+			self.dependencies = dependencies or []
+
+	def _makeTools(self):
+		class Compiler(self._Tool):
+			"""Compiler"""
+			inputFiles = {".cpp"}
+			outputFiles = {".o"}
+
+		class Linker(self._Tool):
+			"""Linker"""
+			inputGroups = {".o"}
+			crossProjectDependencies = {".a"}
+			outputFiles = {".a"}
+
+		return Compiler, Linker
+
+	def _makeInputs(self, count):
+		from .input_file import InputFile
+		return ordered_set.OrderedSet([InputFile("{}.cpp".format(i)) for i in range(count)])
+
+	def testPendingInputs(self):
+		"""Test that inputs stop being pending once they're used or removed"""
+		from .input_file import InputFile
+		Compiler, Linker = self._makeTools()
+		inputs = self._makeInputs(4)
+		project = self._Project("proj", [Compiler, Linker], {".cpp": inputs})
+		tracker = ReadinessTracker([project])
+
+		self.assertEqual(list(inputs), tracker.GetPending(project, Compiler, ".cpp"))
+		self.assertEqual(list(inputs)[:2], tracker.GetPending(project, Compiler, ".cpp", 2))
+		self.assertFalse(tracker.HasPending(project, Linker, ".o"))
+		self.assertFalse(tracker.HasPending(project, Compiler, None))
+
+		inputList = list(inputs)
+		inputList[0].AddUsedTool(Compiler)
+		tracker.MarkUsed(inputList[0], Compiler)
+		tracker.RemoveInput(project, ".cpp", inputList[1])
+		self.assertEqual(inputList[2:], tracker.GetPending(project, Compiler, ".cpp"))
+
+		for inputFile in inputList[2:]:
+			inputFile.AddUsedTool(Compiler)
+			tracker.MarkUsed(inputFile, Compiler)
+		self.assertFalse(tracker.HasPending(project, Compiler, ".cpp"))
+
+		# Outputs made from an input inherit its tools, so a compiler's output won't be pending for the compiler again
+		obj = InputFile("0.o", inputList[0])
+		tracker.AddInput(project, ".o", obj)
+		self.assertEqual([obj], tracker.GetPending(project, Linker, ".o"))
+
+	def testWaiters(self):
+		"""Test that tools are found by the outputs they're waiting on"""
+		Compiler, Linker = self._makeTools()
+		lib = self._Project("lib", [Compiler, Linker], {".cpp": self._makeInputs(1)})
+		app = self._Project("app", [Compiler, Linker], {".cpp": self._makeInputs(1)}, [lib])
+		tracker = ReadinessTracker([lib, app])
+
+		self.assertEqual([Linker], list(tracker.GetWaitingTools(app, ".o")))
+		self.assertEqual([Compiler], list(tracker.GetWaitingTools(app, ".cpp")))
+		self.assertEqual([(app, Linker)], list(tracker.GetCrossProjectWaiters(lib, ".a")))
+		self.assertEqual([], list(tracker.GetCrossProjectWaiters(app, ".a")))
+		self.assertEqual([".a", ".o"], tracker.GetAffectedOutputs(lib, Compiler))
+		self.assertEqual([".a"], tracker.GetAffectedOutputs(lib, Linker))
+
+	def testScaling(self):
+		"""
+		Test that bookkeeping for each finished task costs the same regardless of the number of inputs,
+		rather than growing with it the way rescanning every input does
+		"""
+		import time
+		from .input_file import InputFile
+		Compiler, Linker = self._makeTools()
+
+		# Rescanning means asking every input whether each tool was used on it, so count how often that's asked
+		checks = [0]
+		wasToolUsed = InputFile.WasToolUsed
+		def _countingWasToolUsed(inputFile, tool):
+			checks[0] += 1
+			return wasToolUsed(inputFile, tool)
+
+		costPerTask = {}
+		InputFile.WasToolUsed = _countingWasToolUsed
+		try:
+			for count in (1000, 10000, 100000):
+				inputs = self._makeInputs(count)
+				project = self._Project("proj", [Compiler, Linker], {".cpp": inputs})
+				tracker = ReadinessTracker([project])
+
+				checks[0] = 0
+				start = time.time()
+				for inputFile in inputs:
+					# Same sequence of calls a compile task goes through from being enqueued to being finished
+					inputFile.AddUsedTool(Compiler)
+					tracker.MarkUsed(inputFile, Compiler)
+					tracker.HasPending(project, Compiler, ".cpp")
+					tracker.GetPending(project, Compiler, ".cpp", 1)
+					for tool in tracker.GetWaitingTools(project, ".o"):
+						tracker.HasPending(project, tool, ".o")
+				costPerTask[count] = (time.time() - start) / count
+				self.assertFalse(tracker.HasPending(project, Compiler, ".cpp"))
+				self.assertEqual(0, checks[0])
+		finally:
+			InputFile.WasToolUsed = wasToolUsed
+
+		# The times depend on the machine and what else it's doing, so they're only logged
+		log.Test(
+			"Readiness bookkeeping per task: {:.2f}us at 1k inputs, {:.2f}us at 10k, {:.2f}us at 100k",
+			costPerTask[1000] * 1000000,
+			costPerTask[10000] * 1000000,
+			costPerTask[100000] * 1000000
+		)
@@ -25,14 +25,65 @@
 
 from __future__ import unicode_literals, division, print_function
 
+import hashlib
+import numbers
 import os
+import sys
+import threading
+
+import csbuild
 
 from . import project
-from .._utils import ordered_set, shared_globals, PlatformString
+from .dependency_index import DependencyIndex
+from .._utils import ordered_set, shared_globals, PlatformString, PlatformBytes
+from .._utils.artifact_cache import GetTransitiveDependencies
 from ..toolchain import CompileChecker
 from .._utils.decorators import TypeChecked
+from .._utils.string_abc import String
 from .. import perf_timer, log
 
+_indexes = {}
+_indexLock = threading.Lock()
+
+# Project -> digest of everything that goes into it, as of when it was checked by FindUnchangedProjects()
+_inputsDigests = {}
+_makefileDigest = None
+
+def _getIndexSettingsKey(buildProject):
+	return repr(buildProject) + ".dependencyIndex"
+
+def _getIndex(buildProject):
+	key = _getIndexSettingsKey(buildProject)
+	index = _indexes.get(key)
+	#Double-check lock pattern
+	if index is None:
+		#pylint: disable=not-context-manager
+		with _indexLock:
+			index = _indexes.get(key)
+			if index is None:
+				index = DependencyIndex(shared_globals.settings.GetRecords(key))
+				_indexes[key] = index
+	return index
+
+def _persistIndex(buildProject, index):
+	key = _getIndexSettingsKey(buildProject)
+	for inputsKey, record in index.TakeChanges().items():
+		if record is None:
+			shared_globals.settings.DeleteRecord(key, inputsKey)
+		else:
+			shared_globals.settings.SaveRecord(key, inputsKey, record)
+
+def _getIndexKey(inputFiles):
+	return tuple(sorted(os.path.abspath(PlatformString(inputFile.filename)) for inputFile in inputFiles))
+
+def _getMakefile():
+	# Anything the index doesn't know to look for, like changes to include directories, is most likely to come from a
+	# change to the makefile, so everything depends on it
+	mainFile = getattr(sys.modules["__main__"], "__file__", None)
+	if mainFile is None:
+		return None
+	return os.path.abspath(mainFile)
+
 def CheckCompilabilityForFile(buildProject, checker, inputFile, valueMemo, allDeps):
 	"""
 	Check compatibility for a single file
@@ -44,14 +95,15 @@ def CheckCompilabilityForFile(buildProject, checker, inputFile, valueMemo, allDe
 	:param inputFile: Input file to check
 	:type inputFile: str
 	:param valueMemo: memo to collect memoized values from
-	:type valueMemo: dict
+	:type valueMemo: memo.Memo
 	:param allDeps: All processed dependencies for a given set of checked files used to avoid redundant processing when there are recursive includes.
 	:type allDeps: set[str]
 	:return: A value with a blocking Get() and not-blocking TryGet()
 	:rtype: any
 	"""
-	if inputFile in valueMemo:
-		return valueMemo[inputFile]
+	value = valueMemo.Get(inputFile)
+	if value is not None:
+		return value
 
 	with perf_timer.PerfTimer("Non-memoized compilability check"):
 		values = [checker.GetRecompileValue(buildProject, inputFile)]
@@ -63,14 +115,12 @@ def CheckCompilabilityForFile(buildProject, checker, inputFile, valueMemo, allDe
 
 		# When using cached dependencies, some files may no longer exist. Such cases should be seen by the user as
 		# an error during compilation, not an obscure Python exception because we're trying to check its timestamp.
-		deps = {f for f in deps if os.access(f, os.F_OK)}
+		deps = {f for f in deps if shared_globals.statCache.Exists(f)}
 
 		allDeps.update(deps)
 		values.extend([CheckCompilabilityForFile(buildProject, checker, dep, valueMemo, allDeps) for dep in deps])
 
-		value = checker.CondenseRecompileChecks(values)
-		valueMemo[inputFile] = value
-		return value
+		return valueMemo.SetDefault(inputFile, checker.CondenseRecompileChecks(values))
 
 @TypeChecked(buildProject=project.Project, checker=CompileChecker, inputFiles=ordered_set.OrderedSet)
 def ShouldRecompile(buildProject, checker, inputFiles):
@@ -91,10 +141,271 @@ def ShouldRecompile(buildProject, checker, inputFiles):
 			# All files should be "compiled" when generating a solution.
 			return True
 		log.Info("Checking if we should compile {}", inputFiles)
+		if _getIndex(buildProject).IsUpToDate(_getIndexKey(inputFiles)):
+			lastResult = buildProject.GetLastResult(inputFiles)
+			if lastResult is not None and all(shared_globals.statCache.Exists(outputFile) for outputFile in lastResult):
+				log.Info("Dependency index shows no changes to {} or anything it depends on", inputFiles)
+				return False
 		baseline = checker.GetRecompileBaseline(buildProject, inputFiles)
 		if baseline is None:
 			return True
 		values = [CheckCompilabilityForFile(buildProject, checker, os.path.abspath(PlatformString(f.filename)), checker.memo, set()) for f in inputFiles]
 
 		with perf_timer.PerfTimer("Cross-thread Final Resolution"):
-			return checker.ShouldRecompile(checker.CondenseRecompileChecks(values), baseline)
+			if checker.ShouldRecompile(checker.CondenseRecompileChecks(values), baseline):
+				return True
+		_recordUpToDate(buildProject, checker, inputFiles)
+		return False
+
+def _recordUpToDate(buildProject, checker, inputFiles):
+	filenames = set()
+	for inputFile in inputFiles:
+		filename = os.path.abspath(PlatformString(inputFile.filename))
+		filenames.add(filename)
+		filenames.update(GetTransitiveDependencies(buildProject, checker, filename))
+	makefile = _getMakefile()
+	if makefile is not None:
+		filenames.add(makefile)
+	index = _getIndex(buildProject)
+	index.Record(_getIndexKey(inputFiles), filenames)
+	_persistIndex(buildProject, index)
+
+@TypeChecked(buildProject=project.Project, checker=CompileChecker, inputFiles=ordered_set.OrderedSet)
+def UpdateBaseline(buildProject, checker, inputFiles):
+	"""
+	Record whatever's needed to know, in later builds, whether a file or list of files that were just built
+	successfully have changed since.
+
+	:param buildProject: Project encapsulating the files being built
+	:type buildProject: project.Project
+	:param checker: Compile checker the files were checked with
+	:type checker: CompileChecker
+	:param inputFiles: files that were built
+	:type inputFiles: ordered_set.OrderedSet[input_file.InputFile]
+	"""
+	with perf_timer.PerfTimer("Update recompile baseline"):
+		checker.UpdateBaseline(buildProject, inputFiles)
+		_recordUpToDate(buildProject, checker, inputFiles)
+
+def _hashSignature(hasher, value):
+	if isinstance(value, dict):
+		hasher.update(b"{")
+		for key in sorted(value):
+			_hashSignature(hasher, key)
+			_hashSignature(hasher, value[key])
+		hasher.update(b"}")
+	elif isinstance(value, (list, tuple)):
+		hasher.update(b"[")
+		for item in value:
+			_hashSignature(hasher, item)
+		hasher.update(b"]")
+	elif value is None:
+		hasher.update(b"\0None")
+	else:
+		if not isinstance(value, String):
+			value = str(value)
+		hasher.update(b"\0")
+		hasher.update(PlatformBytes(value))
+		# Response files are usually written just before this is called, so they're checked directly
+		# rather than through the stat cache
+		if value.startswith("@") and os.path.isfile(value[1:]):
+			with open(value[1:], "rb") as f:
+				hasher.update(f.read())
+
+def GetSignatureDigest(signature):
+	"""
+	Get a digest of a tool's command signature, as returned by its GetCommandSignature()
+
+	:param signature: The signature
+	:type signature: any
+	:return: The digest, or None if the signature is None
+	:rtype: str or None
+	"""
+	if signature is None:
+		return None
+	hasher = hashlib.sha1()
+	_hashSignature(hasher, signature)
+	return hasher.hexdigest()
+
+def GetOutputDigest(filename):
+	"""
+	Get a digest of the contents of a file a tool just wrote
+
+	:param filename: The file
+	:type filename: str
+	:return: The digest, or None if the file can't be read
+	:rtype: str or None
+	"""
+	hasher = hashlib.sha1()
+	try:
+		with open(filename, "rb") as f:
+			while True:
+				chunk = f.read(1024 * 1024)
+				if not chunk:
+					break
+				hasher.update(chunk)
+	except (IOError, OSError):
+		return None
+	return hasher.hexdigest()
+
+def _getFingerprintSettingsKey(buildProject):
+	return repr(buildProject) + ".fingerprint"
+
+def _getMakefileDigest():
+	global _makefileDigest
+	if _makefileDigest is None:
+		makefile = _getMakefile()
+		_makefileDigest = (GetOutputDigest(makefile) if makefile is not None else None) or ""
+	return _makefileDigest
+
+def _describeSetting(value, toolNames):
+	# Settings hold tool classes, checkers, and so on, whose reprs include their addresses, so only the parts that are
+	# the same from one run to the next are described: containers and plain values in full, and everything else
+	# by the name of its class.
+	if isinstance(value, dict):
+		return "{" + ",".join(sorted(
+			"{}:{}".format(_describeSettingKey(key, toolNames), _describeSetting(item, toolNames))
+			for key, item in value.items()
+		)) + "}"
+	if isinstance(value, (set, frozenset)):
+		return "{" + ",".join(sorted(_describeSetting(item, toolNames) for item in value)) + "}"
+	if isinstance(value, (list, tuple, ordered_set.OrderedSet)):
+		return "[" + ",".join(_describeSetting(item, toolNames) for item in value) + "]"
+	if value is None or isinstance(value, (String, bytes, numbers.Number)):
+		return repr(value)
+	if isinstance(value, type) or (callable(value) and hasattr(value, "__name__")):
+		return "{}.{}".format(getattr(value, "__module__", ""), getattr(value, "__qualname__", value.__name__))
+	return "<{}>".format(_describeSetting(type(value), toolNames))
+
+def _describeSettingKey(key, toolNames):
+	# Settings for a tool are keyed by the id() of its class, which is different every run
+	if isinstance(key, String) and "!" in key:
+		toolId, _, name = key.partition("!")
+		if toolId in toolNames:
+			return "{}!{}".format(toolNames[toolId], name)
+	return _describeSetting(key, toolNames)
+
+def _hashPathTime(hasher, path):
+	stat = shared_globals.statCache.Stat(path)
+	hasher.update(PlatformBytes("\0{}\0{!r}".format(path, stat.st_mtime if stat is not None else -1)))
+
+def _getInputsDigest(buildProject):
+	for tool in buildProject.tools:
+		if tool.inputFiles is None and not tool.inputGroups and not tool.crossProjectInputGroups:
+			# Tools that don't take any inputs run in every build, so a project with one can't be skipped
+			return None
+
+	# The command line isn't hashed: the toolchain, architecture and target it selects are part of the project's
+	# fingerprint key, and its other options change how the build runs, not what it produces
+	hasher = hashlib.sha1()
+	hasher.update(PlatformBytes(_getMakefileDigest()))
+	toolNames = {}
+	for tool in buildProject.tools:
+		for cls in tool.mro():
+			toolNames[str(id(cls))] = _describeSetting(cls, toolNames)
+	hasher.update(PlatformBytes(_describeSetting(buildProject.settings, toolNames)))
+
+	# Directories change when files are added to or removed from them. Changes to the files themselves are left
+	# to the dependency index, which knows about every input and everything it includes.
+	for sourceDir in buildProject.GetSearchDirectories():
+		for root, dirnames, _ in shared_globals.statCache.Walk(sourceDir):
+			if buildProject.IsExcludedDirectory(root):
+				# Anything under an excluded directory is excluded too
+				del dirnames[:]
+				continue
+			_hashPathTime(hasher, os.path.abspath(root))
+	for filename in sorted(buildProject.sourceFiles):
+		_hashPathTime(hasher, os.path.abspath(filename))
+	return hasher.hexdigest()
+
+def _getOutputsDigest(artifacts):
+	hasher = hashlib.sha1()
+	for artifact in sorted(artifacts):
+		_hashPathTime(hasher, artifact)
+	return hasher.hexdigest()
+
+def _fingerprintMatches(buildProject):
+	if buildProject.projectType == csbuild.ProjectType.Stub:
+		# Stubs aren't built, so they only change when something they depend on does
+		return True
+	inputsDigest = _getInputsDigest(buildProject)
+	_inputsDigests[buildProject] = inputsDigest
+	if inputsDigest is None:
+		return False
+	fingerprint = shared_globals.settings.Get(_getFingerprintSettingsKey(buildProject), None)
+	if fingerprint is None or fingerprint[0] != inputsDigest:
+		return False
+	if fingerprint[1] != _getOutputsDigest(buildProject.artifactIndex.GetAllLastArtifacts()):
+		return False
+	return not _getIndex(buildProject).HasChanges()
+
+@TypeChecked(projects=list, _return=set)
+def FindUnchangedProjects(projects):
+	"""
+	Find the projects that can be skipped entirely because nothing about them has changed since they were last built
+	successfully - not the makefile, their settings, the files in their source directories or anything their inputs
+	depend on, or their outputs. Projects that depend on a project that's changed are changed too, and a changed
+	project needs everything it depends on to be built along with it, to have their outputs.
+
+	:param projects: All the projects in the build, including stubs
+	:type projects: list[project.Project]
+	:return: The projects that can be skipped
+	:rtype: set[project.Project]
+	"""
+	with perf_timer.PerfTimer("Project fingerprint checks"):
+		_inputsDigests.clear()
+		changed = {}
+
+		def _isChanged(buildProject):
+			ret = changed.get(buildProject)
+			if ret is None:
+				ret = not _fingerprintMatches(buildProject) or any(_isChanged(dep) for dep in buildProject.dependencies)
+				changed[buildProject] = ret
+			return ret
+
+		needed = set()
+
+		def _markNeeded(buildProject):
+			for dep in buildProject.dependencies:
+				if dep not in needed:
+					needed.add(dep)
+					_markNeeded(dep)
+
+		for buildProject in projects:
+			if _isChanged(buildProject):
+				_markNeeded(buildProject)
+
+		return {buildProject for buildProject in projects if not changed[buildProject] and buildProject not in needed}
+
+@TypeChecked(projects=list)
+def RecordProjectFingerprints(projects):
+	"""
+	Record the fingerprints of projects that were just built successfully, so they can be skipped by
+	FindUnchangedProjects() next time if nothing's changed. Only projects it checked this run are recorded.
+
+	:param projects: The projects that were built
+	:type projects: list[project.Project]
+	"""
+	with perf_timer.PerfTimer("Recording project fingerprints"):
+		for buildProject in projects:
+			inputsDigest = _inputsDigests.get(buildProject)
+			if inputsDigest is None:
+				continue
+			index = _getIndex(buildProject)
+			index.RemoveMissingInputs()
+			# Also persists the inputs that were dropped for being out of date and never recorded again
+			_persistIndex(buildProject, index)
+			shared_globals.settings.Save(
+				_getFingerprintSettingsKey(buildProject),
+				(inputsDigest, _getOutputsDigest(buildProject.artifactIndex.GetAllArtifacts()))
+			)
+
+@TypeChecked(buildProject=project.Project)
+def ClearProjectFingerprint(buildProject):
+	"""
+	Forget a project's fingerprint, so it isn't skipped next time
+
+	:param buildProject: The project
+	:type buildProject: project.Project
+	"""
+	shared_globals.settings.Delete(_getFingerprintSettingsKey(buildProject))
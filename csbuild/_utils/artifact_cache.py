@@ -0,0 +1,729 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: artifact_cache
+	:synopsis: Content-addressed cache of tool outputs, keyed on everything that goes into producing them
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import hashlib
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+
+from . import PlatformBytes, ordered_set, shared_globals
+from .. import perf_timer, log
+from .._testing import testcase
+
+DEFAULT_MAX_SIZE = 5 * 1024 * 1024 * 1024
+
+_sizeSuffixes = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+def ParseSize(size):
+	"""
+	Parse a size given on the command line, in bytes or with a K, M, G or T suffix
+
+	:param size: The size, i.e., "500M"
+	:type size: str
+	:return: Size in bytes
+	:rtype: int
+	:raises ValueError: If the size can't be parsed
+	"""
+	size = size.strip().upper()
+	if size.endswith("B"):
+		size = size[:-1]
+	multiplier = 1
+	if size and size[-1] in _sizeSuffixes:
+		multiplier = _sizeSuffixes[size[-1]]
+		size = size[:-1]
+	return int(float(size) * multiplier)
+
+def PackBlob(contents):
+	"""
+	Pack the contents of several files into a single blob
+
+	:param contents: Contents of each file
+	:type contents: list[bytes]
+	:return: The blob
+	:rtype: bytes
+	"""
+	pieces = [struct.pack("!I", len(contents))]
+	for data in contents:
+		pieces.append(struct.pack("!Q", len(data)))
+		pieces.append(data)
+	return b"".join(pieces)
+
+def UnpackBlob(blob):
+	"""
+	Unpack a blob created by PackBlob()
+
+	:param blob: The blob
+	:type blob: bytes
+	:return: Contents of each file
+	:rtype: list[bytes]
+	:raises ValueError: If the blob is malformed
+	"""
+	try:
+		count, = struct.unpack_from("!I", blob, 0)
+		offset = 4
+		contents = []
+		for _ in range(count):
+			size, = struct.unpack_from("!Q", blob, offset)
+			offset += 8
+			if offset + size > len(blob):
+				raise ValueError("Truncated blob")
+			contents.append(blob[offset:offset + size])
+			offset += size
+	except struct.error:
+		raise ValueError("Truncated blob")
+	if offset != len(blob):
+		raise ValueError("Trailing data in blob")
+	return contents
+
+def _hashFile(hasher, filename):
+	with open(filename, "rb") as f:
+		while True:
+			chunk = f.read(1024 * 1024)
+			if not chunk:
+				break
+			hasher.update(chunk)
+
+def GetTransitiveDependencies(buildProject, checker, filename):
+	"""
+	Get everything a file depends on, directly or through its dependencies
+
+	:param buildProject: Project the file is being built for
+	:type buildProject: csbuild._build.project.Project
+	:param checker: Checker that knows how to find the file's dependencies
+	:type checker: csbuild.toolchain.CompileChecker
+	:param filename: Absolute path to the file
+	:type filename: str
+	:return: Absolute paths to the dependencies that exist
+	:rtype: set[str]
+	"""
+	found = set()
+	toCheck = [filename]
+	while toCheck:
+		for dep in checker.GetDependencies(buildProject, toCheck.pop()):
+			dep = os.path.abspath(dep)
+			if dep not in found and shared_globals.statCache.Exists(dep):
+				found.add(dep)
+				toCheck.append(dep)
+	return found
+
+class ArtifactCache(object):
+	"""
+	Stores the outputs of tool invocations on local disk by a hash of the command, the input, and everything the input
+	depends on, so an invocation that's already been run can have its outputs restored instead of running it again -
+	after switching branches or on a rebuild, for instance. Outputs are restored as hard links where possible.
+
+	Entries are stored atomically, so several builds can share a cache directory. Once the cache grows past its size
+	limit, the least recently used entries are evicted.
+
+	With a remote backend, entries missing locally are looked for there before giving up, and new entries are sent
+	to it. If the backend can't be reached, the build carries on with just the local cache.
+
+	Paths under the base directory are hashed relative to it, in commands and response files as well as the inputs'
+	paths, so checkouts at different paths share entries. Outputs that embed the paths they were built at, like debug
+	information, keep the paths of the checkout that built them when they're restored in another one.
+
+	:param directory: Directory to store the cache in
+	:type directory: str
+	:param maxSize: Maximum size of the cache in bytes, or 0 for no limit
+	:type maxSize: int
+	:param remote: Remote backend with Has(key), Get(key) and Put(key, blob) methods, such as a
+		csbuild.cache_server.CacheServerClient, or None to only use the local cache
+	:type remote: any
+	:param baseDir: Directory to hash paths relative to, or None to hash absolute paths
+	:type baseDir: str or None
+	"""
+	def __init__(self, directory, maxSize=DEFAULT_MAX_SIZE, remote=None, baseDir=None):
+		self.directory = directory
+		self.maxSize = maxSize
+		self.remote = remote
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.remoteHits = 0
+		self.misses = 0
+		self.stores = 0
+		self.evictions = 0
+
+		# Maps each key to [size in bytes, last use time], loaded from disk the first time it's needed
+		self._entries = None
+		self._totalSize = 0
+		self._executableSignatures = {}
+		self._fileHashes = {}
+
+		# Match the base directory only where it's a whole path, not a prefix of a longer name
+		self._basePattern = None
+		self._baseBytesPattern = None
+		if baseDir is not None:
+			baseDir = os.path.abspath(baseDir)
+			self._basePattern = re.compile(re.escape(baseDir) + r"(?=[\\/\s\"']|$)")
+			self._baseBytesPattern = re.compile(re.escape(PlatformBytes(baseDir)) + br"(?=[\\/\s\"']|$)")
+
+	def _relativize(self, text):
+		if self._basePattern is None:
+			return text
+		return self._basePattern.sub("<base>", text)
+
+	def _relativizeBytes(self, data):
+		if self._baseBytesPattern is None:
+			return data
+		return self._baseBytesPattern.sub(b"<base>", data)
+
+	def _entryDir(self, key):
+		return os.path.join(self.directory, key[:2], key)
+
+	def _loadEntries(self):
+		if self._entries is not None:
+			return
+		with perf_timer.PerfTimer("Loading artifact cache index"):
+			self._entries = {}
+			self._totalSize = 0
+			if not os.access(self.directory, os.F_OK):
+				return
+			for prefix in os.listdir(self.directory):
+				prefixDir = os.path.join(self.directory, prefix)
+				if len(prefix) != 2 or not os.path.isdir(prefixDir):
+					continue
+				for key in os.listdir(prefixDir):
+					entryDir = os.path.join(prefixDir, key)
+					try:
+						size = sum(os.path.getsize(os.path.join(entryDir, name)) for name in os.listdir(entryDir))
+						lastUsed = os.path.getmtime(entryDir)
+					except OSError:
+						continue
+					self._entries[key] = [size, lastUsed]
+					self._totalSize += size
+
+	def _getExecutableSignature(self, executable):
+		signature = self._executableSignatures.get(executable)
+		if signature is None:
+			# A compiler upgrade has to invalidate everything it built, even though the command is the same
+			path = shutil.which(executable) if hasattr(shutil, "which") else None
+			if path is None:
+				signature = executable
+			else:
+				stat = os.stat(path)
+				signature = "{}:{}:{}".format(path, stat.st_size, stat.st_mtime)
+			self._executableSignatures[executable] = signature
+		return signature
+
+	def GetKey(self, buildProject, inputFile, command):
+		"""
+		Get the key for running a command on an input
+
+		:param buildProject: Project the input is being built for
+		:type buildProject: csbuild._build.project.Project
+		:param inputFile: The input
+		:type inputFile: csbuild._build.input_file.InputFile
+		:param command: The full command that builds the input. The contents of response files passed to it with
+			@file are part of the key, as well as their paths.
+		:type command: list[str]
+		:return: The key
+		:rtype: str
+		"""
+		with perf_timer.PerfTimer("Artifact cache key generation"):
+			hasher = hashlib.sha256()
+			self._hashCommand(hasher, command)
+
+			_, extension = os.path.splitext(inputFile.filename)
+			checker = buildProject.toolchain.GetChecker(extension)
+			dependencies = GetTransitiveDependencies(buildProject, checker, inputFile.filename)
+			self._hashFiles(hasher, [inputFile.filename] + sorted(dependencies, key=self._relativize))
+			return hasher.hexdigest()
+
+	def GetKeyForFiles(self, command, filenames):
+		"""
+		Get the key for running a command that reads exactly the given files, such as a link
+
+		:param command: The full command. The contents of response files passed to it with @file are part of the key,
+			as well as their paths.
+		:type command: list[str]
+		:param filenames: Every file the command reads
+		:type filenames: list[str]
+		:return: The key
+		:rtype: str
+		"""
+		with perf_timer.PerfTimer("Artifact cache key generation"):
+			hasher = hashlib.sha256()
+			self._hashCommand(hasher, command)
+			self._hashFiles(hasher, sorted(set(filenames), key=self._relativize))
+			return hasher.hexdigest()
+
+	def _hashCommand(self, hasher, command):
+		if command:
+			hasher.update(PlatformBytes(self._relativize(self._getExecutableSignature(command[0]))))
+		for arg in command:
+			hasher.update(b"\0")
+			hasher.update(PlatformBytes(self._relativize(arg)))
+			if arg.startswith("@") and os.path.isfile(arg[1:]):
+				with open(arg[1:], "rb") as f:
+					hasher.update(self._relativizeBytes(f.read()))
+
+	def _hashFiles(self, hasher, filenames):
+		for filename in filenames:
+			hasher.update(b"\0")
+			hasher.update(PlatformBytes(self._relativize(filename)))
+			hasher.update(PlatformBytes(self._getFileHash(filename)))
+
+	def _getFileHash(self, filename):
+		# Most inputs share the same headers, so each one is only hashed again if it's been modified
+		stat = os.stat(filename)
+		memo = self._fileHashes.get(filename)
+		if memo is not None and memo[0] == stat.st_mtime and memo[1] == stat.st_size:
+			return memo[2]
+		hasher = hashlib.sha256()
+		_hashFile(hasher, filename)
+		digest = hasher.hexdigest()
+		self._fileHashes[filename] = (stat.st_mtime, stat.st_size, digest)
+		return digest
+
+	def _remoteFailed(self, error):
+		#pylint: disable=not-context-manager
+		with self.lock:
+			if self.remote is None:
+				return
+			log.Warn("Artifact cache server unavailable, using the local cache only for the rest of the build: {}", error)
+			self.remote = None
+
+	def _fetchRemote(self, key, numOutputs):
+		remote = self.remote
+		if remote is None:
+			return False
+		with perf_timer.PerfTimer("Artifact cache remote lookup"):
+			try:
+				blob = remote.Get(key)
+			except (IOError, OSError) as e:
+				self._remoteFailed(e)
+				return False
+			if blob is None:
+				return False
+			try:
+				contents = UnpackBlob(blob)
+			except ValueError:
+				return False
+			if len(contents) != numOutputs:
+				return False
+
+			def _write(tempDir):
+				for index, data in enumerate(contents):
+					with open(os.path.join(tempDir, str(index)), "wb") as f:
+						f.write(data)
+				return sum(len(data) for data in contents)
+
+			return self._addEntry(key, _write)
+
+	def Fetch(self, key, outputFiles):
+		"""
+		Restore the outputs stored for a key, from the local cache or else the remote backend. If they're not in
+		either, any existing outputs are removed instead, so the tool writing new ones can't write through a hard link
+		into the cache.
+
+		:param key: Key from GetKey()
+		:type key: str
+		:param outputFiles: Paths to restore the outputs to, in the order they were stored
+		:type outputFiles: tuple[str]
+		:return: True if the outputs were restored
+		:rtype: bool
+		"""
+		with perf_timer.PerfTimer("Artifact cache lookup"):
+			entryDir = self._entryDir(key)
+			fromRemote = False
+			if not os.access(entryDir, os.F_OK):
+				fromRemote = self._fetchRemote(key, len(outputFiles))
+
+			restored = os.access(entryDir, os.F_OK)
+			if restored:
+				try:
+					for index, outputFile in enumerate(outputFiles):
+						_restoreFile(os.path.join(entryDir, str(index)), outputFile)
+					# Updates the entry's last use time for other builds sharing the cache
+					os.utime(entryDir, None)
+				except (IOError, OSError):
+					# Evicted by another build in the middle of restoring it
+					restored = False
+
+			if not restored:
+				for outputFile in outputFiles:
+					if os.access(outputFile, os.F_OK):
+						os.remove(outputFile)
+
+			#pylint: disable=not-context-manager
+			with self.lock:
+				if restored:
+					self.hits += 1
+					if fromRemote:
+						self.remoteHits += 1
+					self._loadEntries()
+					if key in self._entries:
+						self._entries[key][1] = os.path.getmtime(entryDir)
+				else:
+					self.misses += 1
+			return restored
+
+	def _addEntry(self, key, write):
+		"""
+		Add an entry to the local cache
+
+		:param key: Key of the entry
+		:type key: str
+		:param write: Function that writes the entry's files into the directory it's given, and returns their total size
+		:type write: Callable
+		:return: True if the entry was added, or was already there
+		:rtype: bool
+		"""
+		entryDir = self._entryDir(key)
+		if os.access(entryDir, os.F_OK):
+			return True
+		prefixDir = os.path.dirname(entryDir)
+		if not os.access(prefixDir, os.F_OK):
+			try:
+				os.makedirs(prefixDir)
+			except OSError:
+				if not os.path.isdir(prefixDir):
+					raise
+
+		# Written to a temporary directory and moved into place so nothing ever sees a partial entry
+		tempDir = tempfile.mkdtemp(prefix=".tmp-", dir=prefixDir)
+		try:
+			size = write(tempDir)
+			os.rename(tempDir, entryDir)
+		except (IOError, OSError):
+			# Most likely another build stored the same entry first, or the tool didn't produce every output
+			shutil.rmtree(tempDir, ignore_errors=True)
+			return os.access(entryDir, os.F_OK)
+
+		#pylint: disable=not-context-manager
+		with self.lock:
+			self._loadEntries()
+			if key not in self._entries:
+				self._entries[key] = [size, os.path.getmtime(entryDir)]
+				self._totalSize += size
+			self._evict()
+		return True
+
+	def Store(self, key, outputFiles, aliases=()):
+		"""
+		Store a tool's outputs under a key, and send them to the remote backend if there is one
+
+		:param key: Key from GetKey()
+		:type key: str
+		:param outputFiles: The outputs
+		:type outputFiles: tuple[str]
+		:param aliases: Other keys to store the outputs under, i.e., the key for the dependencies the compiler
+			reported while building them. The outputs are still only counted as stored once.
+		:type aliases: tuple[str]
+		"""
+		with perf_timer.PerfTimer("Artifact cache store"):
+			def _write(tempDir):
+				size = 0
+				for index, outputFile in enumerate(outputFiles):
+					storedFile = os.path.join(tempDir, str(index))
+					# Keeps the permissions, so executables are restored executable
+					shutil.copy(outputFile, storedFile)
+					size += os.path.getsize(storedFile)
+				return size
+
+			stored = False
+			for entryKey in ordered_set.OrderedSet((key, ) + tuple(aliases)):
+				if os.access(self._entryDir(entryKey), os.F_OK):
+					continue
+				if not self._addEntry(entryKey, _write):
+					continue
+				stored = True
+				self._storeRemote(entryKey, outputFiles)
+
+			if stored:
+				#pylint: disable=not-context-manager
+				with self.lock:
+					self.stores += 1
+
+	def _storeRemote(self, key, outputFiles):
+		remote = self.remote
+		if remote is None:
+			return
+		with perf_timer.PerfTimer("Artifact cache remote store"):
+			try:
+				if remote.Has(key):
+					return
+				contents = []
+				for outputFile in outputFiles:
+					with open(outputFile, "rb") as f:
+						contents.append(f.read())
+				remote.Put(key, PackBlob(contents))
+			except (IOError, OSError) as e:
+				self._remoteFailed(e)
+
+	def _evict(self):
+		if self.maxSize <= 0 or self._totalSize <= self.maxSize:
+			return
+		with perf_timer.PerfTimer("Artifact cache eviction"):
+			# Evict down to 90% of the limit, so the next few stores don't each have to evict again
+			target = self.maxSize * 0.9
+			for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+				if self._totalSize <= target:
+					break
+				shutil.rmtree(self._entryDir(key), ignore_errors=True)
+				del self._entries[key]
+				self._totalSize -= size
+				self.evictions += 1
+
+	@property
+	def totalSize(self):
+		"""
+		Get the total size of everything in the cache
+
+		:return: Size in bytes
+		:rtype: int
+		"""
+		#pylint: disable=not-context-manager
+		with self.lock:
+			self._loadEntries()
+			return self._totalSize
+
+def _restoreFile(storedFile, outputFile):
+	outputDir = os.path.dirname(outputFile)
+	if not os.access(outputDir, os.F_OK):
+		os.makedirs(outputDir)
+	if os.access(outputFile, os.F_OK):
+		os.remove(outputFile)
+	try:
+		os.link(storedFile, outputFile)
+	except (OSError, AttributeError):
+		# Different filesystems, or a platform without hard links
+		shutil.copy(storedFile, outputFile)
+	# The restored file has to look newer than its inputs to the recompile checks
+	os.utime(outputFile, None)
+
+### Unit Tests ###
+
+class TestArtifactCache(testcase.TestCase):
+	"""Test the artifact cache"""
+
+	class _FakeChecker(object):
+		def __init__(self, dependencies):
+			self.dependencies = dependencies
+
+		def GetDependencies(self, buildProject, inputFile):
+			"""Stand-in for CompileChecker.GetDependencies"""
+			del buildProject
+			return self.dependencies.get(inputFile, set())
+
+	class _FakeToolchain(object):
+		def __init__(self, checker):
+			self.checker = checker
+
+		def GetChecker(self, extension):
+			"""Stand-in for Toolchain.GetChecker"""
+			del extension
+			return self.checker
+
+	class _FakeProject(object):
+		def __init__(self, checker):
+			self.toolchain = TestArtifactCache._FakeToolchain(checker)
+
+	class _FakeInput(object):
+		def __init__(self, filename):
+			self.filename = filename
+
+	def setUp(self):
+		self.tempDir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDir, ignore_errors=True)
+
+	def _write(self, name, contents):
+		path = os.path.join(self.tempDir, name)
+		with open(path, "wb") as f:
+			f.write(contents)
+		return path
+
+	def _read(self, path):
+		with open(path, "rb") as f:
+			return f.read()
+
+	# pylint: disable=invalid-name
+	def testKeyInputs(self):
+		"""Test that the key changes with the command, response files, the input, and transitive dependencies"""
+		source = self._write("a.cpp", b"int main() {}")
+		header = self._write("a.h", b"#define A 1")
+		nested = self._write("b.h", b"#define B 1")
+		responseFile = self._write("a.rsp", b"-O2")
+		checker = TestArtifactCache._FakeChecker({source: {header}, header: {nested}})
+		buildProject = TestArtifactCache._FakeProject(checker)
+		inputFile = TestArtifactCache._FakeInput(source)
+		cache = ArtifactCache(os.path.join(self.tempDir, "cache"))
+
+		command = ["nonexistent-compiler", "@" + responseFile]
+		key = cache.GetKey(buildProject, inputFile, command)
+		self.assertEqual(key, cache.GetKey(buildProject, inputFile, list(command)))
+		self.assertNotEqual(key, cache.GetKey(buildProject, inputFile, command + ["-g"]))
+
+		self._write("a.rsp", b"-O3")
+		rspKey = cache.GetKey(buildProject, inputFile, command)
+		self.assertNotEqual(key, rspKey)
+
+		self._write("b.h", b"#define B 2")
+		nestedKey = cache.GetKey(buildProject, inputFile, command)
+		self.assertNotEqual(rspKey, nestedKey)
+
+		self._write("a.cpp", b"int main() { return 0; }")
+		self.assertNotEqual(nestedKey, cache.GetKey(buildProject, inputFile, command))
+
+	def testBaseDir(self):
+		"""Test that checkouts at different paths get the same keys when their paths are relative to a base directory"""
+		keys = []
+		for checkout in ("one", "two"):
+			os.makedirs(os.path.join(self.tempDir, checkout, "src"))
+			source = self._write(os.path.join(checkout, "src", "a.cpp"), b"int main() {}")
+			header = self._write(os.path.join(checkout, "src", "a.h"), b"#define A 1")
+			responseFile = self._write(
+				os.path.join(checkout, "a.rsp"),
+				PlatformBytes("-I{}\n-o\n{}".format(os.path.dirname(header), source + ".o"))
+			)
+			checker = TestArtifactCache._FakeChecker({source: {header}})
+			buildProject = TestArtifactCache._FakeProject(checker)
+			command = ["nonexistent-compiler", "@" + responseFile, "-c", source]
+
+			baseDir = os.path.join(self.tempDir, checkout)
+			cache = ArtifactCache(os.path.join(self.tempDir, "cache"), baseDir=baseDir)
+			absoluteCache = ArtifactCache(os.path.join(self.tempDir, "cache"))
+			keys.append((
+				cache.GetKey(buildProject, TestArtifactCache._FakeInput(source), command),
+				cache.GetKeyForFiles(command, [source, header]),
+				absoluteCache.GetKey(buildProject, TestArtifactCache._FakeInput(source), command),
+			))
+
+		self.assertEqual(keys[0][0], keys[1][0])
+		self.assertEqual(keys[0][1], keys[1][1])
+		self.assertNotEqual(keys[0][2], keys[1][2])
+
+		# Only whole path components are rewritten, not other directories the base directory is a prefix of
+		# pylint: disable=protected-access
+		cache = ArtifactCache(os.path.join(self.tempDir, "cache"), baseDir=os.path.join(self.tempDir, "on"))
+		self.assertEqual(os.path.join(self.tempDir, "one"), cache._relativize(os.path.join(self.tempDir, "one")))
+		self.assertEqual(os.path.join("<base>", "one"), cache._relativize(os.path.join(self.tempDir, "on", "one")))
+
+	def testFetchAndStore(self):
+		"""Test that stored outputs are restored, and that a miss removes stale outputs"""
+		cache = ArtifactCache(os.path.join(self.tempDir, "cache"))
+		outputs = (self._write("a.o", b"object"), self._write("a.pdb", b"symbols"))
+
+		self.assertFalse(cache.Fetch("ab12", outputs))
+		self.assertFalse(any(os.access(output, os.F_OK) for output in outputs))
+
+		self._write("a.o", b"object")
+		self._write("a.pdb", b"symbols")
+		cache.Store("ab12", outputs)
+		os.remove(outputs[0])
+		self._write("a.pdb", b"stale")
+
+		self.assertTrue(cache.Fetch("ab12", outputs))
+		self.assertEqual(b"object", self._read(outputs[0]))
+		self.assertEqual(b"symbols", self._read(outputs[1]))
+		self.assertEqual((1, 1, 1), (cache.hits, cache.misses, cache.stores))
+
+		# A new instance finds what the last one stored
+		other = ArtifactCache(os.path.join(self.tempDir, "cache"))
+		self.assertEqual(len(b"object") + len(b"symbols"), other.totalSize)
+		self.assertTrue(other.Fetch("ab12", outputs))
+
+	def testEviction(self):
+		"""Test that the least recently used entries are evicted once the cache is over its size limit"""
+		cache = ArtifactCache(os.path.join(self.tempDir, "cache"), maxSize=2500)
+		output = os.path.join(self.tempDir, "a.o")
+		for key in ("aa01", "aa02", "aa03"):
+			self._write("a.o", b"x" * 1000)
+			cache.Store(key, (output,))
+			if key == "aa02":
+				# Use the first entry again, so the second is the oldest
+				cache.Fetch("aa01", (output,))
+
+		self.assertEqual(1, cache.evictions)
+		self.assertLessEqual(cache.totalSize, 2500)
+		self.assertTrue(cache.Fetch("aa01", (output,)))
+		self.assertFalse(cache.Fetch("aa02", (output,)))
+		self.assertTrue(cache.Fetch("aa03", (output,)))
+
+	def testRemote(self):
+		"""Test that entries are shared through the remote backend, and that it's dropped if it stops working"""
+		class _FakeRemote(object):
+			def __init__(self):
+				self.blobs = {}
+				self.broken = False
+
+			def _check(self):
+				if self.broken:
+					raise IOError("Connection refused")
+
+			def Has(self, key):
+				"""Stand-in for CacheServerClient.Has"""
+				self._check()
+				return key in self.blobs
+
+			def Get(self, key):
+				"""Stand-in for CacheServerClient.Get"""
+				self._check()
+				return self.blobs.get(key)
+
+			def Put(self, key, blob):
+				"""Stand-in for CacheServerClient.Put"""
+				self._check()
+				self.blobs[key] = blob
+
+		remote = _FakeRemote()
+		first = ArtifactCache(os.path.join(self.tempDir, "first"), remote=remote)
+		outputs = (self._write("a.o", b"object"),)
+		first.Store("ab12", outputs)
+		self.assertEqual([b"object"], UnpackBlob(remote.blobs["ab12"]))
+
+		os.remove(outputs[0])
+		second = ArtifactCache(os.path.join(self.tempDir, "second"), remote=remote)
+		self.assertTrue(second.Fetch("ab12", outputs))
+		self.assertEqual(b"object", self._read(outputs[0]))
+		self.assertEqual((1, 1), (second.hits, second.remoteHits))
+		# It's in the local cache now
+		self.assertTrue(second.Fetch("ab12", outputs))
+		self.assertEqual((2, 1), (second.hits, second.remoteHits))
+
+		remote.broken = True
+		self.assertFalse(second.Fetch("cd34", outputs))
+		self.assertIsNone(second.remote)
+		self._write("a.o", b"object")
+		second.Store("cd34", outputs)
+		self.assertTrue(second.Fetch("cd34", outputs))
+
+	def testParseSize(self):
+		"""Test parsing sizes from the command line"""
+		self.assertEqual(1000, ParseSize("1000"))
+		self.assertEqual(512 * 1024 * 1024, ParseSize("512M"))
+		self.assertEqual(int(1.5 * 1024 ** 3), ParseSize("1.5g"))
+		self.assertEqual(2 * 1024, ParseSize("2KB"))
+		with self.assertRaises(ValueError):
+			ParseSize("lots")
@@ -0,0 +1,247 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: daemon_client
+	:synopsis: Thin client that forwards a build to the resident build daemon, and the messages the two exchange.
+		Only needs the logger, so it runs before the rest of csbuild and the tools are imported.
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import array
+import os
+import pickle
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+from . import shared_globals
+from .. import log
+from .._testing import testcase
+
+DAEMON_ARG = "--daemon"
+STOP_DAEMON_ARG = "--stop-daemon"
+SERVER_ARG = "--daemon-server"
+
+_HEADER = struct.Struct("!I")
+
+def IsSupported():
+	"""
+	Check whether the daemon can run on this platform. Builds are run in processes forked from the daemon, so they
+	start with the makefile already executed, and the client's standard streams are handed to them over a unix socket.
+
+	:return: True if the daemon can be used
+	:rtype: bool
+	"""
+	return hasattr(socket, "AF_UNIX") and hasattr(socket.socket, "sendmsg") and hasattr(os, "fork")
+
+def GetSocketPath():
+	"""
+	:return: Path to the daemon's socket. It's relative to the makefile's directory, which has to be the working
+		directory, to stay well under the length limit on unix socket paths.
+	:rtype: str
+	"""
+	return os.path.join(".csbuild", "daemon.sock")
+
+def GetLogPath():
+	"""
+	:return: Path to the daemon's log, relative to the makefile's directory
+	:rtype: str
+	"""
+	return os.path.join(".csbuild", "daemon.log")
+
+def Send(sock, message, fds=()):
+	"""
+	Send a message to the other end of a daemon connection
+
+	:param sock: The connection
+	:type sock: socket.socket
+	:param message: The message
+	:type message: dict
+	:param fds: File descriptors to hand to the other end along with it
+	:type fds: list[int]
+	"""
+	data = pickle.dumps(message, 2)
+	data = _HEADER.pack(len(data)) + data
+	if fds:
+		sent = sock.sendmsg([data], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds).tobytes())])
+		data = data[sent:]
+	if data:
+		sock.sendall(data)
+
+def Recv(sock):
+	"""
+	Receive a message from the other end of a daemon connection
+
+	:param sock: The connection
+	:type sock: socket.socket
+	:return: The message, or None if the connection was closed first, and the file descriptors sent with it
+	:rtype: tuple[dict or None, list[int]]
+	"""
+	fds = array.array("i")
+	data, ancdata, _, _ = sock.recvmsg(65536, socket.CMSG_LEN(3 * fds.itemsize))
+	for level, kind, cmsgData in ancdata:
+		if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+			fds.frombytes(cmsgData[:len(cmsgData) - (len(cmsgData) % fds.itemsize)])
+	fds = list(fds)
+
+	while len(data) < _HEADER.size or len(data) < _HEADER.size + _HEADER.unpack(data[:_HEADER.size])[0]:
+		chunk = sock.recv(65536)
+		if not chunk:
+			for fd in fds:
+				os.close(fd)
+			return None, []
+		data += chunk
+	length = _HEADER.unpack(data[:_HEADER.size])[0]
+	return pickle.loads(data[_HEADER.size:_HEADER.size + length]), fds
+
+def _connect():
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		sock.connect(GetSocketPath())
+	except (IOError, OSError):
+		sock.close()
+		return None
+	return sock
+
+def _startDaemon(mainFile):
+	log.Build("Starting build daemon")
+	if not os.access(".csbuild", os.F_OK):
+		os.makedirs(".csbuild")
+	with open(os.devnull, "rb") as devnull, open(GetLogPath(), "ab") as logFile:
+		process = subprocess.Popen(
+			[sys.executable, mainFile, SERVER_ARG],
+			stdin=devnull,
+			stdout=logFile,
+			stderr=subprocess.STDOUT,
+			close_fds=True,
+			preexec_fn=os.setsid
+		)
+	while True:
+		sock = _connect()
+		if sock is not None:
+			return sock
+		if process.poll() is not None:
+			return None
+		time.sleep(0.01)
+
+def _stopDaemon():
+	sock = _connect()
+	if sock is None:
+		log.Build("No build daemon is running.")
+		return 0
+	try:
+		Send(sock, {"stop": True})
+		Recv(sock)
+	finally:
+		sock.close()
+	log.Build("Stopped build daemon.")
+	return 0
+
+def RunClient():
+	"""
+	Forward this invocation to the build daemon for the makefile, starting one if there isn't one running, and wait
+	for the build to finish. The build's output goes straight to this process's standard streams.
+
+	:return: The build's exit code, or None if the build should be run in this process instead
+	:rtype: int or None
+	"""
+	shared_globals.startTime = time.time()
+	mainFile = os.path.abspath(sys.modules["__main__"].__file__)
+	os.chdir(os.path.dirname(mainFile))
+	mainFile = os.path.basename(mainFile)
+
+	if not IsSupported():
+		if STOP_DAEMON_ARG in sys.argv:
+			return 0
+		log.Warn("The build daemon isn't supported on this platform; building without it.")
+		return None
+
+	if STOP_DAEMON_ARG in sys.argv:
+		return _stopDaemon()
+
+	request = {
+		"argv": [arg for arg in sys.argv[1:] if arg != DAEMON_ARG],
+		"environment": dict(os.environ),
+		"executable": sys.executable,
+	}
+	for _ in range(2):
+		sock = _connect()
+		if sock is None:
+			sock = _startDaemon(mainFile)
+			if sock is None:
+				log.Warn("The build daemon failed to start (see {}); building without it.", GetLogPath())
+				return None
+		try:
+			Send(sock, request, [0, 1, 2])
+			response, _ = Recv(sock)
+		except KeyboardInterrupt:
+			# Closing the connection tells the daemon to stop the build
+			log.Error("Keyboard interrupt received. Aborting build.")
+			return int(signal.SIGINT)
+		finally:
+			sock.close()
+
+		if response is None:
+			log.Error("The build daemon exited unexpectedly (see {}).", GetLogPath())
+			return 1
+		if "exitCode" in response:
+			return response["exitCode"]
+		log.Build("Restarting build daemon: {}", response["stale"])
+	log.Error("The build daemon could not be restarted.")
+	return 1
+
+### Unit Tests ###
+
+class TestDaemonClient(testcase.TestCase):
+	"""Test the messages sent to and from the build daemon"""
+	# pylint: disable=invalid-name
+	def testMessages(self):
+		"""Test that messages and file descriptors sent to the daemon arrive intact"""
+		if not IsSupported():
+			return
+		left, right = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+		readEnd, writeEnd = os.pipe()
+		try:
+			message = {"argv": ["-t", "debug"], "environment": {"A": "B" * 100000}}
+			Send(left, message, [writeEnd])
+			received, fds = Recv(right)
+			self.assertEqual(message, received)
+			self.assertEqual(1, len(fds))
+			os.write(fds[0], b"x")
+			os.close(fds[0])
+			self.assertEqual(b"x", os.read(readEnd, 1))
+
+			Send(left, {"stop": True})
+			self.assertEqual(({"stop": True}, []), Recv(right))
+
+			left.close()
+			self.assertEqual((None, []), Recv(right))
+		finally:
+			left.close()
+			right.close()
+			os.close(readEnd)
+			os.close(writeEnd)
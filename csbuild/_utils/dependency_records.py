@@ -0,0 +1,178 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: dependency_records
+	:synopsis: Records of the files each input depended on when it was last compiled, as reported by the compiler
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+
+from . import shared_globals, PlatformString
+from .._testing import testcase
+
+SHOW_INCLUDES_PREFIX = "Note: including file:"
+
+def ParseMakefileDependencies(contents):
+	"""
+	Parse the dependencies out of a makefile rule, such as the ones written by gcc and clang with -MD -MF <file>
+
+	:param contents: Contents of the dependency file
+	:type contents: str
+	:return: The files the targets depend on, in the order they're listed
+	:rtype: list[str]
+	"""
+	tokens = []
+	current = []
+	i = 0
+	while i < len(contents):
+		char = contents[i]
+		nextChar = contents[i + 1] if i + 1 < len(contents) else ""
+		if char == "\\" and nextChar in (" ", "#"):
+			current.append(nextChar)
+			i += 2
+			continue
+		if char == "\\" and nextChar in ("\n", "\r"):
+			# Line continuation
+			char = " "
+			i += 1
+		elif char == "$" and nextChar == "$":
+			i += 1
+		if char in (" ", "\t", "\n", "\r"):
+			if current:
+				tokens.append("".join(current))
+				current = []
+		else:
+			current.append(char)
+		i += 1
+	if current:
+		tokens.append("".join(current))
+
+	ret = []
+	inTargets = True
+	for token in tokens:
+		if inTargets:
+			if token == ":":
+				inTargets = False
+			elif token.endswith(":"):
+				inTargets = False
+			continue
+		if token.endswith(":"):
+			# Another rule, i.e., the phony targets written by -MP
+			inTargets = False
+			continue
+		ret.append(token)
+	return ret
+
+def ParseShowIncludes(output):
+	"""
+	Parse the included files out of the output of the MSVC compiler with /showIncludes
+
+	:param output: The compiler's output
+	:type output: str
+	:return: The included files
+	:rtype: list[str]
+	"""
+	return [
+		line[len(SHOW_INCLUDES_PREFIX):].strip()
+		for line in output.splitlines()
+		if line.startswith(SHOW_INCLUDES_PREFIX)
+	]
+
+def RecordDependencies(buildProject, inputFile, dependencies, timestamp):
+	"""
+	Record the files an input depended on when it was compiled
+
+	:param buildProject: Project the input was compiled for
+	:type buildProject: csbuild._build.project.Project
+	:param inputFile: Absolute path to the input
+	:type inputFile: str
+	:param dependencies: Everything the input depended on, directly or indirectly, as reported by the compiler
+	:type dependencies: list[str]
+	:param timestamp: Time the compile started
+	:type timestamp: float
+	"""
+	dependencies = {os.path.abspath(PlatformString(dep)) for dep in dependencies}
+	dependencies.discard(inputFile)
+	shared_globals.settings.SaveRecord(repr(buildProject) + ".dependencies", inputFile, (timestamp, dependencies))
+
+def GetRecordedDependencies(buildProject, inputFile):
+	"""
+	Get the files an input depended on the last time it was compiled.
+
+	If none of them have been modified since then, the record is known to be complete. If any of them have, the
+	input may have picked up new dependencies; the record still has everything needed to tell that the input needs
+	to be compiled again, but anything that needs the full list has to look for the new ones itself.
+
+	:param buildProject: Project the input is being compiled for
+	:type buildProject: csbuild._build.project.Project
+	:param inputFile: Absolute path to the input
+	:type inputFile: str
+	:return: Absolute paths to everything the input depended on and whether the record is known to be complete,
+		or None if there's no record
+	:rtype: tuple[set[str], bool] or None
+	"""
+	record = shared_globals.settings.GetRecords(repr(buildProject) + ".dependencies").get(inputFile)
+	if record is None:
+		return None
+	timestamp, dependencies = record
+	try:
+		if shared_globals.statCache.GetMtime(inputFile) > timestamp:
+			return dependencies, False
+		for dep in dependencies:
+			if shared_globals.statCache.GetMtime(dep) > timestamp:
+				return dependencies, False
+	except OSError:
+		return dependencies, False
+	return dependencies, True
+
+### Unit Tests ###
+
+class TestDependencyRecords(testcase.TestCase):
+	"""Test parsing compiler dependency output"""
+	# pylint: disable=invalid-name
+	def testParseMakefileDependencies(self):
+		"""Test parsing gcc-style dependency files"""
+		self.assertEqual(
+			["main.cpp", "/usr/include/stdio.h", "inc/value.hpp"],
+			ParseMakefileDependencies("out/main.o: main.cpp /usr/include/stdio.h \\\n inc/value.hpp\n")
+		)
+		self.assertEqual(
+			["my file.h", "#hash.h", "$dollar.h"],
+			ParseMakefileDependencies("main.o: my\\ file.h \\#hash.h $$dollar.h\n")
+		)
+		self.assertEqual(
+			["C:\\src\\main.cpp", "C:\\src\\value.hpp"],
+			ParseMakefileDependencies("C:\\out\\main.o: C:\\src\\main.cpp \\\r\n  C:\\src\\value.hpp\r\n")
+		)
+		self.assertEqual(
+			["main.cpp", "value.hpp"],
+			ParseMakefileDependencies("main.o: main.cpp value.hpp\n\nvalue.hpp:\n")
+		)
+		self.assertEqual([], ParseMakefileDependencies(""))
+
+	def testParseShowIncludes(self):
+		"""Test parsing /showIncludes output"""
+		output = "main.cpp\nNote: including file: C:\\src\\value.hpp\nNote: including file:  C:\\sdk\\stdio.h\nwarning C4100\n"
+		self.assertEqual(["C:\\src\\value.hpp", "C:\\sdk\\stdio.h"], ParseShowIncludes(output))
@@ -0,0 +1,205 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: include_graph
+	:synopsis: Shared store of the files included by each source file and header, for finding dependencies by
+		scanning for includes
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import errno
+import mmap
+import os
+import re
+import threading
+
+from . import shared_globals, PlatformUnicode
+from .._testing import testcase
+
+class IncludeGraph(object):
+	"""
+	Finds the files each file includes. Each file is only read once no matter how many projects, toolchains, and
+	architectures include it: what it includes is stored as written (and persisted between builds, until the file
+	changes), and resolving those to paths is memoized for each list of include directories it's resolved against.
+
+	:param regex: Regex for bytes that matches each include, with the opening delimiter (" or <) as its first group
+		and the included path as its second
+	:type regex: re.Pattern
+	:param settingsKey: Record store to persist the includes in, with a record for each file, or None to not persist them
+	:type settingsKey: str or None
+	"""
+	def __init__(self, regex, settingsKey=None):
+		self._regex = regex
+		self._settingsKey = settingsKey
+		self._records = {}
+		self._resolved = {}
+		self._includeDirKeys = {}
+		self._lock = threading.Lock()
+		self.scans = 0
+
+	def _getRecords(self):
+		if self._settingsKey is None or shared_globals.settings is None:
+			return self._records
+		return shared_globals.settings.GetRecords(self._settingsKey)
+
+	def GetIncludes(self, filename):
+		"""
+		Get the includes in a file as they're written, reading the file if it's changed since the last time.
+
+		:param filename: Absolute path to the file
+		:type filename: str
+		:return: Tuple of (delimiter, path) for each include, where delimiter is " or <
+		:rtype: tuple[tuple[str, str]]
+		"""
+		stat = shared_globals.statCache.Stat(filename)
+		if stat is None:
+			raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), filename)
+		records = self._getRecords()
+		record = records.get(filename)
+		if record is not None and record[0] == stat.st_mtime and record[1] == stat.st_size:
+			return record[2]
+
+		includes = ()
+		if stat.st_size:
+			with open(filename, "rb") as f:
+				contents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+				try:
+					includes = tuple(
+						(PlatformUnicode(delimiter), PlatformUnicode(path))
+						for delimiter, path in self._regex.findall(contents)
+					)
+				finally:
+					contents.close()
+		#pylint: disable=not-context-manager
+		with self._lock:
+			record = (stat.st_mtime, stat.st_size, includes)
+			self.scans += 1
+			if records is self._records:
+				records[filename] = record
+			else:
+				shared_globals.settings.SaveRecord(self._settingsKey, filename, record)
+		return includes
+
+	def _getIncludeDirKey(self, includeDirs):
+		includeDirs = tuple(includeDirs)
+		key = self._includeDirKeys.get(includeDirs)
+		if key is None:
+			# Normalized so that lists that only differ in how they're written share their results
+			key = []
+			for includeDir in includeDirs:
+				includeDir = os.path.normpath(os.path.abspath(includeDir))
+				if includeDir not in key:
+					key.append(includeDir)
+			key = tuple(key)
+			self._includeDirKeys[includeDirs] = key
+		return key
+
+	def GetDependencies(self, filename, includeDirs):
+		"""
+		Get the files a file includes directly, found the same way the compiler would find them: includes in quotes
+		are looked for next to the file first, and then each include directory is searched in order.
+
+		:param filename: Absolute path to the file
+		:type filename: str
+		:param includeDirs: Include directories, in the order they're searched
+		:type includeDirs: list[str]
+		:return: Paths to the included files that could be found
+		:rtype: set[str]
+		"""
+		includeDirKey = self._getIncludeDirKey(includeDirs)
+		includes = self.GetIncludes(filename)
+		key = (filename, includeDirKey)
+		memo = self._resolved.get(key)
+		if memo is not None and memo[0] is includes:
+			return memo[1]
+
+		ret = set()
+		localDir = os.path.dirname(filename)
+		for delimiter, include in includes:
+			searchDirs = (localDir, ) + includeDirKey if delimiter == "\"" else includeDirKey
+			for includeDir in searchDirs:
+				maybeHeaderLoc = os.path.join(includeDir, include)
+				if shared_globals.statCache.IsFile(maybeHeaderLoc):
+					ret.add(os.path.normpath(maybeHeaderLoc))
+					break
+		self._resolved[key] = (includes, ret)
+		return ret
+
+### Unit Tests ###
+
+class TestIncludeGraph(testcase.TestCase):
+	"""Test the include graph"""
+	# pylint: disable=invalid-name
+	def setUp(self):
+		import tempfile
+		self.tempDir = tempfile.mkdtemp()
+		self.graph = IncludeGraph(re.compile(br'^\s*#\s*include\s+(["<])(\S+)[">]', re.M))
+
+	def tearDown(self):
+		import shutil
+		shutil.rmtree(self.tempDir)
+
+	def _write(self, path, contents):
+		path = os.path.join(self.tempDir, path)
+		if not os.access(os.path.dirname(path), os.F_OK):
+			os.makedirs(os.path.dirname(path))
+		with open(path, "w") as f:
+			f.write(contents)
+		shared_globals.statCache.Invalidate(path)
+		return path
+
+	def testResolution(self):
+		"""Test that includes are found where the compiler would find them"""
+		source = self._write("src/main.cpp", "#include \"a.h\"\n  #  include <b.h>\n#include <missing.h>\n")
+		localHeader = self._write("src/a.h", "")
+		self._write("src/b.h", "")
+		self._write("inc1/a.h", "")
+		firstHeader = self._write("inc1/b.h", "")
+		self._write("inc2/b.h", "")
+		includeDirs = [os.path.join(self.tempDir, "inc1"), os.path.join(self.tempDir, "inc2")]
+
+		self.assertEqual(
+			{os.path.normpath(localHeader), os.path.normpath(firstHeader)},
+			self.graph.GetDependencies(source, includeDirs)
+		)
+		self.assertEqual((("\"", "a.h"), ("<", "b.h"), ("<", "missing.h")), self.graph.GetIncludes(source))
+		self.assertEqual(set(), self.graph.GetDependencies(self._write("empty.h", ""), includeDirs))
+
+	def testFilesAreOnlyScannedOnce(self):
+		"""Test that a file is only read again once it changes, regardless of the include directories"""
+		source = self._write("src/main.cpp", "#include <a.h>\n")
+		header = self._write("inc1/a.h", "")
+		includeDirs = [os.path.join(self.tempDir, "inc1")]
+
+		self.assertEqual({header}, self.graph.GetDependencies(source, includeDirs))
+		self.assertEqual({header}, self.graph.GetDependencies(source, includeDirs + [os.path.join(self.tempDir, "inc1", ".")]))
+		self.assertEqual(set(), self.graph.GetDependencies(source, []))
+		self.assertEqual(1, self.graph.scans)
+
+		self._write("src/main.cpp", "#include <a.h>\n#include <b.h>\n")
+		os.utime(source, (os.path.getatime(source) + 10, os.path.getmtime(source) + 10))
+		shared_globals.statCache.Invalidate(source)
+		otherHeader = self._write("inc1/b.h", "")
+		self.assertEqual({header, otherHeader}, self.graph.GetDependencies(source, includeDirs))
+		self.assertEqual(2, self.graph.scans)
@@ -0,0 +1,128 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: memo
+	:synopsis: Thread-safe memoization
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import threading
+
+from .._testing import testcase
+
+class Memo(object):
+	"""
+	Memoized values that can be read and filled in from multiple threads at once.
+
+	Values aren't computed under the lock - computing them can take a while, and computing one often means computing
+	others first (such as the dependencies of a header), which would deadlock if two threads were each waiting on
+	a value the other was computing. Instead, two threads may both compute the same value, and whichever stores it
+	first wins, so every caller sees the same value.
+	"""
+	def __init__(self):
+		self._values = {}
+		self._lock = threading.Lock()
+
+	def Get(self, key, default=None):
+		"""
+		Get a memoized value
+
+		:param key: Key the value was stored under
+		:type key: any
+		:param default: Value to return if nothing has been stored for the key
+		:type default: any
+		:return: The value, or default if there is none
+		:rtype: any
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			return self._values.get(key, default)
+
+	def SetDefault(self, key, value):
+		"""
+		Store a value, unless another thread already stored one for the same key
+
+		:param key: Key to store the value under
+		:type key: any
+		:param value: The value
+		:type value: any
+		:return: The value that's memoized for the key, which is the one passed in unless another was stored first
+		:rtype: any
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			return self._values.setdefault(key, value)
+
+	def Clear(self):
+		"""
+		Forget all memoized values
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			self._values.clear()
+
+	def __contains__(self, key):
+		#pylint: disable=not-context-manager
+		with self._lock:
+			return key in self._values
+
+	def __len__(self):
+		#pylint: disable=not-context-manager
+		with self._lock:
+			return len(self._values)
+
+### Unit Tests ###
+
+class TestMemo(testcase.TestCase):
+	"""Test the memo"""
+	# pylint: disable=invalid-name
+	def testFirstValueWins(self):
+		"""Test that the first value stored for a key is the one every caller gets"""
+		memo = Memo()
+		self.assertIsNone(memo.Get("a"))
+		self.assertEqual(1, memo.Get("a", 1))
+		self.assertEqual(2, memo.SetDefault("a", 2))
+		self.assertEqual(2, memo.SetDefault("a", 3))
+		self.assertEqual(2, memo.Get("a"))
+		self.assertIn("a", memo)
+		memo.Clear()
+		self.assertNotIn("a", memo)
+
+	def testThreaded(self):
+		"""Test that every thread sees the same value when many threads fill in the same keys at once"""
+		memo = Memo()
+		results = []
+
+		def _fill(threadIndex):
+			results.append([memo.SetDefault(key, (threadIndex, key)) for key in range(1000)])
+
+		threads = [threading.Thread(target=_fill, args=(i,)) for i in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(1000, len(memo))
+		for result in results:
+			self.assertEqual(results[0], result)
@@ -27,6 +27,8 @@
 
 from __future__ import unicode_literals, division, print_function
 
+import heapq
+import itertools
 import threading
 from collections import deque
 
@@ -67,3 +69,84 @@ class Queue(object):
 		"""
 		self._sema.acquire()
 		return self._deque.popleft()
+
+class _Descending(object):
+	"""
+	Wrapper that inverts the ordering of a value so that heapq, which is a min-heap, pops the highest value first
+	"""
+	__slots__ = ("value",)
+
+	def __init__(self, value):
+		self.value = value
+
+	def __lt__(self, other):
+		return self.value > other.value
+
+	def __eq__(self, other):
+		return self.value == other.value
+
+	def __ne__(self, other):
+		return self.value != other.value
+
+	__hash__ = None
+
+class PriorityQueue(object):
+	"""
+	Queue with the same feature set as Queue, but which hands out items with the highest priority first.
+	Items with equal priority are handed out in the order they were inserted.
+	"""
+	def __init__(self):
+		self._heap = []
+		self._counter = itertools.count()
+		self._lock = threading.Lock()
+		self._sema = threading.Semaphore(0)
+
+	def Put(self, item, priority=0):
+		"""
+		Put an item into the queue
+		:param item: whatever
+		:type item: any
+		:param priority: Priority of the item. Any value that can be compared against the priorities of the other
+			items in the queue (i.e., numbers or tuples of numbers). Higher values are retrieved first.
+		:type priority: any
+		"""
+		self._push((False, _Descending(priority), next(self._counter), item))
+
+	def PutLast(self, item):
+		"""
+		Put an item into the queue that will only be retrieved after every item put with Put()
+		:param item: whatever
+		:type item: any
+		"""
+		self._push((True, _Descending(0), next(self._counter), item))
+
+	def _push(self, entry):
+		#pylint: disable=not-context-manager
+		with self._lock:
+			heapq.heappush(self._heap, entry)
+		self._sema.release()
+
+	def _pop(self):
+		#pylint: disable=not-context-manager
+		with self._lock:
+			return heapq.heappop(self._heap)[3]
+
+	def Get(self):
+		"""
+		Get the highest-priority item out of the queue
+		:raises IndexError: If nothing is in the queue
+		:return: Whatever was put into the queue
+		:rtype: any
+		"""
+		if not self._sema.acquire(False):
+			raise IndexError("Get() on an empty queue")
+		return self._pop()
+
+	def GetBlocking(self):
+		"""
+		Get the highest-priority item out of the queue, blocking if there is nothing to get.
+		:return: Whatever was put into the queue
+		:rtype: any
+		"""
+		self._sema.acquire()
+		return self._pop()
@@ -27,7 +27,7 @@
 
 from __future__ import unicode_literals, division, print_function
 
-from . import PlatformBytes
+from . import PlatformBytes, shared_globals
 
 import os
 import platform
@@ -58,11 +58,12 @@ class ResponseFile(object):
 			flags |= os.O_NOINHERIT # pylint:disable=no-member
 
 		# Create the output directory.
-		if not os.access(dirPath, os.F_OK):
+		if not shared_globals.statCache.Exists(dirPath):
 			# TODO: Investigate ways to handle this in a lock-free manner.
 			with ResponseFile._lock: # pylint:disable=not-context-manager
 				if not os.access(dirPath, os.F_OK):
 					os.makedirs(dirPath)
+					shared_globals.statCache.Invalidate(dirPath)
 
 		self._filePath = os.path.join(dirPath, name)
 		self._commandList = [
@@ -72,9 +73,21 @@ class ResponseFile(object):
 			for arg in cmd if arg
 		]
 
+		contents = PlatformBytes("\n".join([arg.replace("\\", r"\\") for arg in self._commandList]))
+
+		# Commands are built every time their inputs are checked, not just when they're run, so most of the time
+		# the file already has exactly these contents. Leaving it alone saves the write and the fsync.
+		try:
+			if os.path.getsize(self._filePath) == len(contents):
+				with open(self._filePath, "rb") as existing:
+					if existing.read() == contents:
+						return
+		except OSError:
+			pass
+
 		f = os.open(self._filePath, flags, fileMode)
 
-		os.write(f, PlatformBytes("\n".join([arg.replace("\\", r"\\") for arg in self._commandList])))
+		os.write(f, contents)
 		os.fsync(f)
 		os.close(f)
 
@@ -27,6 +27,7 @@ from __future__ import unicode_literals, division, print_function
 
 import os
 import shutil
+import sqlite3
 import threading
 
 import sys
@@ -38,6 +39,7 @@ try:
 except ImportError:
 	import pickle
 from .. import perf_timer, log
+from .._testing import testcase
 
 _sentinel = object()
 
@@ -45,6 +47,15 @@ class SettingsManager(object):
 	"""
 	Settings manager class that manages persistent settings, storing and reading from disk on demand.
 
+	Settings are stored as one record per key in a SQLite database in the settings directory. Only the keys that
+	have been saved since they were loaded are written back, all in a single transaction, so persisting costs
+	as much as what changed, a crash never leaves a half-written record behind, and builds running at the same
+	time in the same directory can't corrupt each other's settings.
+
+	Large collections of independent records, like the hashes of every file, go in record stores instead, where each
+	record is its own row. Persisting one writes only the records that were saved or deleted, so it stays cheap as
+	the store grows, and builds running at the same time only overwrite the records they changed themselves.
+
 	:param settingsDir: Directory to store the data in
 	:type settingsDir: str
 	"""
@@ -54,44 +65,101 @@ class SettingsManager(object):
 		if not os.access(settingsDir, os.F_OK):
 			os.makedirs(settingsDir)
 		self.lock = threading.Lock()
+		self._dirty = set()
+		self.records = {}
+		self._dirtyRecords = set()
+		self._connection = None
+
+	def _getConnection(self):
+		if self._connection is None:
+			if not os.access(self.settingsDir, os.F_OK):
+				os.makedirs(self.settingsDir)
+			# Only ever used with the lock held, so it's safe to share between threads.
+			# The timeout covers waiting on other processes that are persisting their settings.
+			self._connection = sqlite3.connect(
+				os.path.join(self.settingsDir, "settings.db"),
+				timeout=60,
+				check_same_thread=False
+			)
+			with self._connection:
+				self._connection.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+				self._connection.execute(
+					"CREATE TABLE IF NOT EXISTS records (store TEXT, key BLOB, value BLOB NOT NULL, PRIMARY KEY (store, key))"
+				)
+		return self._connection
+
+	@staticmethod
+	def _loads(data):
+		data = bytes(data)
+		if sys.version_info[0] == 2:
+			data = data.replace(PlatformBytes("cUserString"), PlatformBytes("ccollections"))
+			data = data.replace(PlatformBytes("cUserList"), PlatformBytes("ccollections"))
+		return pickle.loads(data)
 
 	def Save(self, key, value):
 		"""
 		Save a value, which will be pickled at protocol 2 so it's supported by all python versions.
+		The value isn't pickled until the settings are persisted, so changes made to it in place after it's saved
+		are persisted too; values that are changed in place must be saved again each time they change, though.
 
-		:param key: Key to store as. Must be a legitimate filename.
+		:param key: Key to store as.
 		:type key: str
 		:param value: The value to store
 		:type value: any
 		"""
 		with perf_timer.PerfTimer("SettingsManager save"):
 			#pylint: disable=not-context-manager
-			self.settings[key] = value
+			with self.lock:
+				self.settings[key] = value
+				self._dirty.add(key)
 
 	def Persist(self):
 		"""
-		Write all settings back to disk
+		Write all settings that have been saved since they were loaded back to disk
 		"""
-		for key, value in self.settings.items():
-			dirFromKey = os.path.join(self.settingsDir, os.path.dirname(key))
-			if not os.access(dirFromKey, os.F_OK):
-				os.makedirs(dirFromKey)
-			log.Info("Storing settings for {}", os.path.join(self.settingsDir, key))
-			with open(os.path.join(self.settingsDir, key), "wb") as f:
-				pickle.dump(value, f, 2)
-				f.flush()
+		#pylint: disable=not-context-manager
+		with self.lock:
+			if not self._dirty and not self._dirtyRecords:
+				return
+			settings = []
+			for key in sorted(self._dirty):
+				log.Info("Storing settings for {}", key)
+				settings.append((key, sqlite3.Binary(pickle.dumps(self.settings[key], 2))))
+			savedRecords = []
+			deletedRecords = []
+			for store in sorted({store for store, _ in self._dirtyRecords}):
+				log.Info("Storing records for {}", store)
+			for store, key in self._dirtyRecords:
+				pickledKey = sqlite3.Binary(pickle.dumps(key, 2))
+				value = self.records[store].get(key, _sentinel)
+				if value is _sentinel:
+					deletedRecords.append((store, pickledKey))
+				else:
+					savedRecords.append((store, pickledKey, sqlite3.Binary(pickle.dumps(value, 2))))
+			connection = self._getConnection()
+			with connection:
+				connection.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", settings)
+				connection.executemany("INSERT OR REPLACE INTO records (store, key, value) VALUES (?, ?, ?)", savedRecords)
+				connection.executemany("DELETE FROM records WHERE store = ? AND key = ?", deletedRecords)
+			self._dirty.clear()
+			self._dirtyRecords.clear()
 
 	def Clear(self):
 		"""
 		Remove all persisted settings
 		"""
-		shutil.rmtree(self.settingsDir)
+		#pylint: disable=not-context-manager
+		with self.lock:
+			if self._connection is not None:
+				self._connection.close()
+				self._connection = None
+			shutil.rmtree(self.settingsDir)
 
 	def Get(self, key, default=None):
 		"""
 		Get a value from the settings store
 
-		:param key: Key to load. Must be a legitimate filename.
+		:param key: Key to load.
 		:type key: str
 		:param default: The default if no stored value exists
 		:type default: any
@@ -106,31 +174,180 @@ class SettingsManager(object):
 				with self.lock:
 					ret = self.settings.get(key, _sentinel)
 					if ret is _sentinel:
-						pathFromKey = os.path.join(self.settingsDir, key)
-						if not os.access(pathFromKey, os.F_OK):
+						row = self._getConnection().execute("SELECT value FROM settings WHERE key = ?", (key, )).fetchone()
+						if row is None:
 							self.settings[key] = default
 							return self.settings[key]
 
-						with open(pathFromKey, "rb") as f:
-							data = f.read()
-							if sys.version_info[0] == 2:
-								data = data.replace(PlatformBytes("cUserString"), PlatformBytes("ccollections"))
-								data = data.replace(PlatformBytes("cUserList"), PlatformBytes("ccollections"))
-							ret = pickle.loads(data)
+						ret = self._loads(row[0])
 
 						self.settings[key] = ret
 			return ret
 
+	def GetRecords(self, store):
+		"""
+		Get every record in a record store. The records are only loaded the first time; after that, the same dict is
+		returned, with the changes made through SaveRecord() and DeleteRecord(). It must not be changed directly.
+
+		:param store: Name of the store
+		:type store: str
+		:return: The records, by key
+		:rtype: dict
+		"""
+		with perf_timer.PerfTimer("SettingsManager load"):
+			# Double-check lock pattern
+			ret = self.records.get(store)
+			if ret is None:
+				# pylint: disable=not-context-manager
+				with self.lock:
+					ret = self.records.get(store)
+					if ret is None:
+						rows = self._getConnection().execute("SELECT key, value FROM records WHERE store = ?", (store, ))
+						ret = {self._loads(key): self._loads(value) for key, value in rows}
+						self.records[store] = ret
+			return ret
+
+	def SaveRecord(self, store, key, value):
+		"""
+		Save a record in a record store. Like Save(), the value isn't pickled until the settings are persisted.
+
+		:param store: Name of the store
+		:type store: str
+		:param key: Key of the record, which must be picklable the same way every time, like a string or a tuple of them
+		:type key: any
+		:param value: The value to store
+		:type value: any
+		"""
+		records = self.GetRecords(store)
+		with perf_timer.PerfTimer("SettingsManager save"):
+			#pylint: disable=not-context-manager
+			with self.lock:
+				records[key] = value
+				self._dirtyRecords.add((store, key))
+
+	def DeleteRecord(self, store, key):
+		"""
+		Delete a record from a record store when the settings are persisted. Nop if it doesn't exist.
+
+		:param store: Name of the store
+		:type store: str
+		:param key: Key of the record
+		:type key: any
+		"""
+		records = self.GetRecords(store)
+		#pylint: disable=not-context-manager
+		with self.lock:
+			records.pop(key, None)
+			self._dirtyRecords.add((store, key))
+
 	def Delete(self, key):
 		"""
 		Delete a value from the settings store if it exists. Nop if it doesn't.
 
-		:param key: Key to delete. Must be a legitimate filename.
+		:param key: Key to delete.
 		:type key: str
 		"""
 		#pylint: disable=not-context-manager
 		with self.lock:
 			self.settings.pop(key, None)
-			pathFromKey = os.path.join(self.settingsDir, key)
-			if os.access(pathFromKey, os.F_OK):
-				os.remove(pathFromKey)
+			self._dirty.discard(key)
+			connection = self._getConnection()
+			with connection:
+				connection.execute("DELETE FROM settings WHERE key = ?", (key, ))
+
+	def Close(self):
+		"""
+		Close the settings database. It's reopened if the settings are used again.
+		"""
+		#pylint: disable=not-context-manager
+		with self.lock:
+			if self._connection is not None:
+				self._connection.close()
+				self._connection = None
+
+### Unit Tests ###
+
+class TestSettingsManager(testcase.TestCase):
+	"""Test the settings manager"""
+	# pylint: disable=invalid-name
+	def setUp(self):
+		import tempfile
+		self.tempDir = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.tempDir, ignore_errors=True)
+
+	def testPersistedValuesAreLoaded(self):
+		"""Test that persisted values, including changes made in place before persisting, are loaded again"""
+		settings = SettingsManager(self.tempDir)
+		value = {"a": 1}
+		settings.Save("project.value", value)
+		value["b"] = 2
+		settings.Persist()
+		settings.Close()
+
+		settings = SettingsManager(self.tempDir)
+		self.assertEqual({"a": 1, "b": 2}, settings.Get("project.value"))
+		self.assertEqual("default", settings.Get("project.missing", "default"))
+		settings.Close()
+
+	def testOnlySavedKeysArePersisted(self):
+		"""Test that keys that were only loaded don't overwrite changes persisted by another manager"""
+		settings = SettingsManager(self.tempDir)
+		settings.Save("first", 1)
+		settings.Save("second", 1)
+		settings.Persist()
+
+		other = SettingsManager(self.tempDir)
+		self.assertEqual(1, other.Get("first"))
+		other.Save("second", 2)
+
+		settings.Save("first", 2)
+		settings.Persist()
+		other.Persist()
+		settings.Close()
+		other.Close()
+
+		settings = SettingsManager(self.tempDir)
+		self.assertEqual(2, settings.Get("first"))
+		self.assertEqual(2, settings.Get("second"))
+		settings.Close()
+
+	def testRecordsFromConcurrentBuildsAreMerged(self):
+		"""Test that each build only overwrites the records it saved or deleted itself"""
+		settings = SettingsManager(self.tempDir)
+		settings.SaveRecord("fileHashes", "a.cpp", 1)
+		settings.SaveRecord("fileHashes", "b.cpp", 1)
+		settings.SaveRecord("fileHashes", "c.cpp", 1)
+		settings.Persist()
+
+		other = SettingsManager(self.tempDir)
+		self.assertEqual({"a.cpp": 1, "b.cpp": 1, "c.cpp": 1}, other.GetRecords("fileHashes"))
+		other.SaveRecord("fileHashes", "b.cpp", 2)
+		other.SaveRecord("fileHashes", "d.cpp", 2)
+
+		settings.SaveRecord("fileHashes", "a.cpp", 2)
+		settings.DeleteRecord("fileHashes", "c.cpp")
+		settings.Persist()
+		other.Persist()
+		settings.Close()
+		other.Close()
+
+		settings = SettingsManager(self.tempDir)
+		self.assertEqual({"a.cpp": 2, "b.cpp": 2, "d.cpp": 2}, settings.GetRecords("fileHashes"))
+		self.assertEqual({}, settings.GetRecords("other"))
+		settings.Close()
+
+	def testDelete(self):
+		"""Test that deleted values are gone, even if they were saved and not persisted"""
+		settings = SettingsManager(self.tempDir)
+		settings.Save("first", 1)
+		settings.Persist()
+		settings.Save("first", 2)
+		settings.Delete("first")
+		settings.Persist()
+		settings.Close()
+
+		settings = SettingsManager(self.tempDir)
+		self.assertEqual(None, settings.Get("first"))
+		settings.Close()
@@ -27,7 +27,7 @@
 
 from __future__ import unicode_literals, division, print_function
 
-from . import dag
+from . import dag, task_history, stat_cache
 
 errors = []
 warnings = []
@@ -90,12 +90,30 @@ verbosity = Verbosity.Verbose
 
 showCommands = False
 
+class SchedulingMode(object):
+	"""
+	'enum' representing the order in which ready build tasks are handed to the thread pool
+	"""
+	Fifo = 0
+	CriticalPath = 1
+
+schedulingMode = SchedulingMode.Fifo
+
+# If True, the main thread processes all finished tasks at once and checks what they've enabled once per batch
+batchCompletions = False
+
+# If True, projects that are unchanged since their last successful build are skipped before their files are discovered
+useProjectFingerprints = False
+
 projectMap = {}
 
 projectBuildList = []
 
 commandOutputThread = None
 
+# artifact_cache.ArtifactCache for restoring compiled objects instead of compiling them, or None if it's disabled
+artifactCache = None
+
 columns = 0
 clearBar = ""
 
@@ -103,6 +121,8 @@ startTime = 0
 
 totalBuilds = 0
 completedBuilds = 0
+# Estimated seconds until all currently known tasks finish, or None if there's no history to estimate from
+estimatedTimeRemaining = None
 
 buildStartedHooks = set()
 buildFinishedHooks = set()
@@ -158,3 +178,7 @@ class InMemoryOnlySettings(object):
 		self.dict.pop(key, None)
 
 settings = InMemoryOnlySettings()
+
+taskHistory = task_history.TaskHistory(None)
+
+statCache = stat_cache.StatCache()
@@ -0,0 +1,321 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: stat_cache
+	:synopsis: Snapshot of file system metadata taken over the course of a build
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import errno
+import os
+import platform
+import threading
+
+from .._testing import testcase
+
+_caseInsensitive = platform.system() in ("Windows", "Darwin")
+
+class _Entry(object):
+	"""
+	Stand-in for os.DirEntry where os.scandir isn't available
+	"""
+	__slots__ = ("path", "_isDir", "_stat")
+
+	def __init__(self, path):
+		self.path = path
+		self._isDir = None
+		self._stat = None
+
+	def is_dir(self): # pylint: disable=invalid-name
+		"""
+		:return: Whether the entry is a directory
+		:rtype: bool
+		"""
+		if self._isDir is None:
+			self._isDir = os.path.isdir(self.path)
+		return self._isDir
+
+	def is_symlink(self): # pylint: disable=invalid-name
+		"""
+		:return: Whether the entry is a symbolic link
+		:rtype: bool
+		"""
+		return os.path.islink(self.path)
+
+	def stat(self): # pylint: disable=invalid-name
+		"""
+		:return: The entry's stat result
+		:rtype: os.stat_result
+		"""
+		if self._stat is None:
+			self._stat = os.stat(self.path)
+		return self._stat
+
+def _listDirectory(directory):
+	"""
+	:return: Entries in the directory, keyed by name, or None if it doesn't exist
+	:rtype: dict[str, os.DirEntry] or None
+	"""
+	try:
+		if hasattr(os, "scandir"):
+			entries = [(entry.name, entry) for entry in os.scandir(directory)]
+		else:
+			entries = [(name, _Entry(os.path.join(directory, name))) for name in os.listdir(directory)]
+	except OSError:
+		return None
+	if _caseInsensitive:
+		return {name.lower(): entry for name, entry in entries}
+	return dict(entries)
+
+class StatCache(object):
+	"""
+	Caches whether paths exist, whether they're directories, and their stat results, so each path only gets asked
+	about once per build no matter how many things want to know. Whole directories are read at once with os.scandir,
+	so whether a file exists is answered from its directory's listing without a system call of its own.
+
+	Anything written during the build has to be passed to Invalidate() before it's looked at again, which the build
+	does for every output a tool reports.
+	"""
+	def __init__(self):
+		self._listings = {}
+		self._stats = {}
+		self._lock = threading.Lock()
+
+	def _getListing(self, directory):
+		listing = self._listings.get(directory, self)
+		if listing is self:
+			listing = _listDirectory(directory)
+			#pylint: disable=not-context-manager
+			with self._lock:
+				listing = self._listings.setdefault(directory, listing)
+		return listing
+
+	def _getEntry(self, path):
+		path = os.path.abspath(path)
+		directory, name = os.path.split(path)
+		if not name:
+			# Root directories don't have a listing to be in
+			return _Entry(path) if os.access(path, os.F_OK) else None
+		listing = self._getListing(directory)
+		if listing is None:
+			return None
+		if _caseInsensitive:
+			name = name.lower()
+		return listing.get(name)
+
+	def Exists(self, path):
+		"""
+		:param path: Path to check
+		:type path: str
+		:return: Whether the path exists
+		:rtype: bool
+		"""
+		return self._getEntry(path) is not None
+
+	def IsDir(self, path):
+		"""
+		:param path: Path to check
+		:type path: str
+		:return: Whether the path exists and is a directory
+		:rtype: bool
+		"""
+		entry = self._getEntry(path)
+		return entry is not None and entry.is_dir()
+
+	def IsFile(self, path):
+		"""
+		:param path: Path to check
+		:type path: str
+		:return: Whether the path exists and isn't a directory
+		:rtype: bool
+		"""
+		entry = self._getEntry(path)
+		return entry is not None and not entry.is_dir()
+
+	def Stat(self, path):
+		"""
+		:param path: Path to stat
+		:type path: str
+		:return: The path's stat result, or None if it doesn't exist
+		:rtype: os.stat_result or None
+		"""
+		path = os.path.abspath(path)
+		stat = self._stats.get(path, self)
+		if stat is self:
+			entry = self._getEntry(path)
+			stat = None
+			if entry is not None:
+				try:
+					stat = entry.stat()
+				except OSError:
+					pass
+			#pylint: disable=not-context-manager
+			with self._lock:
+				stat = self._stats.setdefault(path, stat)
+		return stat
+
+	def GetMtime(self, path):
+		"""
+		:param path: Path to check
+		:type path: str
+		:raises OSError: If the path doesn't exist
+		:return: The path's modification time, as with os.path.getmtime()
+		:rtype: float
+		"""
+		stat = self.Stat(path)
+		if stat is None:
+			raise OSError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+		return stat.st_mtime
+
+	def Walk(self, top):
+		"""
+		Walk a directory tree top-down, as with os.walk(), keeping the listing of every directory it visits.
+
+		:param top: Directory to start at
+		:type top: str
+		:return: Generator of (directory, directory names, file names) for each directory in the tree.
+			Removing entries from the directory names skips them, as with os.walk().
+		:rtype: generator[tuple[str, list[str], list[str]]]
+		"""
+		listing = self._getListing(os.path.abspath(top))
+		if listing is None:
+			return
+		dirnames = []
+		filenames = []
+		links = set()
+		for entry in listing.values():
+			name = os.path.basename(entry.path)
+			if entry.is_dir():
+				dirnames.append(name)
+				if entry.is_symlink():
+					links.add(name)
+			else:
+				filenames.append(name)
+		yield top, dirnames, filenames
+		for dirname in dirnames:
+			# Like os.walk(), links to directories are listed but not followed
+			if dirname not in links:
+				for ret in self.Walk(os.path.join(top, dirname)):
+					yield ret
+
+	def Invalidate(self, path):
+		"""
+		Forget everything about a path that's been created, changed, or removed, along with anything it changes
+		about the directories above it.
+
+		:param path: The path
+		:type path: str
+		"""
+		path = os.path.abspath(path)
+		#pylint: disable=not-context-manager
+		with self._lock:
+			self._stats.pop(path, None)
+			self._listings.pop(path, None)
+			directory = os.path.dirname(path)
+			while directory:
+				self._stats.pop(directory, None)
+				if self._listings.pop(directory, self) is not None:
+					# The directory existed or was never listed, so nothing above it has changed
+					break
+				parent = os.path.dirname(directory)
+				if parent == directory:
+					break
+				directory = parent
+
+	def Clear(self):
+		"""
+		Forget everything, so it's all looked up again
+		"""
+		#pylint: disable=not-context-manager
+		with self._lock:
+			self._listings.clear()
+			self._stats.clear()
+
+### Unit Tests ###
+
+class TestStatCache(testcase.TestCase):
+	"""Test the stat cache"""
+	# pylint: disable=invalid-name
+	def setUp(self):
+		import tempfile
+		self.tempDir = tempfile.mkdtemp()
+		self.file = os.path.join(self.tempDir, "a.txt")
+		with open(self.file, "w") as f:
+			f.write("a")
+		os.mkdir(os.path.join(self.tempDir, "dir"))
+
+	def tearDown(self):
+		import shutil
+		shutil.rmtree(self.tempDir)
+
+	def testLookups(self):
+		"""Test that lookups match the file system"""
+		cache = StatCache()
+		self.assertTrue(cache.Exists(self.file))
+		self.assertTrue(cache.IsFile(self.file))
+		self.assertFalse(cache.IsDir(self.file))
+		self.assertTrue(cache.IsDir(os.path.join(self.tempDir, "dir")))
+		self.assertFalse(cache.Exists(os.path.join(self.tempDir, "b.txt")))
+		self.assertFalse(cache.Exists(os.path.join(self.tempDir, "missing", "b.txt")))
+		self.assertEqual(os.path.getmtime(self.file), cache.GetMtime(self.file))
+		self.assertIsNone(cache.Stat(os.path.join(self.tempDir, "b.txt")))
+		with self.assertRaises(OSError):
+			cache.GetMtime(os.path.join(self.tempDir, "b.txt"))
+
+	def testSnapshot(self):
+		"""Test that changes aren't seen until the changed paths are invalidated"""
+		cache = StatCache()
+		newFile = os.path.join(self.tempDir, "missing", "b.txt")
+		mtime = cache.GetMtime(self.file)
+		self.assertFalse(cache.Exists(newFile))
+
+		os.utime(self.file, (os.path.getatime(self.file), mtime + 10))
+		os.mkdir(os.path.dirname(newFile))
+		with open(newFile, "w") as f:
+			f.write("b")
+		self.assertEqual(mtime, cache.GetMtime(self.file))
+		self.assertFalse(cache.Exists(newFile))
+
+		cache.Invalidate(self.file)
+		cache.Invalidate(newFile)
+		self.assertEqual(mtime + 10, cache.GetMtime(self.file))
+		self.assertTrue(cache.Exists(newFile))
+		self.assertTrue(cache.IsDir(os.path.dirname(newFile)))
+
+	def testWalk(self):
+		"""Test that walking matches os.walk()"""
+		os.mkdir(os.path.join(self.tempDir, "dir", "skipped"))
+		with open(os.path.join(self.tempDir, "dir", "skipped", "c.txt"), "w") as f:
+			f.write("c")
+		cache = StatCache()
+
+		def _walk(walker):
+			ret = []
+			for root, dirnames, filenames in walker(self.tempDir):
+				if "skipped" in dirnames:
+					dirnames.remove("skipped")
+				ret.append((root, sorted(dirnames), sorted(filenames)))
+			return sorted(ret)
+
+		self.assertEqual(_walk(os.walk), _walk(cache.Walk))
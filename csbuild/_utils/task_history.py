@@ -0,0 +1,397 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: task_history
+	:synopsis: Persistent record of how long previous build tasks took to execute
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import threading
+
+try:
+	import cPickle as pickle
+except ImportError:
+	import pickle
+
+from .. import perf_timer
+from .._testing import testcase
+
+# Enough room for a couple of tools per file in a 100k-file tree across a handful of configurations
+DEFAULT_MAX_RECORDS = 500000
+
+# The log is rewritten once it contains this many times more entries than there are live records
+_compactionRatio = 2
+# ...but never for logs smaller than this, since the entries are cheap to replay
+_minimumCompactionSize = 1024
+
+
+class TaskRecord(object):
+	"""
+	History for a single (project, tool, input) task.
+
+	:param duration: Smoothed wall time of the task, in seconds
+	:type duration: float
+	:param succeeded: Whether the most recent run succeeded
+	:type succeeded: bool
+	:param inputSize: Total size in bytes of the inputs on the most recent run
+	:type inputSize: int
+	:param lastUsed: Sequence number of the most recent update, used to evict the oldest records first
+	:type lastUsed: int
+	"""
+	__slots__ = ("duration", "succeeded", "inputSize", "lastUsed")
+
+	def __init__(self, duration, succeeded, inputSize, lastUsed):
+		self.duration = duration
+		self.succeeded = succeeded
+		self.inputSize = inputSize
+		self.lastUsed = lastUsed
+
+
+class TaskHistory(object):
+	"""
+	Database of how long previous build tasks took, used to estimate the cost of future ones.
+
+	Updates are appended to a log file on Flush() rather than rewriting the whole history each build;
+	the log is compacted back down to one entry per task once it grows too large, and the least recently
+	updated tasks are dropped once there are more than maxRecords of them.
+
+	:param path: File to store the history in, or None to keep it in memory only
+	:type path: str or None
+	:param maxRecords: Maximum number of tasks to remember
+	:type maxRecords: int
+	"""
+	def __init__(self, path, maxRecords=DEFAULT_MAX_RECORDS):
+		self.path = path
+		self.maxRecords = maxRecords
+		self.lock = threading.Lock()
+
+		self._records = {}
+		self._toolTotals = {}
+		self._totalDuration = 0.0
+		self._sequence = 0
+		self._pending = []
+		self._logLength = 0
+		self._needsCompaction = False
+
+		if path is not None and os.access(path, os.F_OK):
+			self._load()
+
+	def _load(self):
+		with perf_timer.PerfTimer("Loading task history"):
+			with open(self.path, "rb") as f:
+				size = os.fstat(f.fileno()).st_size
+				while f.tell() < size:
+					try:
+						key, duration, succeeded, inputSize = pickle.load(f)
+					except (EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError, ImportError, IndexError, KeyError):
+						# A build that was killed mid-write can leave a partial entry at the end; drop it
+						# (and anything after it) and rewrite the log cleanly on the next flush.
+						self._needsCompaction = True
+						break
+					self._apply(key, duration, succeeded, inputSize)
+					self._logLength += 1
+
+	def _apply(self, key, duration, succeeded, inputSize):
+		self._sequence += 1
+		record = self._records.get(key)
+		toolTotal = self._toolTotals.setdefault(key[1], [0.0, 0])
+
+		if record is None:
+			self._records[key] = TaskRecord(duration, succeeded, inputSize, self._sequence)
+			toolTotal[0] += duration
+			toolTotal[1] += 1
+			self._totalDuration += duration
+			return
+
+		if succeeded or not record.succeeded:
+			# Failures tend to bail out early, so don't let them drag down the timing of a task that has
+			# succeeded before. Otherwise, smooth over the last few runs to even out noise from machine load.
+			newDuration = (record.duration + duration) / 2.0
+			toolTotal[0] += newDuration - record.duration
+			self._totalDuration += newDuration - record.duration
+			record.duration = newDuration
+		record.succeeded = succeeded
+		record.inputSize = inputSize
+		record.lastUsed = self._sequence
+
+	def Record(self, project, tool, inputFile, duration, succeeded, inputSize):
+		"""
+		Record the result of running a task. Thread-safe.
+
+		:param project: Identifier for the project the task belonged to
+		:type project: str
+		:param tool: Name of the tool that executed the task
+		:type tool: str
+		:param inputFile: Input file processed by the task, or None for group and null-input tasks
+		:type inputFile: str or None
+		:param duration: Wall time the task took, in seconds
+		:type duration: float
+		:param succeeded: Whether the task succeeded
+		:type succeeded: bool
+		:param inputSize: Total size in bytes of the task's inputs
+		:type inputSize: int
+		"""
+		key = (project, tool, inputFile)
+		#pylint: disable=not-context-manager
+		with self.lock:
+			self._apply(key, duration, succeeded, inputSize)
+			self._pending.append((key, duration, succeeded, inputSize))
+
+	def GetRecord(self, project, tool, inputFile):
+		"""
+		Get the history for a specific task.
+
+		:param project: Identifier for the project the task belonged to
+		:type project: str
+		:param tool: Name of the tool that executed the task
+		:type tool: str
+		:param inputFile: Input file processed by the task, or None for group and null-input tasks
+		:type inputFile: str or None
+		:return: The task's history, or None if it has never been run
+		:rtype: TaskRecord or None
+		"""
+		return self._records.get((project, tool, inputFile))
+
+	def GetToolAverage(self, tool):
+		"""
+		Get the average duration of all recorded tasks run by a tool.
+
+		:param tool: Name of the tool
+		:type tool: str
+		:return: Average duration in seconds, or None if the tool has no history
+		:rtype: float or None
+		"""
+		toolTotal = self._toolTotals.get(tool)
+		if not toolTotal or not toolTotal[1]:
+			return None
+		return toolTotal[0] / toolTotal[1]
+
+	def Estimate(self, project, tool, inputFile):
+		"""
+		Estimate how long a task will take. Falls back on the average of the tool's other tasks for tasks that
+		have never been run, and on the average of all tasks for tools that have never been run.
+
+		:param project: Identifier for the project the task belongs to
+		:type project: str
+		:param tool: Name of the tool that will execute the task
+		:type tool: str
+		:param inputFile: Input file to be processed by the task, or None for group and null-input tasks
+		:type inputFile: str or None
+		:return: Estimated duration in seconds, or None if there is no history at all
+		:rtype: float or None
+		"""
+		record = self._records.get((project, tool, inputFile))
+		if record is not None:
+			return record.duration
+		average = self.GetToolAverage(tool)
+		if average is not None:
+			return average
+		if not self._records:
+			return None
+		return self._totalDuration / len(self._records)
+
+	def _evict(self):
+		excess = len(self._records) - self.maxRecords
+		if excess <= 0:
+			return
+		oldest = sorted(self._records.items(), key=lambda item: item[1].lastUsed)[:excess]
+		for key, record in oldest:
+			del self._records[key]
+			toolTotal = self._toolTotals[key[1]]
+			toolTotal[0] -= record.duration
+			toolTotal[1] -= 1
+			self._totalDuration -= record.duration
+		self._needsCompaction = True
+
+	def _compact(self):
+		with perf_timer.PerfTimer("Compacting task history"):
+			tempPath = self.path + ".tmp"
+			with open(tempPath, "wb") as f:
+				for key, record in sorted(self._records.items(), key=lambda item: item[1].lastUsed):
+					pickle.dump((key, record.duration, record.succeeded, record.inputSize), f, 2)
+			if hasattr(os, "replace"):
+				os.replace(tempPath, self.path)
+			else:
+				if os.access(self.path, os.F_OK):
+					os.remove(self.path)
+				os.rename(tempPath, self.path)
+			self._logLength = len(self._records)
+			self._needsCompaction = False
+
+	def Flush(self):
+		"""
+		Write any new records to disk, compacting the stored history if it has grown too large.
+		"""
+		#pylint: disable=not-context-manager
+		with self.lock:
+			self._evict()
+			if self.path is None:
+				self._pending = []
+				return
+
+			dirname = os.path.dirname(self.path)
+			if dirname and not os.access(dirname, os.F_OK):
+				os.makedirs(dirname)
+
+			if self._needsCompaction or self._logLength + len(self._pending) > max(
+				_minimumCompactionSize,
+				_compactionRatio * len(self._records)
+			):
+				self._pending = []
+				self._compact()
+				return
+
+			with perf_timer.PerfTimer("Saving task history"):
+				with open(self.path, "ab") as f:
+					for entry in self._pending:
+						pickle.dump(entry, f, 2)
+				self._logLength += len(self._pending)
+				self._pending = []
+
+	def Clear(self):
+		"""
+		Forget all recorded history, both in memory and on disk.
+		"""
+		#pylint: disable=not-context-manager
+		with self.lock:
+			self._records = {}
+			self._toolTotals = {}
+			self._totalDuration = 0.0
+			self._pending = []
+			self._logLength = 0
+			self._needsCompaction = False
+			if self.path is not None and os.access(self.path, os.F_OK):
+				os.remove(self.path)
+
+### Unit Tests ###
+
+class TestTaskHistory(testcase.TestCase):
+	"""Test the task history database"""
+
+	# pylint: disable=invalid-name
+	def setUp(self):
+		"""Create a scratch location for the history file"""
+		import tempfile
+		self.tempDir = tempfile.mkdtemp()
+		self.path = os.path.join(self.tempDir, "taskHistory")
+
+	def tearDown(self):
+		"""Remove the scratch location"""
+		import shutil
+		shutil.rmtree(self.tempDir)
+
+	def testEstimates(self):
+		"""Test that estimates come from the task itself, then the tool, then everything"""
+		history = TaskHistory(None)
+		self.assertIsNone(history.Estimate("proj", "Compiler", "a.cpp"))
+
+		history.Record("proj", "Compiler", "a.cpp", 2.0, True, 100)
+		history.Record("proj", "Compiler", "b.cpp", 4.0, True, 100)
+		history.Record("proj", "Linker", None, 9.0, True, 200)
+
+		self.assertEqual(2.0, history.Estimate("proj", "Compiler", "a.cpp"))
+		self.assertEqual(3.0, history.Estimate("proj", "Compiler", "c.cpp"))
+		self.assertEqual(5.0, history.Estimate("proj", "Archiver", None))
+
+		history.Record("proj", "Compiler", "a.cpp", 4.0, True, 100)
+		self.assertEqual(3.0, history.Estimate("proj", "Compiler", "a.cpp"))
+
+		# A failure shouldn't skew the timing of a task that's succeeded before
+		history.Record("proj", "Compiler", "a.cpp", 0.1, False, 100)
+		record = history.GetRecord("proj", "Compiler", "a.cpp")
+		self.assertEqual(3.0, record.duration)
+		self.assertFalse(record.succeeded)
+
+	def testPersistence(self):
+		"""Test that history survives being flushed and reloaded, including incremental updates"""
+		history = TaskHistory(self.path)
+		history.Record("proj", "Compiler", "a.cpp", 2.0, True, 100)
+		history.Flush()
+
+		history = TaskHistory(self.path)
+		history.Record("proj", "Compiler", "b.cpp", 4.0, False, 50)
+		history.Flush()
+
+		history = TaskHistory(self.path)
+		self.assertEqual(2.0, history.Estimate("proj", "Compiler", "a.cpp"))
+		record = history.GetRecord("proj", "Compiler", "b.cpp")
+		self.assertEqual(4.0, record.duration)
+		self.assertFalse(record.succeeded)
+		self.assertEqual(50, record.inputSize)
+
+		history.Clear()
+		self.assertFalse(os.access(self.path, os.F_OK))
+		self.assertIsNone(TaskHistory(self.path).Estimate("proj", "Compiler", "a.cpp"))
+
+	def testCompaction(self):
+		"""Test that repeated updates to the same tasks don't grow the history without bound"""
+		history = TaskHistory(self.path)
+		for _ in range(10):
+			for i in range(500):
+				history.Record("proj", "Compiler", "{}.cpp".format(i), 1.0, True, 100)
+			history.Flush()
+			# Reopen each time so this acts like a series of separate builds
+			history = TaskHistory(self.path)
+
+		# pylint: disable=protected-access
+		self.assertLessEqual(history._logLength, max(_minimumCompactionSize, _compactionRatio * 500))
+		self.assertEqual(500, len(history._records))
+
+	def testEviction(self):
+		"""Test that the least recently updated tasks are dropped once the history is full"""
+		history = TaskHistory(self.path, maxRecords=3)
+		for i in range(5):
+			history.Record("proj", "Compiler", "{}.cpp".format(i), float(i), True, 100)
+		history.Record("proj", "Compiler", "0.cpp", 0.0, True, 100)
+		history.Flush()
+
+		history = TaskHistory(self.path, maxRecords=3)
+		self.assertIsNotNone(history.GetRecord("proj", "Compiler", "0.cpp"))
+		self.assertIsNone(history.GetRecord("proj", "Compiler", "1.cpp"))
+		self.assertIsNone(history.GetRecord("proj", "Compiler", "2.cpp"))
+		self.assertIsNotNone(history.GetRecord("proj", "Compiler", "3.cpp"))
+		self.assertIsNotNone(history.GetRecord("proj", "Compiler", "4.cpp"))
+		self.assertEqual((0.0 + 3.0 + 4.0) / 3, history.GetToolAverage("Compiler"))
+
+	def testTruncatedLog(self):
+		"""Test that a log cut off partway through an entry still loads everything before it"""
+		history = TaskHistory(self.path)
+		history.Record("proj", "Compiler", "a.cpp", 2.0, True, 100)
+		history.Flush()
+		history.Record("proj", "Compiler", "b.cpp", 3.0, True, 100)
+		history.Flush()
+
+		with open(self.path, "rb") as f:
+			data = f.read()
+		with open(self.path, "wb") as f:
+			f.write(data[:-3])
+
+		history = TaskHistory(self.path)
+		self.assertEqual(2.0, history.Estimate("proj", "Compiler", "a.cpp"))
+		self.assertIsNone(history.GetRecord("proj", "Compiler", "b.cpp"))
+		history.Flush()
+
+		history = TaskHistory(self.path)
+		self.assertEqual(2.0, history.Estimate("proj", "Compiler", "a.cpp"))
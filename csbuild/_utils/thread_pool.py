@@ -29,6 +29,7 @@
 from __future__ import unicode_literals, division, print_function
 
 import functools
+import numbers
 import sys
 import threading
 import inspect
@@ -38,6 +39,7 @@ from .._testing import testcase
 from . import queue
 from .decorators import TypeChecked
 from .reraise import Reraise
+from .string_abc import String
 
 if sys.version_info[0] >= 3:
 	from collections.abc import Callable
@@ -45,6 +47,97 @@ else:
 	from collections import Callable
 	# pylint: disable=import-error
 
+# Calling conventions already worked out for callbacks, keyed by _getConventionKey()
+_callbackConventions = {}
+
+def _getConventionKey(callback):
+	"""
+	Get a key that identifies everything about a callback that affects how it has to be called, so callbacks
+	that only differ in their bound values (i.e., partials of the same function, or lambdas created by the same
+	line of code) share a cache entry.
+
+	:param callback: The callback
+	:type callback: Callable
+	:return: The key, or None if the callback's convention can't be cached
+	:rtype: tuple or None
+	"""
+	if isinstance(callback, functools.partial):
+		funcKey = _getConventionKey(callback.func)
+		if funcKey is None:
+			return None
+		return funcKey, len(callback.args), frozenset(callback.keywords or ())
+	code = getattr(callback, "__code__", None)
+	if code is not None:
+		return code, hasattr(callback, "__self__")
+	return None
+
+def _resolveCallbackConvention(callback):
+	"""
+	Inspect a callback to find out how to pass a task's return value to it
+
+	:param callback: The callback
+	:type callback: Callable
+	:return: The number of parameters the callback accepts (-1 if it accepts *args), and the total number of
+		parameters it declares
+	:rtype: tuple[int, int]
+	"""
+	if isinstance(callback, functools.partial):
+		try:
+			# In python 3, the argspec of a partial already excludes the parameters bound by the partial
+			argspec = inspect.getfullargspec(callback)
+			boundArgs = 0
+		except AttributeError:
+			argspec = inspect.getargspec(callback.func) # pylint: disable=deprecated-method
+			boundArgs = len(callback.args)
+		if argspec[1]:
+			nargs = -1
+		else:
+			nargs = len(argspec[0]) - boundArgs
+	else:
+		try:
+			argspec = inspect.getfullargspec(callback)
+		except AttributeError:
+			argspec = inspect.getargspec(callback) # pylint: disable=deprecated-method
+		if argspec[1]:
+			nargs = -1
+		else:
+			nargs = len(argspec[0])
+	return nargs, len(argspec[0])
+
+def _getCallbackConvention(callback):
+	"""
+	Get how to pass a task's return value to a callback, inspecting it only the first time a callback of its kind
+	is seen.
+
+	:param callback: The callback
+	:type callback: Callable
+	:return: The number of parameters the callback accepts (-1 if it accepts *args), and the total number of
+		parameters it declares
+	:rtype: tuple[int, int]
+	"""
+	key = _getConventionKey(callback)
+	if key is None:
+		return _resolveCallbackConvention(callback)
+	convention = _callbackConventions.get(key)
+	if convention is None:
+		convention = _resolveCallbackConvention(callback)
+		_callbackConventions[key] = convention
+	return convention
+
+def _invokeCallback(callback, convention, ret):
+	nargs, totalArgs = convention
+	if isinstance(ret, tuple):
+		if nargs == -1 or nargs == totalArgs:
+			callback(*ret)
+			return
+	if nargs == 1:
+		callback(ret)
+		return
+	if nargs == 0:
+		callback()
+		return
+	raise TypeError("Could not find a way to call {} with parameters {}".format(callback, ret))
+
 class ThreadedTaskException(Exception):
 	"""
 	Wraps another exception, allowing the other exception to be caught and handled, then rethrown.
@@ -68,32 +161,66 @@ class ThreadedTaskException(Exception):
 		Reraise(self.exception, self.traceback)
 
 
+class _Lane(object):
+	"""
+	Admission state for a group of tasks that may only have a limited number of tasks executing at once.
+	Tasks beyond the limit wait in the lane and are handed to the pool as the lane's running tasks finish.
+
+	:param limit: Maximum number of the lane's tasks that may execute at once
+	:type limit: int
+	:param prioritized: Whether waiting tasks are released in order of priority rather than the order they were added
+	:type prioritized: bool
+	"""
+	__slots__ = ("limit", "running", "waiting")
+
+	def __init__(self, limit, prioritized):
+		self.limit = limit
+		self.running = 0
+		if prioritized:
+			self.waiting = queue.PriorityQueue()
+		else:
+			self.waiting = queue.Queue()
+
+
 class ThreadPool(object):
 	"""
 	Thread Pool and Task Management class
 	Allows tasks to be inserted into a queue in a thread-safe way from any thread
 	The first available thread will then handle that task
 
+	Tasks can optionally be assigned to a lane created with AddLane(). Only as many of a lane's tasks as its limit
+	allows will execute at once; the rest are held back without occupying a thread and are started automatically,
+	in order, as the lane's running tasks finish.
+
 	:param numThreads: Number of threads in the pool - must be positive
 	:type numThreads: int
 	:param callbackQueue: Queue to be used to pass completion callbacks back to the main thread
 	:type callbackQueue: queue.Queue
 	:param stopOnException: Stop processing tasks once any thread has received an exception.
 	:type stopOnException: bool
+	:param prioritized: If True, tasks are executed in order of the priority passed to AddTask() rather than
+		in the order they were added.
+	:type prioritized: bool
 	"""
 	exitEvent = object()
 
-	@TypeChecked(numThreads=int, callbackQueue=queue.Queue, stopOnException=bool)
-	def __init__(self, numThreads, callbackQueue, stopOnException=True):
+	@TypeChecked(numThreads=int, callbackQueue=queue.Queue, stopOnException=bool, prioritized=bool)
+	def __init__(self, numThreads, callbackQueue, stopOnException=True, prioritized=False):
 
 		assert numThreads > 0
 
-		self.queue = queue.Queue()
+		self.prioritized = prioritized
+		if prioritized:
+			self.queue = queue.PriorityQueue()
+		else:
+			self.queue = queue.Queue()
 		self.threads = [threading.Thread(target=self._threadRunner) for _ in range(numThreads)]
 		self.callbackQueue = callbackQueue
 		self.stopOnException = stopOnException
 		self.excInfo = None
 		self.abort = threading.Event()
+		self.lanes = {}
+		self.laneLock = threading.Lock()
 		"""@type: queue.Queue"""
 
 	def Start(self):
@@ -102,8 +229,27 @@ class ThreadPool(object):
 		"""
 		_ = [t.start() for t in self.threads]
 
-	@TypeChecked(task=(Callable, tuple, type(None)), callback=(Callable, tuple, type(None)))
-	def AddTask(self, task, callback):
+	@TypeChecked(lane=(type, String), limit=int)
+	def AddLane(self, lane, limit):
+		"""
+		Create a lane that limits how many of the tasks added to it can execute at once.
+		Lanes must be created before any tasks are added to them.
+
+		:param lane: Key identifying the lane, passed to AddTask() to add tasks to it, such as the tool whose tasks it limits
+		:type lane: type or str
+		:param limit: Maximum number of the lane's tasks that may execute at once - must be positive
+		:type limit: int
+		"""
+		assert limit > 0
+		self.lanes[lane] = _Lane(limit, self.prioritized)
+
+	@TypeChecked(
+		task=(Callable, tuple, type(None)),
+		callback=(Callable, tuple, type(None)),
+		priority=(numbers.Number, tuple),
+		lane=(type, String, type(None))
+	)
+	def AddTask(self, task, callback, priority=0, lane=None):
 		"""
 		Add a task into the queue to be executed on the first available thread.
 		This is safe to call from any thread, including threads currently executing tasks.
@@ -112,6 +258,11 @@ class ThreadPool(object):
 		:type task: (Callable, *args)
 		:param callback: Callback to be placed into the callback queue when this task is complete - either a callable or a tuple of callable + args
 		:type callback: (Callable, *args)
+		:param priority: Priority of the task. Only used if the pool was created with prioritized=True, in which case
+			tasks with a higher priority are started first. All tasks in a pool must use mutually comparable priorities.
+		:type priority: numbers.Number or tuple
+		:param lane: Key of a lane created with AddLane() to add the task to, or None to run it without any limit.
+		:type lane: type or str or None
 		"""
 
 		if isinstance(task, tuple):
@@ -120,15 +271,60 @@ class ThreadPool(object):
 		if isinstance(callback, tuple):
 			callback = functools.partial(callback[0], *(callback[1:]))
 
-		self.queue.Put((task, callback))
+		if callback is None:
+			convention = None
+		else:
+			convention = _getCallbackConvention(callback)
+
+		if lane is not None:
+			lane = self.lanes[lane]
+			entry = (task, callback, convention, lane)
+			#pylint: disable=not-context-manager
+			with self.laneLock:
+				if lane.running >= lane.limit:
+					if self.prioritized:
+						lane.waiting.Put((entry, priority), priority)
+					else:
+						lane.waiting.Put((entry, priority))
+					return
+				lane.running += 1
+		else:
+			entry = (task, callback, convention, None)
+
+		self._putTask(entry, priority)
+
+	def _putTask(self, entry, priority):
+		if self.prioritized:
+			self.queue.Put(entry, priority)
+		else:
+			self.queue.Put(entry)
+
+	def _releaseLane(self, lane):
+		# Hand the finished task's slot directly to the next task waiting on the lane, if there is one.
+		#pylint: disable=not-context-manager
+		with self.laneLock:
+			try:
+				entry, priority = lane.waiting.Get()
+			except IndexError:
+				lane.running -= 1
+				return
+		self._putTask(entry, priority)
+
+	def _putExitEvents(self):
+		for _ in range(len(self.threads)):
+			if self.prioritized:
+				# Exit events have to go behind everything else so that queued tasks still finish.
+				self.queue.PutLast(ThreadPool.exitEvent)
+			else:
+				self.queue.Put(ThreadPool.exitEvent)
 
 	def Stop(self):
 		"""
 		Stop and join all threads. All tasks currently in the queue will finish execution before it stops.
+		Tasks still waiting for a slot in a lane at that point will not be executed.
 		"""
 
-		for _ in range(len(self.threads)):
-			self.queue.Put(ThreadPool.exitEvent)
+		self._putExitEvents()
 		_ = [t.join() for t in self.threads]
 		self.callbackQueue.Put(ThreadPool.exitEvent)
 
@@ -139,8 +335,7 @@ class ThreadPool(object):
 		This function will join all threads and return once all in-progress tasks are finished and all threads have stopped.
 		"""
 		self.abort.set()
-		for _ in range(len(self.threads)):
-			self.queue.Put(ThreadPool.exitEvent)
+		self._putExitEvents()
 		_ = [t.join() for t in self.threads]
 		self.callbackQueue.Put(ThreadPool.exitEvent)
 
@@ -166,50 +361,20 @@ class ThreadPool(object):
 			except:
 				self.excInfo = sys.exc_info()
 
+				if task[3] is not None:
+					self._releaseLane(task[3])
+
 				self.callbackQueue.Put(functools.partial(self._rethrowException, sys.exc_info()))
 
 				if self.stopOnException:
 					self.callbackQueue.Put(self.Stop)
 					return
+			else:
+				if task[3] is not None:
+					self._releaseLane(task[3])
 
 			if task[1]:
-				# Has to be nested because we have to rebind task[1] to a name in a different scope
-				# Otherwise by the time this runs, task has probably changed to another value and we get invalid results
-				def _makeCallback(callback, ret):
-					def _callback():
-						if isinstance(callback, functools.partial):
-							try:
-								argspec = inspect.getfullargspec(callback)
-							except AttributeError:
-								argspec = inspect.getargspec(callback.func) # pylint: disable=deprecated-method
-							if argspec[1]:
-								nargs = -1
-							else:
-								nargs = len(argspec[0]) - len(callback.func.args)
-						else:
-							try:
-								argspec = inspect.getfullargspec(callback)
-							except AttributeError:
-								argspec = inspect.getargspec(callback) # pylint: disable=deprecated-method
-							if argspec[1]:
-								nargs = -1
-							else:
-								nargs = len(argspec[0])
-
-						if isinstance(ret, tuple):
-							if nargs == -1 or nargs == len(argspec[0]):
-								callback(*ret)
-								return
-						if nargs == 1:
-							callback(ret)
-							return
-						if nargs == 0:
-							callback()
-							return
-						raise TypeError("Could not find a way to call {} with parameters {}".format(callback, ret))
-					return _callback
-
-				self.callbackQueue.Put(_makeCallback(task[1], ret))
+				self.callbackQueue.Put(functools.partial(_invokeCallback, task[1], task[2], ret))
 
 ### Unit Tests ###
 
@@ -334,3 +499,211 @@ class TestThreadPool(testcase.TestCase):
 			if cb is ThreadPool.exitEvent:
 				break
 			cb()
+
+	def testPrioritizedTaskOrder(self):
+		"""Test that a prioritized pool starts higher-priority tasks first, breaking ties in insertion order"""
+		callbackQueue = queue.Queue()
+		log.SetCallbackQueue(callbackQueue)
+		pool = ThreadPool(1, callbackQueue, prioritized=True)
+
+		order = []
+
+		def _record(name):
+			order.append(name)
+
+		def _callback():
+			if len(order) == 6:
+				pool.Stop()
+
+		pool.AddTask((_record, "low"), _callback, priority=(1, 0))
+		pool.AddTask((_record, "high"), _callback, priority=(5, 0))
+		pool.AddTask((_record, "tiebreakSecond"), _callback, priority=(3, 0))
+		pool.AddTask((_record, "tiebreakFirst"), _callback, priority=(3, 1))
+		pool.AddTask((_record, "fifoFirst"), _callback, priority=(2, 0))
+		pool.AddTask((_record, "fifoSecond"), _callback, priority=(2, 0))
+		pool.Start()
+
+		while True:
+			cb = callbackQueue.GetBlocking()
+			if cb is ThreadPool.exitEvent:
+				break
+			cb()
+
+		self.assertEqual(["high", "tiebreakFirst", "tiebreakSecond", "fifoFirst", "fifoSecond", "low"], order)
+		log.SetCallbackQueue(None)
+
+	def testPriorityQueueExitEventsLast(self):
+		"""Test that items put with PutLast are only retrieved after all prioritized items"""
+		priorityQueue = queue.PriorityQueue()
+		priorityQueue.PutLast("exit")
+		priorityQueue.Put("task1", -100)
+		priorityQueue.Put("task2", 100)
+		self.assertEqual("task2", priorityQueue.Get())
+		self.assertEqual("task1", priorityQueue.GetBlocking())
+		self.assertEqual("exit", priorityQueue.Get())
+		self.assertRaises(IndexError, priorityQueue.Get)
+
+	def testCallbackConventions(self):
+		"""Test that cached calling conventions match what inspecting each callback finds"""
+		@TypeChecked(a=int, b=int, c=int)
+		def _checked(a, b, c):
+			return a + b + c
+
+		def _three(a, b, c):
+			return a + b + c
+
+		def _varargs(*args):
+			return args
+
+		class _Obj(object):
+			def Method(self, a):
+				"""Method taking one argument"""
+				return a
+
+		callbacks = [
+			functools.partial(_checked, 1),
+			functools.partial(_three, 1),
+			functools.partial(_three, 1, 2),
+			_three,
+			_varargs,
+			lambda: None,
+			lambda x: x,
+			_Obj().Method,
+		]
+		for callback in callbacks:
+			self.assertEqual(_resolveCallbackConvention(callback), _getCallbackConvention(callback))
+			# Second lookup comes from the cache
+			self.assertEqual(_resolveCallbackConvention(callback), _getCallbackConvention(callback))
+
+		self.assertEqual((2, 2), _getCallbackConvention(functools.partial(_three, 5)))
+		self.assertEqual((1, 1), _getCallbackConvention(functools.partial(_three, 5, 6)))
+
+		results = []
+		def _append(a, b, c):
+			results.append((a, b, c))
+		tupleCallback = functools.partial(_append, 1)
+		_invokeCallback(tupleCallback, _getCallbackConvention(tupleCallback), (2, 3))
+		def _appendOne(x):
+			results.append(x)
+		singleCallback = _appendOne
+		_invokeCallback(singleCallback, _getCallbackConvention(singleCallback), 4)
+		self.assertEqual([(1, 2, 3), 4], results)
+
+	def testCallbackDispatchOverhead(self):
+		"""Benchmark the per-task cost of working out how to call a callback, inspecting every time vs. caching"""
+		import time
+
+		@TypeChecked(a=int, b=int, ret=tuple)
+		def _finished(a, b, ret):
+			return a, b, ret
+
+		count = 20000
+		callbacks = [functools.partial(_finished, i, i) for i in range(count)]
+
+		start = time.time()
+		for callback in callbacks:
+			inspected = _resolveCallbackConvention(callback)
+		inspectEveryTime = time.time() - start
+
+		start = time.time()
+		for callback in callbacks:
+			cached = _getCallbackConvention(callback)
+		cachedTime = time.time() - start
+
+		# The times depend on the machine and what else it's doing, so they're only logged. What's checked is that
+		# every task's callback shares the one cached convention, so it's only inspected once.
+		log.Test(
+			"Callback dispatch overhead per task: {:.2f}us inspecting every time, {:.2f}us cached",
+			inspectEveryTime * 1000000 / count,
+			cachedTime * 1000000 / count
+		)
+		self.assertEqual(1, len({_getConventionKey(callback) for callback in callbacks}))
+		self.assertIs(cached, _callbackConventions[_getConventionKey(callbacks[0])])
+		self.assertEqual(inspected, cached)
+
+	def testLanes(self):
+		"""Test that a lane limits how many of its tasks run at once without holding up tasks outside of it"""
+		import time
+
+		callbackQueue = queue.Queue()
+		log.SetCallbackQueue(callbackQueue)
+		pool = ThreadPool(4, callbackQueue)
+		pool.AddLane("serial", 1)
+		pool.AddLane("pair", 2)
+
+		lock = threading.Lock()
+		running = {"serial": 0, "pair": 0, None: 0}
+		maxRunning = {"serial": 0, "pair": 0, None: 0}
+		order = []
+
+		def _run(lane, i):
+			#pylint: disable=not-context-manager
+			with lock:
+				running[lane] += 1
+				maxRunning[lane] = max(maxRunning[lane], running[lane])
+				order.append((lane, i))
+			time.sleep(0.01)
+			with lock:
+				running[lane] -= 1
+
+		class _sharedLocals(object):
+			callbackCount = 0
+
+		def _callback():
+			_sharedLocals.callbackCount += 1
+			if _sharedLocals.callbackCount == 30:
+				pool.Stop()
+
+		for i in range(10):
+			pool.AddTask((_run, "serial", i), _callback, lane="serial")
+			pool.AddTask((_run, "pair", i), _callback, lane="pair")
+			pool.AddTask((_run, None, i), _callback)
+		pool.Start()
+
+		while True:
+			cb = callbackQueue.GetBlocking()
+			if cb is ThreadPool.exitEvent:
+				break
+			cb()
+
+		self.assertEqual(1, maxRunning["serial"])
+		self.assertEqual(2, maxRunning["pair"])
+		# Held-back tasks are started in the order they were added
+		self.assertEqual(list(range(10)), [i for lane, i in order if lane == "serial"])
+		self.assertEqual(list(range(10)), [i for lane, i in order if lane == "pair"])
+		# The unrestricted tasks don't wait for the lanes to drain
+		lastUnrestricted = order.index((None, 9))
+		lastSerial = order.index(("serial", 9))
+		self.assertLess(lastUnrestricted, lastSerial)
+		log.SetCallbackQueue(None)
+
+	def testPrioritizedLanes(self):
+		"""Test that tasks held back by a lane in a prioritized pool are released highest-priority first"""
+		callbackQueue = queue.Queue()
+		log.SetCallbackQueue(callbackQueue)
+		pool = ThreadPool(2, callbackQueue, prioritized=True)
+		pool.AddLane("serial", 1)
+
+		order = []
+
+		def _record(name):
+			order.append(name)
+
+		def _callback():
+			if len(order) == 4:
+				pool.Stop()
+
+		pool.AddTask((_record, "first"), _callback, priority=0, lane="serial")
+		pool.AddTask((_record, "low"), _callback, priority=1, lane="serial")
+		pool.AddTask((_record, "high"), _callback, priority=3, lane="serial")
+		pool.AddTask((_record, "mid"), _callback, priority=2, lane="serial")
+		pool.Start()
+
+		while True:
+			cb = callbackQueue.GetBlocking()
+			if cb is ThreadPool.exitEvent:
+				break
+			cb()
+
+		self.assertEqual(["first", "high", "mid", "low"], order)
+		log.SetCallbackQueue(None)
@@ -0,0 +1,450 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: cache_server
+	:synopsis: HTTP server that shares artifact cache entries between machines, and the client builds use to talk to it.
+		Run run_cache_server.py to start a server.
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+
+from ._testing import testcase
+from ._utils import PlatformString
+from ._utils.artifact_cache import ParseSize, PackBlob, UnpackBlob, DEFAULT_MAX_SIZE
+
+if sys.version_info[0] >= 3:
+	import http.client as httplib
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+	from socketserver import ThreadingMixIn
+	from urllib.parse import urlsplit
+else:
+	# pylint: disable=import-error
+	import httplib
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+	from SocketServer import ThreadingMixIn
+	from urlparse import urlsplit
+
+_keyRegex = re.compile(R"^/blobs/([0-9a-f]{4,128})$")
+
+class BlobStore(object):
+	"""
+	Blobs stored on local disk by key, evicting the least recently used ones beyond a size limit, with counters
+	for the server's metrics
+
+	:param directory: Directory to store the blobs in
+	:type directory: str
+	:param maxSize: Maximum total size of the blobs in bytes, or 0 for no limit
+	:type maxSize: int
+	"""
+	def __init__(self, directory, maxSize=DEFAULT_MAX_SIZE):
+		self.directory = directory
+		self.maxSize = maxSize
+		self.lock = threading.Lock()
+		self.gets = 0
+		self.hits = 0
+		self.puts = 0
+		self.evictions = 0
+
+		# Maps each key to [size, sequence number of the last use]
+		self._entries = {}
+		self._totalSize = 0
+		self._sequence = 0
+
+		if not os.access(directory, os.F_OK):
+			os.makedirs(directory)
+		existing = []
+		for prefix in os.listdir(directory):
+			prefixDir = os.path.join(directory, prefix)
+			if len(prefix) != 2 or not os.path.isdir(prefixDir):
+				continue
+			for key in os.listdir(prefixDir):
+				path = os.path.join(prefixDir, key)
+				existing.append((os.path.getmtime(path), key, os.path.getsize(path)))
+		for _, key, size in sorted(existing):
+			self._sequence += 1
+			self._entries[key] = [size, self._sequence]
+			self._totalSize += size
+
+	def _path(self, key):
+		return os.path.join(self.directory, key[:2], key)
+
+	def Has(self, key):
+		"""
+		:param key: Key of the blob
+		:type key: str
+		:return: Whether the blob is in the store
+		:rtype: bool
+		"""
+		#pylint: disable=not-context-manager
+		with self.lock:
+			return key in self._entries
+
+	def Get(self, key):
+		"""
+		:param key: Key of the blob
+		:type key: str
+		:return: The blob, or None if it isn't in the store
+		:rtype: bytes or None
+		"""
+		#pylint: disable=not-context-manager
+		with self.lock:
+			self.gets += 1
+			entry = self._entries.get(key)
+			if entry is None:
+				return None
+			self._sequence += 1
+			entry[1] = self._sequence
+			self.hits += 1
+			# Read under the lock so the blob can't be evicted partway through
+			with open(self._path(key), "rb") as f:
+				return f.read()
+
+	def Put(self, key, blob):
+		"""
+		Add a blob to the store, replacing any existing blob with the same key
+
+		:param key: Key of the blob
+		:type key: str
+		:param blob: The blob
+		:type blob: bytes
+		"""
+		prefixDir = os.path.dirname(self._path(key))
+		#pylint: disable=not-context-manager
+		with self.lock:
+			if not os.access(prefixDir, os.F_OK):
+				os.makedirs(prefixDir)
+		handle, tempPath = tempfile.mkstemp(prefix=".tmp-", dir=prefixDir)
+		with os.fdopen(handle, "wb") as f:
+			f.write(blob)
+
+		#pylint: disable=not-context-manager
+		with self.lock:
+			self.puts += 1
+			if os.access(self._path(key), os.F_OK):
+				os.remove(self._path(key))
+			os.rename(tempPath, self._path(key))
+			old = self._entries.get(key)
+			if old is not None:
+				self._totalSize -= old[0]
+			self._sequence += 1
+			self._entries[key] = [len(blob), self._sequence]
+			self._totalSize += len(blob)
+
+			if self.maxSize > 0 and self._totalSize > self.maxSize:
+				target = self.maxSize * 0.9
+				for evictKey, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+					if self._totalSize <= target:
+						break
+					os.remove(self._path(evictKey))
+					del self._entries[evictKey]
+					self._totalSize -= size
+					self.evictions += 1
+
+	def GetMetrics(self):
+		"""
+		:return: The store's size and how it's been used since it was created
+		:rtype: dict
+		"""
+		#pylint: disable=not-context-manager
+		with self.lock:
+			return {
+				"gets": self.gets,
+				"hits": self.hits,
+				"misses": self.gets - self.hits,
+				"hitRate": self.hits / self.gets if self.gets else 0.0,
+				"puts": self.puts,
+				"evictions": self.evictions,
+				"entries": len(self._entries),
+				"size": self._totalSize,
+				"maxSize": self.maxSize,
+			}
+
+class _RequestHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+
+	def _getKey(self):
+		match = _keyRegex.match(self.path)
+		if match is None:
+			self._sendEmpty(404)
+			return None
+		return match.group(1)
+
+	def _sendEmpty(self, code):
+		self.send_response(code)
+		self.send_header("Content-Length", "0")
+		self.end_headers()
+
+	def _sendBody(self, body, contentType):
+		self.send_response(200)
+		self.send_header("Content-Type", contentType)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_HEAD(self): # pylint: disable=invalid-name
+		"""Check whether a blob exists"""
+		key = self._getKey()
+		if key is not None:
+			self._sendEmpty(200 if self.server.store.Has(key) else 404)
+
+	def do_GET(self): # pylint: disable=invalid-name
+		"""Get a blob, or the server's metrics"""
+		if self.path == "/metrics":
+			self._sendBody(json.dumps(self.server.store.GetMetrics()).encode("UTF-8"), "application/json")
+			return
+		key = self._getKey()
+		if key is None:
+			return
+		blob = self.server.store.Get(key)
+		if blob is None:
+			self._sendEmpty(404)
+		else:
+			self._sendBody(blob, "application/octet-stream")
+
+	def do_PUT(self): # pylint: disable=invalid-name
+		"""Store a blob"""
+		key = self._getKey()
+		if key is None:
+			return
+		length = int(self.headers.get("Content-Length", 0))
+		blob = self.rfile.read(length)
+		if len(blob) != length:
+			self._sendEmpty(400)
+			return
+		self.server.store.Put(key, blob)
+		self._sendEmpty(201)
+
+	def log_message(self, format, *args): # pylint: disable=redefined-builtin
+		if self.server.verbose:
+			BaseHTTPRequestHandler.log_message(self, format, *args)
+
+class CacheServer(ThreadingMixIn, HTTPServer):
+	"""
+	HTTP server for a BlobStore. Blobs are read with GET /blobs/<key>, checked for with HEAD, and added with PUT;
+	GET /metrics returns the store's metrics as JSON.
+
+	:param address: (host, port) to listen on. Port 0 picks a free port; see the port property.
+	:type address: tuple[str, int]
+	:param store: The blob store to serve
+	:type store: BlobStore
+	:param verbose: Whether to log each request to stderr
+	:type verbose: bool
+	"""
+	daemon_threads = True
+
+	def __init__(self, address, store, verbose=False):
+		HTTPServer.__init__(self, address, _RequestHandler)
+		self.store = store
+		self.verbose = verbose
+
+	@property
+	def port(self):
+		"""
+		:return: The port the server is listening on
+		:rtype: int
+		"""
+		return self.server_address[1]
+
+class CacheServerClient(object):
+	"""
+	Client for a CacheServer, used by the artifact cache as its remote backend
+
+	:param url: Base URL of the server, i.e., http://buildcache:8080
+	:type url: str
+	:param timeout: Seconds to wait for the server before giving up on a request
+	:type timeout: float
+	"""
+	def __init__(self, url, timeout=10):
+		split = urlsplit(url)
+		if split.scheme != "http" or not split.hostname:
+			raise ValueError("Cache server URL must be of the form http://host[:port]: {}".format(url))
+		self.url = url
+		self._host = split.hostname
+		self._port = split.port or 80
+		self._prefix = split.path.rstrip("/")
+		self._timeout = timeout
+		self._local = threading.local()
+
+	def _request(self, method, key, body=None):
+		# One persistent connection per thread, since builds hit the server from every build thread at once
+		connection = getattr(self._local, "connection", None)
+		if connection is None:
+			connection = httplib.HTTPConnection(self._host, self._port, timeout=self._timeout)
+			self._local.connection = connection
+		try:
+			connection.request(method, "{}/blobs/{}".format(self._prefix, key), body)
+			response = connection.getresponse()
+			return response.status, response.read()
+		except httplib.HTTPException as e:
+			connection.close()
+			self._local.connection = None
+			raise IOError("Bad response from cache server: {!r}".format(e))
+		except:
+			connection.close()
+			self._local.connection = None
+			raise
+
+	def Has(self, key):
+		"""
+		:param key: Key of the blob
+		:type key: str
+		:return: Whether the server has the blob
+		:rtype: bool
+		:raises IOError: If the server can't be reached
+		"""
+		status, _ = self._request("HEAD", key)
+		return status == 200
+
+	def Get(self, key):
+		"""
+		:param key: Key of the blob
+		:type key: str
+		:return: The blob, or None if the server doesn't have it
+		:rtype: bytes or None
+		:raises IOError: If the server can't be reached
+		"""
+		status, body = self._request("GET", key)
+		if status != 200:
+			return None
+		return body
+
+	def Put(self, key, blob):
+		"""
+		:param key: Key of the blob
+		:type key: str
+		:param blob: The blob
+		:type blob: bytes
+		:raises IOError: If the server can't be reached or refuses the blob
+		"""
+		status, _ = self._request("PUT", key, blob)
+		if status not in (200, 201):
+			raise IOError("Cache server refused blob {} with status {}".format(key, status))
+
+def Main(argv=None):
+	"""
+	Run a cache server until interrupted
+
+	:param argv: Command line arguments, or None to use sys.argv
+	:type argv: list[str] or None
+	"""
+	parser = argparse.ArgumentParser(description="Serve csbuild artifact cache entries over HTTP")
+	parser.add_argument("--host", help="Address to listen on (default localhost)", default="localhost")
+	parser.add_argument("--port", help="Port to listen on (default 8080)", type=int, default=8080)
+	parser.add_argument("--dir", help="Directory to store blobs in", required=True)
+	parser.add_argument("--size", help="Maximum size of the stored blobs, in bytes or with a K, M, G or T suffix "
+		"(default 5G, 0 for no limit)", default="5G")
+	parser.add_argument("-v", "--verbose", help="Log every request", action="store_true")
+	args = parser.parse_args(argv)
+
+	server = CacheServer((args.host, args.port), BlobStore(os.path.abspath(args.dir), ParseSize(args.size)), args.verbose)
+	print(PlatformString("Serving {} on http://{}:{}".format(args.dir, args.host, server.port)))
+	sys.stdout.flush()
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+### Unit Tests ###
+
+class TestCacheServer(testcase.TestCase):
+	"""Test the cache server and its client"""
+	def setUp(self):
+		self.tempDir = tempfile.mkdtemp()
+		self.server = None
+		self.thread = None
+
+	def tearDown(self):
+		self._stopServer()
+		shutil.rmtree(self.tempDir, ignore_errors=True)
+
+	def _startServer(self, maxSize=0):
+		self.server = CacheServer(("localhost", 0), BlobStore(os.path.join(self.tempDir, "blobs"), maxSize))
+		self.thread = threading.Thread(target=self.server.serve_forever)
+		self.thread.start()
+		return CacheServerClient("http://localhost:{}".format(self.server.port))
+
+	def _stopServer(self):
+		if self.server is not None:
+			self.server.shutdown()
+			self.thread.join()
+			self.server.server_close()
+			self.server = None
+
+	# pylint: disable=invalid-name
+	def testRoundTrip(self):
+		"""Test that blobs can be stored and retrieved, and that the metrics count them"""
+		client = self._startServer()
+		self.assertFalse(client.Has("abcd"))
+		self.assertIsNone(client.Get("abcd"))
+
+		blob = PackBlob([b"object", b"", b"symbols" * 1000])
+		client.Put("abcd", blob)
+		self.assertTrue(client.Has("abcd"))
+		self.assertEqual([b"object", b"", b"symbols" * 1000], UnpackBlob(client.Get("abcd")))
+
+		metrics = self.server.store.GetMetrics()
+		self.assertEqual((2, 1, 1, 0.5, 1), (metrics["gets"], metrics["hits"], metrics["misses"], metrics["hitRate"], metrics["puts"]))
+
+		# Blobs are still there after a restart
+		self._stopServer()
+		client = self._startServer()
+		self.assertEqual(blob, client.Get("abcd"))
+
+	def testInvalidKeys(self):
+		"""Test that paths that aren't blob keys are rejected"""
+		client = self._startServer()
+		self.assertFalse(client.Has("../../etc"))
+		with self.assertRaises(IOError):
+			client.Put("NOT-HEX", b"data")
+
+	def testEviction(self):
+		"""Test that the least recently used blobs are evicted once the store is over its size limit"""
+		client = self._startServer(maxSize=2500)
+		client.Put("aa01", b"x" * 1000)
+		client.Put("aa02", b"x" * 1000)
+		client.Get("aa01")
+		client.Put("aa03", b"x" * 1000)
+
+		self.assertTrue(client.Has("aa01"))
+		self.assertFalse(client.Has("aa02"))
+		self.assertTrue(client.Has("aa03"))
+		self.assertEqual(1, self.server.store.GetMetrics()["evictions"])
+
+	def testMalformedBlob(self):
+		"""Test that truncated blobs are detected"""
+		blob = PackBlob([b"object"])
+		with self.assertRaises(ValueError):
+			UnpackBlob(blob[:-1])
+		with self.assertRaises(ValueError):
+			UnpackBlob(blob + b"x")
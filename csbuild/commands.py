@@ -28,6 +28,9 @@
 
 from __future__ import unicode_literals, division, print_function
 
+import collections
+import os
+import platform
 import sys
 import subprocess
 import threading
@@ -35,6 +38,12 @@ import threading
 from . import shared_globals, log, perf_timer
 from ._utils import PlatformUnicode, queue
 from ._utils.decorators import TypeChecked
+from ._utils.reraise import Reraise
+
+try:
+	import selectors
+except ImportError:
+	selectors = None
 
 if sys.version_info[0] >= 3:
 	from collections.abc import Callable
@@ -92,6 +101,181 @@ def LogNonInterleavedOutput(logFunction, shared, msg):
 				queueOfLogQueues.Put(shared.queue)
 	shared.queue.Put((logFunction, msg))
 
+class _StreamWatch(object):
+	"""
+	State for one output pipe of a process being read by the output reactor
+
+	:param pipe: The pipe to read from
+	:type pipe: file
+	:param outlist: List to append each line of output to
+	:type outlist: list[str]
+	:param callback: Callback to pass each line to, or None
+	:type callback: Callable or None
+	:param shared: Shared data for the process, passed to the callback
+	:type shared: _sharedStreamProcessingData
+	:param process: Process-level state shared by all of the process's pipes
+	:type process: _ProcessWatch
+	"""
+	__slots__ = ("pipe", "outlist", "callback", "shared", "process", "partial")
+
+	def __init__(self, pipe, outlist, callback, shared, process):
+		self.pipe = pipe
+		self.outlist = outlist
+		self.callback = callback
+		self.shared = shared
+		self.process = process
+		self.partial = b""
+
+	def HandleLine(self, line):
+		"""
+		Pass a complete line of output to the callback and the output list
+
+		:param line: The line, including its newline if it had one
+		:type line: bytes
+		"""
+		line = PlatformUnicode(line)
+		if self.callback is not None and self.process.excInfo is None:
+			try:
+				#Callback excludes newline
+				self.callback(self.shared, line.rstrip("\n\r"))
+			except:
+				# Hold onto the exception to raise it from Run() instead of taking down the reactor.
+				self.process.excInfo = sys.exc_info()
+		self.outlist.append(line)
+
+class _ProcessWatch(object):
+	"""
+	Tracks when the output reactor has finished reading all the pipes of a process
+	"""
+	def __init__(self, numPipes):
+		self.remaining = numPipes
+		self.done = threading.Event()
+		self.excInfo = None
+
+class _OutputReactor(object):
+	"""
+	Reads the output of every running process on a single thread, multiplexing all of their pipes with a selector
+	instead of spending two threads blocked on readline() per process.
+	Pipes are handed off from other threads with Watch(); all other state is only touched by the reactor thread.
+	"""
+	def __init__(self):
+		self._selector = selectors.DefaultSelector()
+		self._newWatches = collections.deque()
+		self._wakeRead, self._wakeWrite = os.pipe()
+		self._selector.register(self._wakeRead, selectors.EVENT_READ, None)
+		self._thread = threading.Thread(target=self._run, name="OutputReactor")
+		self._thread.daemon = True
+		self._thread.start()
+
+	def Watch(self, pipes):
+		"""
+		Start reading a process's pipes
+
+		:param pipes: List of (pipe, outlist, callback, shared) tuples, one per pipe, as described by _StreamWatch
+		:type pipes: list[tuple]
+		:return: Watch that's signaled once every pipe has been closed
+		:rtype: _ProcessWatch
+		"""
+		process = _ProcessWatch(len(pipes))
+		for pipe, outlist, callback, shared in pipes:
+			self._newWatches.append(_StreamWatch(pipe, outlist, callback, shared, process))
+		os.write(self._wakeWrite, b"\0")
+		return process
+
+	def _finish(self, watch):
+		self._selector.unregister(watch.pipe)
+		if watch.partial:
+			watch.HandleLine(watch.partial)
+			watch.partial = b""
+		watch.process.remaining -= 1
+		if watch.process.remaining == 0:
+			watch.process.done.set()
+
+	def _read(self, watch):
+		try:
+			data = os.read(watch.pipe.fileno(), 65536)
+		except (IOError, OSError):
+			data = b""
+		# Empty string means pipe was closed, possibly due to process exit
+		if not data:
+			self._finish(watch)
+			return
+		lines = data.split(b"\n")
+		lines[0] = watch.partial + lines[0]
+		watch.partial = lines.pop()
+		for line in lines:
+			watch.HandleLine(line + b"\n")
+
+	def _run(self):
+		while True:
+			for key, _ in self._selector.select():
+				watch = key.data
+				if watch is None:
+					os.read(self._wakeRead, 4096)
+					while self._newWatches:
+						newWatch = self._newWatches.popleft()
+						self._selector.register(newWatch.pipe, selectors.EVENT_READ, newWatch)
+				else:
+					self._read(watch)
+
+_reactor = None
+_reactorLock = threading.Lock()
+# Selectors can't wait on pipes on Windows, so it uses a pair of threads per process instead
+_reactorSupported = selectors is not None and platform.system() != "Windows"
+
+def _getReactor():
+	global _reactor
+	#Double-check lock pattern
+	if _reactor is None:
+		#pylint: disable=not-context-manager
+		with _reactorLock:
+			if _reactor is None:
+				_reactor = _OutputReactor()
+	return _reactor
+
+def _resetReactorAfterFork():
+	# The reactor thread isn't copied into a forked process, so the child has to start its own if it runs commands
+	global _reactor
+	global _reactorLock
+	_reactor = None
+	_reactorLock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=_resetReactorAfterFork)
+
+def _streamOutputWithThreads(proc, pipes):
+	def _streamOutput(pipe, outlist, callback, shared):
+		while True:
+			try:
+				line = PlatformUnicode(pipe.readline())
+			except IOError:
+				continue
+			# Empty string means pipe was closed, possibly due to process exit, and we can leave the loop.
+			# A blank line output by the pipe would be returned as "\n"
+			if not line:
+				break
+			#Callback excludes newline
+			if callback is not None:
+				callback(shared, line.rstrip("\n\r"))
+			outlist.append(line)
+
+	threads = [threading.Thread(target=_streamOutput, args=pipeArgs) for pipeArgs in pipes]
+
+	for thread in threads:
+		thread.start()
+
+	for thread in threads:
+		thread.join()
+
+	proc.wait()
+
+def _streamOutputWithReactor(proc, pipes):
+	process = _getReactor().Watch(pipes)
+	process.done.wait()
+	proc.wait()
+	if process.excInfo is not None:
+		Reraise(process.excInfo[1], process.excInfo[2])
+
 def DefaultStdoutHandler(shared, msg):
 	"""
 	Default handler for process stdout, logs with log.Stdout
@@ -119,6 +303,9 @@ def Run(cmd, stdout=DefaultStdoutHandler, stderr=DefaultStderrHandler, **kwargs)
 	to the appropriate callback (stdout or stderr) one line at a time - the callback will be
 	called once for each line. This function will block until the command exits.
 
+	Where supported, output from all running processes is read on a single shared thread, so the callbacks
+	should return quickly; a slow callback holds up output from every other process.
+
 	:param cmd: The command to run as a list of arguments, with the first parameter being the executable
 	:type cmd: list
 	:param stdout: Callback that will be called for each line of stdout at the moment it's emitted.
@@ -138,38 +325,19 @@ def Run(cmd, stdout=DefaultStdoutHandler, stderr=DefaultStderrHandler, **kwargs)
 		errors = []
 		shared = _sharedStreamProcessingData()
 
-		def _streamOutput(pipe, outlist, callback):
-			while True:
-				try:
-					line = PlatformUnicode(pipe.readline())
-				except IOError:
-					continue
-				# Empty string means pipe was closed, possibly due to process exit, and we can leave the loop.
-				# A blank line output by the pipe would be returned as "\n"
-				if not line:
-					break
-				#Callback excludes newline
-				if callback is not None:
-					callback(shared, line.rstrip("\n\r"))
-				outlist.append(line)
-
 		proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
 
-		outputThread = threading.Thread(target=_streamOutput, args=(proc.stdout, output, stdout))
-		errorThread = threading.Thread(target=_streamOutput, args=(proc.stderr, errors, stderr))
-
-		outputThread.start()
-		errorThread.start()
-
-		outputThread.join()
-		errorThread.join()
-
-		proc.wait()
-
-		proc.stdout.close()
-		proc.stderr.close()
+		pipes = [(proc.stdout, output, stdout, shared), (proc.stderr, errors, stderr, shared)]
+		try:
+			if _reactorSupported:
+				_streamOutputWithReactor(proc, pipes)
+			else:
+				_streamOutputWithThreads(proc, pipes)
+		finally:
+			proc.stdout.close()
+			proc.stderr.close()
 
-		if shared.queue is not None:
-			shared.queue.Put(stopEvent)
+			if shared.queue is not None:
+				shared.queue.Put(stopEvent)
 
 		return proc.returncode, "".join(output), "".join(errors)
@@ -60,6 +60,13 @@ def _printProgressBar():
 			_barPresent = True
 			textSize = 42
 
+			timeRemaining = shared_globals.estimatedTimeRemaining
+			if timeRemaining is None:
+				etaText = ""
+			else:
+				etaText = "| ETA {} ".format(FormatTime(timeRemaining, False))
+			textSize += len(etaText)
+
 			perc = 1 if totalBuilds == 0 else float(completeBuilds)/float(totalBuilds)
 			if perc == 0:
 				_sep = "-"
@@ -194,6 +201,8 @@ def _printProgressBar():
 			if shared_globals.colorSupported:
 				sys.stdout.flush()
 				terminfo.TermInfo.SetColor(Color.WHITE)
+			if etaText:
+				sys.stdout.write(etaText)
 			sys.stdout.write("]")
 			sys.stdout.flush()
 
@@ -310,6 +319,72 @@ def SetCallbackQueue(callbackQueue):
 	global _callbackQueue
 	_callbackQueue = callbackQueue
 
+def CaptureLogs():
+	"""
+	Collect logs in memory instead of printing them. This is for worker processes, which have no log thread of their
+	own; the parent process retrieves the collected logs with TakeCapturedLogs() and prints them with ReplayLogs().
+	Anything that was waiting to be printed when this is called is discarded.
+	"""
+	global _logQueue
+	global _callbackQueue
+	global _logThread
+	_logQueue = queue.Queue()
+	_callbackQueue = queue.Queue()
+	# No thread is the log thread, so every log goes into the queue
+	_logThread = None
+	shared_globals.errors = []
+	shared_globals.warnings = []
+
+def TakeCapturedLogs():
+	"""
+	Take everything that's been logged since the last call, after CaptureLogs() has been called
+
+	:return: The logs, and the errors and warnings that were logged
+	:rtype: tuple[list[tuple], list[str], list[str]]
+	"""
+	try:
+		while True:
+			_callbackQueue.Get()
+	except IndexError:
+		pass
+
+	events = []
+	try:
+		while True:
+			event = _logQueue.Get()
+			# Streams can't be sent between processes, so messages meant for stderr are flagged instead
+			events.append((event[0], event[1], event[2], len(event) > 3))
+	except IndexError:
+		pass
+
+	errors = shared_globals.errors
+	warnings = shared_globals.warnings
+	shared_globals.errors = []
+	shared_globals.warnings = []
+	return events, errors, warnings
+
+def ReplayLogs(captured):
+	"""
+	Print logs collected by TakeCapturedLogs() in another process
+
+	:param captured: The return value of TakeCapturedLogs()
+	:type captured: tuple[list[tuple], list[str], list[str]]
+	"""
+	events, errors, warnings = captured
+	for color, level, msg, toStderr in events:
+		if toStderr:
+			_logQueue.Put((color, level, msg, sys.stderr))
+		else:
+			_logQueue.Put((color, level, msg))
+	shared_globals.errors.extend(errors)
+	shared_globals.warnings.extend(warnings)
+	if events:
+		if threading.currentThread() == _logThread:
+			Pump()
+		else:
+			assert _callbackQueue is not None, "Threaded logging requires a callback queue (shared with ThreadPool)"
+			_callbackQueue.Put(Pump)
+
 def StartLogThread():
 	"""Start the log thread"""
 	global _callbackQueue
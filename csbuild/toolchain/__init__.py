@@ -27,8 +27,14 @@
 
 from __future__ import unicode_literals, division, print_function
 
+import hashlib
+import multiprocessing
 import os
+import threading
+from multiprocessing.pool import ThreadPool
+
 from .._build import input_file
+from .._utils import shared_globals, PlatformString, memo
 
 _eliminatePylintAbstractMethodCheck = True
 
@@ -102,6 +108,7 @@ class Tool(object):
 
 	#: Set this to a positive non-zero value to prevent this tool from being run in parallel.
 	#  This is a global setting; multiple instances of this tool will not run concurrently, even for different projects
+	#  Tasks for this tool beyond the limit stay queued and are started as soon as one of its running tasks finishes.
 	maxParallel = 0
 
 	#: If this is True, this tool will be the only one to act on the input files passed to it, and they will not
@@ -114,6 +121,55 @@ class Tool(object):
 	#  tools accepting that file type.
 	exclusive = False
 
+	#: If this is True, Run() and RunGroup() are called in a pool of worker processes instead of on a build thread,
+	#  so CPU-bound tools written in python can run in parallel without contending for the GIL. Each worker gets a
+	#  copy of the projects and their tools' settings as they were when the build started; changes made to them in
+	#  Run() are not seen by the build or by other tasks. Inputs are passed with only their filenames and whether
+	#  they were up to date, and return values must be picklable. Requires a platform that can fork; elsewhere,
+	#  the tool runs on a build thread as usual.
+	runInProcess = False
+
+	#: Optional method to use instead of Run() that builds several inputs in one call
+	#  (i.e., ``def RunBatch(self, inputProject, inputFiles)``), for tools that pay a large startup cost per
+	#  invocation. Inputs that become ready for the tool in the same project are collected into a batch, subject
+	#  to maxBatchSize and batchWindow. It must return a list with one result per input, in the same order as the
+	#  inputs, where each result is what Run() would have returned for that input.
+	RunBatch = None
+
+	#: Maximum number of inputs passed to a single RunBatch() call. 0 means there is no limit.
+	maxBatchSize = 0
+
+	#: Number of seconds to wait for more inputs to become ready before running a batch that isn't full.
+	#  With 0, a batch contains only the inputs that became ready at the same time.
+	batchWindow = 0
+
+	#: Optional coroutine function to use instead of Run(), with the same signature and return value
+	#  (i.e., ``async def RunAsync(self, inputProject, inputFile)``). Coroutines from all tools share a single
+	#  asyncio event loop, so tools that spend most of their time waiting on processes or remote services can
+	#  have any number of tasks in flight without tying up a build thread for each one. Anything that blocks should
+	#  be awaited rather than called directly, or it will hold up every other coroutine. Requires python 3.5+.
+	RunAsync = None
+
+	#: Optional coroutine function to use instead of RunGroup(), with the same signature and return value
+	#  (i.e., ``async def RunGroupAsync(self, inputProject, inputFiles)``). See RunAsync.
+	RunGroupAsync = None
+
+	#: Optional method that returns what the tool would run to build an input or group of inputs
+	#  (i.e., ``def GetCommandSignature(self, inputProject, inputFiles)``), typically its command line and environment.
+	#  It's passed the same inputs as Run() or RunGroup(), and may return any combination of strings, lists, tuples,
+	#  and dicts; the contents of any response files named in it with @file are included as well. A digest of it is
+	#  recorded each time the inputs are built, and if it's different the next time, they're built again even if
+	#  nothing they depend on has changed.
+	GetCommandSignature = None
+
+	#: Optional method that returns the parts of an output that tools in other projects depend on
+	#  (i.e., ``def GetOutputInterface(self, inputProject, outputFile)``), such as the symbols a shared library exports.
+	#  It's called with each output after the tool builds it, and may return the same kinds of values as
+	#  GetCommandSignature(), or None if the output has no interface to speak of. If an output's contents change but a
+	#  digest of its interface is the same as the last time it was built, other projects treat it as unchanged and
+	#  don't build anything again because of it.
+	GetOutputInterface = None
+
 	_initialized = False
 
 	def __init__(self, projectSettings):
@@ -207,7 +263,7 @@ class CompileChecker(object):
 	Class to implement various components of checking whether a file should be recompiled.
 	"""
 	def __init__(self):
-		self.memo = {} # memo.Memo()
+		self.memo = memo.Memo()
 
 	def ShouldRecompile(self, fileValue, baselineValue):
 		"""
@@ -247,7 +303,7 @@ class CompileChecker(object):
 		:rtype: any
 		"""
 		_ignore(buildProject)
-		return os.path.getmtime(inputFile)
+		return shared_globals.statCache.GetMtime(inputFile)
 
 	def GetDependencies(self, buildProject, inputFile):
 		"""
@@ -283,12 +339,199 @@ class CompileChecker(object):
 		if lastFiles is not None:
 			return min(
 				[
-					self.GetRecompileValue(buildProject, outputFile) if os.access(outputFile, os.F_OK) else 0
+					self.GetRecompileValue(buildProject, outputFile) if shared_globals.statCache.Exists(outputFile) else 0
 					for outputFile in lastFiles
 				]
 			)
 		return None
 
+	def UpdateBaseline(self, buildProject, inputFiles):
+		"""
+		Called after a list of inputs has been built successfully, to record anything GetRecompileBaseline() will need
+		to compare against in later builds. The default implementation compares against the outputs' modification
+		dates, so it has nothing to record.
+
+		:param buildProject: Project encapsulating the files being built
+		:type buildProject: csbuild._build.project.Project
+		:param inputFiles: List of input files
+		:type inputFiles: ordered_set.OrderedSet[input_file.InputFile]
+		"""
+		_ignore(buildProject)
+		_ignore(inputFiles)
+
 	def __deepcopy__(self, copyMemo):
 		copyMemo[id(self)] = self
 		return self
+
+_hashPool = None
+_hashPoolLock = threading.Lock()
+
+def _getHashPool():
+	global _hashPool
+	#Double-check lock pattern
+	if _hashPool is None:
+		#pylint: disable=not-context-manager
+		with _hashPoolLock:
+			if _hashPool is None:
+				_hashPool = ThreadPool(multiprocessing.cpu_count())
+	return _hashPool
+
+class HashCompileChecker(CompileChecker):
+	"""
+	CompileChecker that recompiles files when the contents of the files or their dependencies change, rather than
+	their modification dates, so touching files without changing them (i.e., by switching branches and back) doesn't
+	cause a rebuild. The contents each output was built from are recorded when it's built, in the project's artifact
+	index along with the output itself.
+
+	The hash of each file is stored along with its modification date and size, and the file is only hashed again when
+	either of those changes. Hashes are computed once per build, and when a file has to be checked, everything it
+	depended on the last time it was built is hashed at once on a pool of threads.
+
+	:param checker: Checker to get the dependency lists from, i.e., a CppCompileChecker, or None if the files
+		have no dependencies
+	:type checker: CompileChecker or None
+	"""
+	def __init__(self, checker=None):
+		CompileChecker.__init__(self)
+		self._checker = checker
+		self._hashes = {}
+
+	def ShouldRecompile(self, fileValue, baselineValue):
+		"""
+		Given a condensed value from all the input files and their dependencies,
+		check against the baseline to determine if a recompile should be performed.
+
+		:param fileValue: Hash of each file
+		:type fileValue: dict[str, str]
+		:param baselineValue: Hash of each file the last time the inputs were built
+		:type baselineValue: dict[str, str]
+		:return: whether or not to recompile the file
+		:rtype: bool
+		"""
+		for filename, digest in fileValue.items():
+			if baselineValue.get(filename) != digest:
+				return True
+		return False
+
+	def CondenseRecompileChecks(self, values):
+		"""
+		Condense a list of values into a single value. The values are combined into a single map of file to hash.
+
+		:param values: The values collected from GetRecompileValue() for a list of dependencies
+		:type values: list[dict[str, str]]
+		:return: The condensed value
+		:rtype: dict[str, str]
+		"""
+		ret = {}
+		for value in values:
+			ret.update(value)
+		return ret
+
+	def GetRecompileValue(self, buildProject, inputFile):
+		"""
+		Get a value to be used to compute recompilability. For this checker, that's a map of the file to its hash.
+
+		:param buildProject: Project encapsulating the files being built
+		:type buildProject: csbuild._build.project.Project
+		:param inputFile: The file to compute the value for
+		:type inputFile: str
+		:return: The value to be used to compute recompilability
+		:rtype: dict[str, str]
+		"""
+		_ignore(buildProject)
+		return {inputFile: self._getHash(inputFile)}
+
+	def GetDependencies(self, buildProject, inputFile):
+		"""
+		Get a list of dependencies for a file.
+
+		:param buildProject: Project encapsulating the files being built
+		:type buildProject: csbuild._build.project.Project
+		:param inputFile: The file to check
+		:type inputFile: str
+		:return: List of files to depend on
+		:rtype: list[str]
+		"""
+		if self._checker is None:
+			return []
+		return self._checker.GetDependencies(buildProject, inputFile)
+
+	def GetRecompileBaseline(self, buildProject, inputFiles):
+		"""
+		Get the baseline recompile value: the hash of every file the inputs depended on the last time they were built.
+
+		A return value of None forces a recompile.
+
+		:param buildProject: Project encapsulating the files being built
+		:type buildProject: csbuild._build.project.Project
+		:param inputFiles: List of input files
+		:type inputFiles: ordered_set.OrderedSet[input_file.InputFile]
+		:return: A baseline recompile value, or None to force recompile
+		:rtype: dict[str, str] or None
+		"""
+		lastFiles = buildProject.GetLastResult(inputFiles)
+		if lastFiles is None or not all(shared_globals.statCache.Exists(outputFile) for outputFile in lastFiles):
+			return None
+		baseline = buildProject.GetLastHashBaseline(inputFiles)
+		if baseline is not None:
+			# These are (most likely) the files that are about to be checked, so get them all hashed up front
+			self._hashFiles(list(baseline))
+		return baseline
+
+	def UpdateBaseline(self, buildProject, inputFiles):
+		"""
+		Record the hash of every file the inputs depend on, to compare against in later builds.
+
+		:param buildProject: Project encapsulating the files being built
+		:type buildProject: csbuild._build.project.Project
+		:param inputFiles: List of input files
+		:type inputFiles: ordered_set.OrderedSet[input_file.InputFile]
+		"""
+		filenames = set()
+		toCheck = [os.path.abspath(PlatformString(inputFile.filename)) for inputFile in inputFiles]
+		while toCheck:
+			filename = toCheck.pop()
+			if filename in filenames:
+				continue
+			filenames.add(filename)
+			if not shared_globals.statCache.Exists(filename):
+				continue
+			toCheck.extend(os.path.abspath(PlatformString(dep)) for dep in self.GetDependencies(buildProject, filename))
+
+		self._hashFiles(list(filenames))
+		buildProject.SetHashBaseline(inputFiles, {filename: self._hashes[filename] for filename in filenames})
+
+	def _hashFiles(self, filenames):
+		filenames = [filename for filename in filenames if filename not in self._hashes]
+		if len(filenames) > 1:
+			_getHashPool().map(self._getHash, filenames)
+		elif filenames:
+			self._getHash(filenames[0])
+
+	def _getHash(self, filename):
+		digest = self._hashes.get(filename)
+		if digest is not None:
+			return digest
+
+		stat = shared_globals.statCache.Stat(filename)
+		if stat is None:
+			# Deleted files all hash the same, and that's different from the hash of any file that exists
+			self._hashes[filename] = ""
+			return ""
+
+		record = shared_globals.settings.GetRecords("fileHashes").get(filename)
+		if record is not None and record[0] == stat.st_mtime and record[1] == stat.st_size:
+			digest = record[2]
+		else:
+			hasher = hashlib.sha1()
+			with open(filename, "rb") as f:
+				while True:
+					chunk = f.read(1024 * 1024)
+					if not chunk:
+						break
+					hasher.update(chunk)
+			digest = hasher.hexdigest()
+			shared_globals.settings.SaveRecord("fileHashes", filename, (stat.st_mtime, stat.st_size, digest))
+
+		self._hashes[filename] = digest
+		return digest
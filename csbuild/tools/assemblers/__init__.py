@@ -27,14 +27,13 @@
 
 from __future__ import unicode_literals, division, print_function
 
-import os
 import re
 
 from ... import log, perf_timer
-from ..._utils import shared_globals
+from ..._utils import dependency_records, include_graph
 from ...toolchain import CompileChecker
 
-_includeRegex = re.compile(R'^\s*#\s*include\s+"(\S+)"', re.M)
+_includeGraph = include_graph.IncludeGraph(re.compile(br'^\s*#\s*include\s+(")(\S+)"', re.M), "asmIncludeGraph")
 
 class AsmCompileChecker(CompileChecker):
 	"""
@@ -58,23 +57,17 @@ class AsmCompileChecker(CompileChecker):
 		with perf_timer.PerfTimer("Assembly header dependency resolution"):
 			log.Info("Checking header dependencies for {}", inputFile)
 
-			cache = shared_globals.settings.Get("asmHeaderCache", {})
-			mtime = os.path.getmtime(inputFile)
-			if inputFile in cache:
-				if mtime <= cache[inputFile]["mtime"]:
-					return cache[inputFile]["result"]
+			# Use the list the compiler reported the last time the file was built if there is one. It contains
+			# everything the file includes, directly or indirectly, so there's no need to look any further
+			# unless something has changed since then.
+			recorded = dependency_records.GetRecordedDependencies(buildProject, inputFile)
+			if recorded is not None:
+				dependencies, complete = recorded
+				if complete:
+					return dependencies
 
-			with open(inputFile, "rb") as f:
-				contents = f.read()
-				contents = contents.decode("utf-8", "replace")
-
-			ret = set()
-
-			includeDirs = [os.path.dirname(inputFile)] + list(buildProject.toolchain.Tool(self._assembler).GetIncludeDirectories())
-			for header in _includeRegex.findall(contents):
-				for includeDir in includeDirs:
-					maybeHeaderLoc = os.path.join(includeDir, header)
-					if os.access(maybeHeaderLoc, os.F_OK) and not os.path.isdir(maybeHeaderLoc):
-						ret.add(os.path.normpath(maybeHeaderLoc))
-			cache[inputFile] = {"mtime": mtime, "result": ret}
+			ret = _includeGraph.GetDependencies(inputFile, buildProject.toolchain.Tool(self._assembler).GetIncludeDirectories())
+			if recorded is not None:
+				# The file may have new dependencies the compiler hasn't reported yet
+				return ret | recorded[0]
 			return ret
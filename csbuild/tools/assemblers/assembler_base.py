@@ -27,6 +27,9 @@
 
 from __future__ import unicode_literals, division, print_function
 
+import os
+import time
+
 import csbuild
 
 from abc import ABCMeta, abstractmethod
@@ -39,6 +42,7 @@ from ..common.tool_traits import (
 
 from ... import commands, log
 
+from ..._utils import shared_globals, dependency_records
 from ..._utils.decorators import MetaClass
 
 def _ignore(_):
@@ -93,6 +97,28 @@ class AssemblerBase(HasDebugLevel, HasDefines, HasIncludeDirectories):
 		_ignore(project)
 		return None
 
+	def _getStdoutHandler(self):
+		return commands.DefaultStdoutHandler
+
+	def _getDependencies(self, project, inputFile, output):
+		"""
+		Get the files the compiler reported the input depending on. This is called whether or not the compiler succeeded,
+		so it can clean up anything the compiler wrote to report them.
+
+		:param project: project being built
+		:type project: csbuild._build.project.Project
+		:param inputFile: File that was built
+		:type inputFile: input_file.InputFile
+		:param output: The compiler's stdout
+		:type output: str
+		:return: Everything the input depended on, or None if the compiler doesn't report it
+		:rtype: list[str] or None
+		"""
+		_ignore(project)
+		_ignore(inputFile)
+		_ignore(output)
+		return None
+
 
 	################################################################################
 	### Abstract methods that need to be implemented by subclasses
@@ -144,7 +170,42 @@ class AssemblerBase(HasDebugLevel, HasDefines, HasIncludeDirectories):
 			inputProject.targetName
 		)
 
-		returncode, _, _ = commands.Run(self._getCommand(inputProject, inputFile), env=self._getEnv(inputProject))
+		cmd = self._getCommand(inputProject, inputFile)
+		outputFiles = self._getOutputFiles(inputProject, inputFile)
+
+		cache = shared_globals.artifactCache
+		cacheKey = None
+		if cache is not None:
+			cacheKey = cache.GetKey(inputProject, inputFile, cmd)
+			if cache.Fetch(cacheKey, outputFiles):
+				log.Info("Restored {} from the artifact cache", inputFile)
+				return outputFiles
+
+		startTime = time.time()
+		returncode, output, _ = commands.Run(cmd, stdout=self._getStdoutHandler(), env=self._getEnv(inputProject))
+		dependencies = self._getDependencies(inputProject, inputFile, output)
 		if returncode != 0:
 			raise csbuild.BuildFailureException(inputProject, inputFile)
-		return self._getOutputFiles(inputProject, inputFile)
+		if dependencies is not None:
+			dependency_records.RecordDependencies(inputProject, os.path.abspath(inputFile.filename), dependencies, startTime)
+		if cacheKey is not None:
+			aliases = ()
+			if dependencies is not None:
+				# Later builds will use the dependencies the compiler just reported rather than the ones found
+				# by scanning the file, so make the outputs available by the key for those as well
+				aliases = (cache.GetKey(inputProject, inputFile, cmd), )
+			cache.Store(cacheKey, outputFiles, aliases)
+		return outputFiles
+
+	def GetCommandSignature(self, inputProject, inputFile):
+		"""
+		Get the command line and environment a file would be assembled with, so it's assembled again if they change.
+
+		:param inputProject: project being built
+		:type inputProject: csbuild._build.project.Project
+		:param inputFile: File to build
+		:type inputFile: input_file.InputFile
+		:return: The command and environment
+		:rtype: tuple[list[str], dict or None]
+		"""
+		return self._getCommand(inputProject, inputFile), self._getEnv(inputProject)
@@ -31,6 +31,10 @@ import os
 import csbuild
 
 from .assembler_base import AssemblerBase
+from ..._utils import dependency_records
+
+def _ignore(_):
+	pass
 
 class GccAssembler(AssemblerBase):
 	"""
@@ -59,12 +63,25 @@ class GccAssembler(AssemblerBase):
 			+ self._getDefaultArgs(project) \
 			+ self._getCustomArgs() \
 			+ self._getOutputFileArgs(project, inputFile) \
+			+ self._getDependencyFileArgs(project, inputFile) \
 			+ self._getPreprocessorArgs() \
 			+ self._getIncludeDirectoryArgs() \
 			+ self._getArchitectureArgs(project)
 
 		return [arg for arg in cmd if arg]
 
+	def _getDependencies(self, project, inputFile, output):
+		_ignore(output)
+		dependencyFile = self._getDependencyFile(project, inputFile)
+		if not os.access(dependencyFile, os.F_OK):
+			return None
+		with open(dependencyFile, "r") as f:
+			contents = f.read()
+		# Everything needed from it is in the dependency record now, and leaving it would keep clean from
+		# removing the intermediate directory
+		os.remove(dependencyFile)
+		return dependency_records.ParseMakefileDependencies(contents)
+
 
 	####################################################################################################################
 	### Internal methods
@@ -82,6 +99,16 @@ class GccAssembler(AssemblerBase):
 	def _getCustomArgs(self):
 		return self._asmFlags
 
+	def _getDependencyFile(self, project, inputFile):
+		outputFiles = self._getOutputFiles(project, inputFile)
+		return os.path.splitext(outputFiles[0])[0] + ".d"
+
+	def _getDependencyFileArgs(self, project, inputFile):
+		# Only preprocessed assembly has dependencies
+		if not inputFile.filename.endswith(".S"):
+			return []
+		return ["-MD", "-MF", self._getDependencyFile(project, inputFile)]
+
 	def _getInputFileArgs(self, inputFile):
 		return ["-c", "{}".format(inputFile.filename)]
 
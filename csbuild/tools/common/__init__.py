@@ -31,6 +31,7 @@ from __future__ import unicode_literals, division, print_function
 import os
 
 from csbuild import log
+from csbuild._utils import shared_globals
 
 def FindLibraries(libNames, libDirs, libExts):
 	"""
@@ -61,7 +62,7 @@ def FindLibraries(libNames, libDirs, libExts):
 		fullPath = os.path.join(libraryDir, filename)
 
 		# Check if the file exists at the current path.
-		if os.access(fullPath, os.F_OK):
+		if shared_globals.statCache.Exists(fullPath):
 			return fullPath
 
 		# If the library couldn't be found, simulate posix by adding the "lib" prefix.
@@ -71,13 +72,13 @@ def FindLibraries(libNames, libDirs, libExts):
 		fullLibraryPath = os.path.join(libraryDir, filename)
 
 		# Check if the modified filename exists at the current path.
-		if os.access(fullLibraryPath, os.F_OK):
+		if shared_globals.statCache.Exists(fullLibraryPath):
 			return fullLibraryPath
 
 		return None
 
 	for libraryName in libNames:
-		if os.access(libraryName, os.F_OK):
+		if shared_globals.statCache.Exists(libraryName):
 			abspath = os.path.abspath(libraryName)
 			log.Info("... found {}".format(abspath))
 			found[libraryName] = abspath
@@ -34,7 +34,7 @@ import csbuild
 from .cpp_compiler_base import CppCompilerBase
 from ..common.tool_traits import HasDebugLevel, HasOptimizationLevel
 from ... import log
-from ..._utils import response_file, shared_globals
+from ..._utils import response_file, shared_globals, dependency_records
 
 DebugLevel = HasDebugLevel.DebugLevel
 OptimizationLevel = HasOptimizationLevel.OptimizationLevel
@@ -71,6 +71,7 @@ class GccCppCompiler(CppCompilerBase):
 			+ self._getPreprocessorArgs() \
 			+ self._getIncludeDirectoryArgs() \
 			+ self._getOutputFileArgs(project, inputFile) \
+			+ self._getDependencyFileArgs(project, inputFile) \
 			+ self._getInputFileArgs(inputFile)
 
 		inputFileBasename = os.path.basename(inputFile.filename)
@@ -81,6 +82,18 @@ class GccCppCompiler(CppCompilerBase):
 
 		return [cmdExe, "@{}".format(responseFile.filePath)]
 
+	def _getDependencies(self, project, inputFile, output):
+		_ignore(output)
+		dependencyFile = self._getDependencyFile(project, inputFile)
+		if not os.access(dependencyFile, os.F_OK):
+			return None
+		with open(dependencyFile, "r") as f:
+			contents = f.read()
+		# Everything needed from it is in the dependency record now, and leaving it would keep clean from
+		# removing the intermediate directory
+		os.remove(dependencyFile)
+		return dependency_records.ParseMakefileDependencies(contents)
+
 
 	####################################################################################################################
 	### Internal methods
@@ -107,6 +120,13 @@ class GccCppCompiler(CppCompilerBase):
 		outputFiles = self._getOutputFiles(project, inputFile)
 		return ["-o", outputFiles[0]]
 
+	def _getDependencyFile(self, project, inputFile):
+		outputFiles = self._getOutputFiles(project, inputFile)
+		return os.path.splitext(outputFiles[0])[0] + ".d"
+
+	def _getDependencyFileArgs(self, project, inputFile):
+		return ["-MD", "-MF", self._getDependencyFile(project, inputFile)]
+
 	def _getPreprocessorArgs(self):
 		return ["-D{}".format(d) for d in self._defines] + ["-U{}".format(u) for u in self._undefines]
 
@@ -32,8 +32,8 @@ import os
 from .cpp_compiler_base import CppCompilerBase
 from ..common.msvc_tool_base import MsvcToolBase
 from ..common.tool_traits import HasDebugLevel, HasOptimizationLevel
-from ... import log
-from ..._utils import response_file, shared_globals
+from ... import log, commands
+from ..._utils import response_file, shared_globals, dependency_records
 
 DebugLevel = HasDebugLevel.DebugLevel
 OptimizationLevel = HasOptimizationLevel.OptimizationLevel
@@ -41,6 +41,11 @@ OptimizationLevel = HasOptimizationLevel.OptimizationLevel
 def _ignore(_):
 	pass
 
+def _stdoutHandler(shared, msg):
+	# The /showIncludes output is only needed to record the file's dependencies, so keep it out of the log
+	if not msg.startswith(dependency_records.SHOW_INCLUDES_PREFIX):
+		commands.DefaultStdoutHandler(shared, msg)
+
 class MsvcCppCompiler(MsvcToolBase, CppCompilerBase):
 	"""
 	MSVC compiler tool implementation.
@@ -94,6 +99,14 @@ class MsvcCppCompiler(MsvcToolBase, CppCompilerBase):
 
 		return [self._exePath, "@{}".format(responseFile.filePath)]
 
+	def _getStdoutHandler(self):
+		return _stdoutHandler
+
+	def _getDependencies(self, project, inputFile, output):
+		_ignore(project)
+		_ignore(inputFile)
+		return dependency_records.ParseShowIncludes(output)
+
 	def SetupForProject(self, project):
 		MsvcToolBase.SetupForProject(self, project)
 		CppCompilerBase.SetupForProject(self, project)
@@ -106,7 +119,7 @@ class MsvcCppCompiler(MsvcToolBase, CppCompilerBase):
 	####################################################################################################################
 
 	def _getDefaultArgs(self):
-		args = ["/nologo", "/c", "/Oi", "/GS"]
+		args = ["/nologo", "/c", "/Oi", "/GS", "/showIncludes"]
 		if self._optLevel == OptimizationLevel.Disabled:
 			args.append("/RTC1")
 		return args
@@ -42,6 +42,9 @@ class AndroidGccLinker(GccLinker, AndroidToolBase):
 
 	outputFiles = {".a", ".so"}
 
+	# The NDK doesn't provide a host nm that can be relied on to read its libraries
+	GetOutputInterface = None
+
 
 	####################################################################################################################
 	### Methods implemented from base classes
@@ -96,6 +96,40 @@ class GccLinker(LinkerBase):
 
 		return cmd
 
+	def GetOutputInterface(self, inputProject, outputFile):
+		"""
+		Get the dynamic symbols a shared library exports, so projects that link against it don't link again
+		when only the code behind them has changed.
+
+		:param inputProject: project that was built
+		:type inputProject: csbuild._build.project.Project
+		:param outputFile: The output
+		:type outputFile: str
+		:return: Sorted list of exported symbols, or None if the output isn't a shared library or its symbols can't be read
+		:rtype: list[tuple[str]] or None
+		"""
+		if inputProject.projectType != csbuild.ProjectType.SharedLibrary:
+			return None
+		try:
+			returncode, out, _ = commands.Run([self._getNmName(), "-D", "--defined-only", "-S", outputFile], stdout=None, stderr=None)
+		except OSError:
+			return None
+		if returncode != 0:
+			return None
+		symbols = []
+		for line in out.splitlines():
+			fields = line.split()
+			if len(fields) < 3:
+				continue
+			symbolType, name = fields[-2], fields[-1]
+			# Addresses and the sizes of functions change along with the code, but the size of exported data is
+			# baked into anything that links against it
+			if len(fields) == 4 and symbolType.upper() in "BDGRSV":
+				symbols.append((name, symbolType, fields[1]))
+			else:
+				symbols.append((name, symbolType))
+		return sorted(symbols)
+
 	def _findLibraries(self, project, libs):
 		ret = {}
 
@@ -103,7 +137,7 @@ class GccLinker(LinkerBase):
 		longLibs = []
 
 		for lib in libs:
-			if os.access(lib, os.F_OK) and not os.path.isdir(lib):
+			if shared_globals.statCache.IsFile(lib):
 				abspath = os.path.abspath(lib)
 				ret[lib] = abspath
 				shortLibs.remove(lib)
@@ -220,6 +254,9 @@ class GccLinker(LinkerBase):
 	def _getArchiverName(self):
 		return "ar"
 
+	def _getNmName(self):
+		return "nm"
+
 	def _useResponseFileWithLinker(self):
 		return True
 
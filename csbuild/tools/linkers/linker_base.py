@@ -28,6 +28,7 @@
 from __future__ import unicode_literals, division, print_function
 
 import os
+import stat
 
 import csbuild
 from abc import ABCMeta, abstractmethod
@@ -35,7 +36,7 @@ from abc import ABCMeta, abstractmethod
 from ..common.tool_traits import HasDebugLevel, HasDebugRuntime, HasStaticRuntime
 
 from ... import commands, log
-from ..._utils import ordered_set
+from ..._utils import ordered_set, shared_globals
 from ..._utils.decorators import MetaClass
 
 def _ignore(_):
@@ -255,7 +256,47 @@ class LinkerBase(HasDebugLevel, HasDebugRuntime, HasStaticRuntime):
 			inputProject.architectureName,
 			inputProject.targetName
 		)
-		returncode, _, _ = commands.Run(self._getCommand(inputProject, inputFiles), env=self._getEnv(inputProject), cwd=inputProject.outputDir)
+		# Inputs arrive in whatever order they finished building in; sorting them gives the same command, and
+		# the same artifact cache key, every time
+		inputFiles = ordered_set.OrderedSet(sorted(inputFiles, key=lambda inputFile: inputFile.filename))
+		cmd = self._getCommand(inputProject, inputFiles)
+		outputFiles = self._getOutputFiles(inputProject)
+
+		cache = shared_globals.artifactCache
+		cacheKey = None
+		libraries = list(self._actualLibraryLocations.values())
+		# Libraries are only part of the key if they were found as files. Ones left for the linker to search for
+		# can't be hashed, so links using them aren't cached. Libraries the linker adds implicitly, like the C
+		# runtime, are taken to be part of the toolchain, which the key identifies by its executable.
+		if cache is not None and all(os.path.isfile(library) for library in libraries):
+			cacheKey = cache.GetKeyForFiles(cmd, [inputFile.filename for inputFile in inputFiles] + libraries)
+			if cache.Fetch(cacheKey, outputFiles):
+				if inputProject.projectType != csbuild.ProjectType.StaticLibrary:
+					# Outputs fetched from a cache server don't keep their permissions
+					for outputFile in outputFiles:
+						os.chmod(outputFile, os.stat(outputFile).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+				log.Info("Restored {} from the artifact cache", inputProject.outputName)
+				return outputFiles
+
+		returncode, _, _ = commands.Run(cmd, env=self._getEnv(inputProject), cwd=inputProject.outputDir)
 		if returncode != 0:
 			raise csbuild.BuildFailureException(inputProject, inputFiles)
-		return self._getOutputFiles(inputProject)
+		# Some outputs, like import libraries, are only written for some projects
+		if cacheKey is not None and all(os.access(outputFile, os.F_OK) for outputFile in outputFiles):
+			cache.Store(cacheKey, outputFiles)
+		return outputFiles
+
+	def GetCommandSignature(self, inputProject, inputFiles):
+		"""
+		Get the command line and environment a project would be linked with, so it's linked again if they change.
+
+		:param inputProject: project being built
+		:type inputProject: csbuild._build.project.Project
+		:param inputFiles: List of files to build
+		:type inputFiles: list[input_file.InputFile]
+		:return: The command and environment
+		:rtype: tuple[list[str], dict or None]
+		"""
+		# Group inputs arrive in whatever order they finished building in, which shouldn't count as a change
+		inputFiles = ordered_set.OrderedSet(sorted(inputFiles, key=lambda inputFile: inputFile.filename))
+		return self._getCommand(inputProject, inputFiles), self._getEnv(inputProject)
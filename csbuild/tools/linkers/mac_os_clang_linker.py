@@ -43,6 +43,9 @@ class MacOsClangLinker(MacOsToolBase, ClangLinker):
 	outputFiles = { "", ".a", ".dylib" }
 	crossProjectDependencies = { ".a", ".dylib" }
 
+	# The macOS nm doesn't support the options used to read exported symbols
+	GetOutputInterface = None
+
 	def __init__(self, projectSettings):
 		MacOsToolBase.__init__(self, projectSettings)
 		ClangLinker.__init__(self, projectSettings)
@@ -48,6 +48,9 @@ class Ps4Linker(Ps4BaseTool, GccLinker):
 	outputFiles = { ".elf", ".a", ".prx" }
 	crossProjectDependencies = { ".a", ".prx" }
 
+	# PRX files can't be read with nm
+	GetOutputInterface = None
+
 	def __init__(self, projectSettings):
 		Ps4BaseTool.__init__(self, projectSettings)
 		GccLinker.__init__(self, projectSettings)
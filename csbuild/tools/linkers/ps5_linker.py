@@ -48,6 +48,9 @@ class Ps5Linker(Ps5BaseTool, GccLinker):
 	outputFiles = { ".elf", ".a", ".prx" }
 	crossProjectDependencies = { ".a", ".prx" }
 
+	# PRX files can't be read with nm
+	GetOutputInterface = None
+
 	def __init__(self, projectSettings):
 		Ps5BaseTool.__init__(self, projectSettings)
 		GccLinker.__init__(self, projectSettings)
@@ -0,0 +1,13 @@
+--pass-exit-codes
+-m64
+-O3
+-DNDEBUG
+-DCSB_APPLICATION=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/artifact_cache_test/intermediate/gcc/x64/release/hello_world/hello_world/99b1ff8f11781541f7f89f9bd41c4a17/main.o
+-MD
+-MF
+/root/package/functional_tests/artifact_cache_test/intermediate/gcc/x64/release/hello_world/hello_world/99b1ff8f11781541f7f89f9bd41c4a17/main.d
+-c
+/root/package/functional_tests/artifact_cache_test/hello_world/main.cpp
\ No newline at end of file
@@ -0,0 +1,10 @@
+#include <stdio.h>
+#include "value.hpp"
+
+int GetValue();
+
+int main()
+{
+	printf("%d %d", VALUE, GetValue());
+	return 0;
+}
@@ -0,0 +1,4 @@
+int GetValue()
+{
+	return 2;
+}
@@ -0,0 +1,151 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test restoring compiled objects from the artifact cache
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from csbuild import cache_server
+from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import PlatformBytes
+
+class ArtifactCacheTest(FunctionalTest):
+	"""Artifact cache test"""
+	# pylint: disable=invalid-name
+	def setUp(self): # pylint: disable=arguments-differ
+		if platform.system() == "Windows":
+			self.outputFile = "out/hello_world.exe"
+		else:
+			self.outputFile = "out/hello_world"
+		FunctionalTest.setUp(self)
+		self.header = os.path.join("hello_world", "value.hpp")
+		with open(self.header, "r") as f:
+			self.headerContents = f.read()
+
+	def tearDown(self):
+		with open(self.header, "w") as f:
+			f.write(self.headerContents)
+		FunctionalTest.tearDown(self)
+
+	def test(self):
+		"""Test that a rebuild restores unchanged objects from the cache and compiles changed ones"""
+		_, output, _ = self.assertMakeSucceeds("-v")
+		self.assertIn("Artifact cache: 0 hits (0 from the cache server), 3 misses (0% hit rate), 3 stored", output)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1 2"))
+
+		_, output, _ = self.assertMakeSucceeds("-v", "--rebuild")
+		self.assertIn("Restored hello_world/main.cpp from the artifact cache", output)
+		self.assertIn("Restored hello_world/value.cpp from the artifact cache", output)
+		self.assertIn("Restored hello_world from the artifact cache", output)
+		self.assertIn("Artifact cache: 3 hits (0 from the cache server), 0 misses (100% hit rate), 0 stored", output)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1 2"))
+
+		# Changing a header only invalidates the files that include it
+		with open(self.header, "w") as f:
+			f.write(self.headerContents.replace("VALUE 1", "VALUE 3"))
+		_, output, _ = self.assertMakeSucceeds("-v", "--rebuild")
+		self.assertNotIn("Restored hello_world/main.cpp", output)
+		self.assertIn("Restored hello_world/value.cpp from the artifact cache", output)
+		self.assertNotIn("Restored hello_world from", output)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("3 2"))
+
+		_, output, _ = self.assertMakeSucceeds("-v", "--rebuild", "--no-cache")
+		self.assertNotIn("from the artifact cache", output)
+		self.assertNotIn("Artifact cache:", output)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("3 2"))
+
+	def testSharedCacheDir(self):
+		"""Test that a cache directory given on the command line is used, and that it's limited to its size"""
+		cacheDir = os.path.join(".csbuild", "shared_cache")
+		self.assertMakeSucceeds("-v", "--cache-dir", cacheDir)
+		self.assertTrue(os.listdir(cacheDir))
+
+		_, output, _ = self.assertMakeSucceeds("-v", "--rebuild", "--cache-dir", cacheDir, "--cache-size", "1")
+		self.assertIn("Artifact cache: 3 hits", output)
+		self.assertIn("0 stored, 0 evicted", output)
+
+		with open(self.header, "w") as f:
+			f.write(self.headerContents.replace("VALUE 1", "VALUE 4"))
+		_, output, _ = self.assertMakeSucceeds("-v", "--rebuild", "--cache-dir", cacheDir, "--cache-size", "1")
+		# The changed object and the executable linked from it
+		self.assertIn("2 stored", output)
+		self.assertEqual([], [name for name in os.listdir(cacheDir) if os.listdir(os.path.join(cacheDir, name))])
+
+	def testCacheServer(self):
+		"""Test that objects compiled by one build are restored from the cache server by a build with an empty local cache"""
+		server = cache_server.CacheServer(("localhost", 0), cache_server.BlobStore(os.path.join(".csbuild", "server"), 0))
+		thread = threading.Thread(target=server.serve_forever)
+		thread.start()
+		try:
+			url = "http://localhost:{}".format(server.port)
+			_, output, _ = self.assertMakeSucceeds("-v", "--cache-server", url, "--cache-dir", os.path.join(".csbuild", "a"))
+			self.assertIn("Artifact cache: 0 hits (0 from the cache server), 3 misses (0% hit rate), 3 stored", output)
+
+			_, output, _ = self.assertMakeSucceeds(
+				"-v", "--rebuild", "--cache-server", url, "--cache-dir", os.path.join(".csbuild", "b")
+			)
+			self.assertIn("Restored hello_world/main.cpp from the artifact cache", output)
+			self.assertIn("Artifact cache: 3 hits (3 from the cache server), 0 misses (100% hit rate), 0 stored", output)
+			self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1 2"))
+
+			metrics = server.store.GetMetrics()
+			# Objects are stored by the dependencies the compiler reported for them as well as the ones found by scanning
+			# for includes, so there may be more than one entry for each
+			self.assertGreaterEqual(metrics["puts"], 3)
+			self.assertEqual(metrics["hits"], 3)
+		finally:
+			server.shutdown()
+			server.server_close()
+			thread.join()
+
+		_, output, _ = self.assertMakeSucceeds("-v", "--rebuild", "--cache-server", url, "--cache-dir", os.path.join(".csbuild", "c"))
+		self.assertIn("Artifact cache server unavailable", output)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1 2"))
+
+	def testRelocatedCheckout(self):
+		"""Test that a copy of the checkout at another path restores everything the original built from a shared cache"""
+		cacheDir = os.path.abspath(os.path.join(".csbuild", "shared_cache"))
+		self.assertMakeSucceeds("-v", "--cache-dir", cacheDir)
+
+		# Files under .csbuild aren't collected as sources, so the copy goes somewhere else
+		tempDir = tempfile.mkdtemp()
+		checkout = os.path.join(tempDir, "checkout")
+		shutil.copytree(".", checkout, ignore=shutil.ignore_patterns(".csbuild", "out", "intermediate", "lock", "__pycache__"))
+		prevDir = os.getcwd()
+		os.chdir(checkout)
+		try:
+			_, output, _ = self.assertMakeSucceeds("-v", "--cache-dir", cacheDir)
+			self.assertIn("Artifact cache: 3 hits (0 from the cache server), 0 misses (100% hit rate), 0 stored", output)
+			self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1 2"))
+		finally:
+			os.chdir(prevDir)
+			shutil.rmtree(tempDir)
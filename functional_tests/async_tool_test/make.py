@@ -0,0 +1,130 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: make
+	:synopsis: Makefile for this test
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import asyncio
+import os
+
+import csbuild
+from csbuild.toolchain import Tool
+
+csbuild.SetIntermediateDirectory("intermediate")
+csbuild.SetOutputDirectory("out")
+
+class AsyncDoubler(Tool):
+	"""
+	Tool that waits a while before doubling the contents of a file, without holding onto a build thread while it waits.
+	"""
+	inputFiles = {".first"}
+
+	outputFiles = {".second"}
+
+	supportedArchitectures = None
+
+	inFlight = 0
+	maxInFlight = 0
+
+	def __init__(self, projectSettings):
+		self._delay = projectSettings.get("delay", 0)
+		Tool.__init__(self, projectSettings)
+
+	@staticmethod
+	def SetDelay(delay):
+		"""
+		Set how long each task waits
+
+		:param delay: Delay in seconds
+		:type delay: float
+		"""
+		csbuild.currentPlan.SetValue("delay", delay)
+
+	async def RunAsync(self, inputProject, inputFile):
+		# All coroutines run on one thread, so there's no need for a lock.
+		AsyncDoubler.inFlight += 1
+		AsyncDoubler.maxInFlight = max(AsyncDoubler.maxInFlight, AsyncDoubler.inFlight)
+		await asyncio.sleep(self._delay)
+		# Tool settings have to still be accessible after the coroutine resumes
+		assert self._delay == 0.5
+		AsyncDoubler.inFlight -= 1
+
+		with open(inputFile.filename, "r") as f:
+			value = int(f.read())
+		if value == 7 and os.getenv("ASYNC_TOOL_TEST_FAIL") == "1":
+			raise csbuild.BuildFailureException(inputProject, inputFile, "Failing on purpose")
+		outFile = os.path.join(inputProject.intermediateDir, os.path.splitext(os.path.basename(inputFile.filename))[0] + ".second")
+		with open(outFile, "w") as f:
+			f.write(str(value * 2))
+		return outFile
+
+class Adder(Tool):
+	"""
+	Synchronous tool that adds the doubled files together, also recording how many doublers were running at once.
+	"""
+	inputGroups = {".second"}
+
+	outputFiles = {".third"}
+
+	supportedArchitectures = None
+
+	def RunGroup(self, inputProject, inputFiles):
+		value = 0
+		for inputFile in inputFiles:
+			with open(inputFile.filename, "r") as f:
+				value += int(f.read())
+		with open(os.path.join(inputProject.csbuildDir, "maxInFlight"), "w") as f:
+			f.write(str(AsyncDoubler.maxInFlight))
+		outFile = os.path.join(inputProject.intermediateDir, inputProject.outputName + ".third")
+		with open(outFile, "w") as f:
+			f.write(str(value))
+		return outFile
+
+class AsyncPackager(Tool):
+	"""
+	Tool that copies the sum into the output directory using RunGroupAsync.
+	"""
+	inputGroups = {".third"}
+
+	outputFiles = {".fourth"}
+
+	supportedArchitectures = None
+
+	async def RunGroupAsync(self, inputProject, inputFiles):
+		await asyncio.sleep(0)
+		with open(list(inputFiles)[0].filename, "r") as f:
+			value = f.read()
+		outFile = os.path.join(inputProject.outputDir, inputProject.outputName + ".fourth")
+		with open(outFile, "w") as f:
+			f.write(value)
+		return outFile
+
+csbuild.RegisterToolchain("Async", "", AsyncDoubler, Adder, AsyncPackager)
+csbuild.SetDefaultToolchain("Async")
+
+with csbuild.Project("TestProject", "."):
+	csbuild.SetDelay(0.5)
+	csbuild.SetOutput("Foo", csbuild.ProjectType.Application)
@@ -0,0 +1,59 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test tools that run as coroutines with RunAsync and RunGroupAsync
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+
+from csbuild._testing.functional_test import FunctionalTest
+
+class AsyncToolTest(FunctionalTest):
+	"""Async tool test"""
+	# pylint: disable=invalid-name
+	def test(self):
+		"""Test that async tools chain together with synchronous ones and don't each need a thread"""
+		self.assertMakeSucceeds("-v", "-j", "1")
+		for i in range(1, 41):
+			self.assertFileContents("./intermediate/{}.second".format(i), str(i*2))
+		self.assertFileContents("./out/Foo.fourth", str(sum(range(1, 41)) * 2))
+
+		# With a single build thread, a synchronous tool could only ever have had one task running at once
+		with open(os.path.join(".csbuild", "maxInFlight"), "r") as f:
+			self.assertGreater(int(f.read()), 1)
+
+		# Up-to-date checks happen before the coroutine is started, same as for Run()
+		_, output, _ = self.assertMakeSucceeds("-v", "-j", "1")
+		self.assertIn("Previous result exists and input has not changed", output)
+		self.assertNotIn("Processing firsts/1.first with AsyncDoubler", output)
+
+	def testFailure(self):
+		"""Test that an exception from a coroutine fails the build"""
+		os.environ["ASYNC_TOOL_TEST_FAIL"] = "1"
+		try:
+			self.assertMakeFails("Failing on purpose", "-v", "-j", "1")
+		finally:
+			del os.environ["ASYNC_TOOL_TEST_FAIL"]
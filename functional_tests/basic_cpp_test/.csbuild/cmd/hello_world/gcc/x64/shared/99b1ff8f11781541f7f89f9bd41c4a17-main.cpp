@@ -0,0 +1,12 @@
+--pass-exit-codes
+-m64
+-O0
+-DCSB_APPLICATION=1
+-DCSB_TARGET_SHARED=1
+-o
+/root/package/functional_tests/basic_cpp_test/intermediate/gcc/x64/shared/hello_world/hello_world/99b1ff8f11781541f7f89f9bd41c4a17/main.o
+-MD
+-MF
+/root/package/functional_tests/basic_cpp_test/intermediate/gcc/x64/shared/hello_world/hello_world/99b1ff8f11781541f7f89f9bd41c4a17/main.d
+-c
+/root/package/functional_tests/basic_cpp_test/hello_world/main.cpp
\ No newline at end of file
@@ -0,0 +1,13 @@
+--pass-exit-codes
+-fPIC
+-m64
+-O0
+-DCSB_SHARED_LIBRARY=1
+-DCSB_TARGET_SHARED=1
+-o
+/root/package/functional_tests/basic_cpp_test/intermediate/gcc/x64/shared/libhello/libhello/ab60040f92e8514599719ae7081f1187/libhello.o
+-MD
+-MF
+/root/package/functional_tests/basic_cpp_test/intermediate/gcc/x64/shared/libhello/libhello/ab60040f92e8514599719ae7081f1187/libhello.d
+-c
+/root/package/functional_tests/basic_cpp_test/libhello/libhello.cpp
\ No newline at end of file
@@ -143,10 +143,11 @@ class BasicCppTest(FunctionalTest):
 
 		Touch("hello_world/hello.cpp")
 
+		# Touching the file doesn't change the object it compiles to, so there's nothing to relink
 		_, out, _ = self.assertMakeSucceeds("-v", "--project=hello_world", "--show-commands")
 		self.assertIn("Compiling hello_world/hello.cpp", out)
 		self.assertNotIn("Compiling hello_world/main.cpp", out)
-		self.assertIn("Linking hello_world", out)
+		self.assertNotIn("Linking hello_world", out)
 
 		self.assertTrue(os.access(self.outputFile, os.F_OK))
 		out = subprocess.check_output([self.outputFile])
@@ -158,7 +159,7 @@ class BasicCppTest(FunctionalTest):
 		_, out, _ = self.assertMakeSucceeds("-v", "--project=hello_world", "--show-commands")
 		self.assertNotIn("Compiling hello_world/hello.cpp", out)
 		self.assertIn("Compiling hello_world/main.cpp", out)
-		self.assertIn("Linking hello_world", out)
+		self.assertNotIn("Linking hello_world", out)
 
 		self.assertTrue(os.access(self.outputFile, os.F_OK))
 		out = subprocess.check_output([self.outputFile])
@@ -177,10 +178,11 @@ class BasicCppTest(FunctionalTest):
 
 		Touch("hello_world/header.hpp")
 
+		# Neither object changes, so there's nothing to relink
 		_, out, _ = self.assertMakeSucceeds("-v", "--project=hello_world", "--show-commands")
 		self.assertIn("Compiling hello_world/hello.cpp", out)
 		self.assertIn("Compiling hello_world/main.cpp", out)
-		self.assertIn("Linking hello_world", out)
+		self.assertNotIn("Linking hello_world", out)
 
 		self.assertTrue(os.access(self.outputFile, os.F_OK))
 		out = subprocess.check_output([self.outputFile])
@@ -227,6 +229,17 @@ class BasicCppTest(FunctionalTest):
 			"--show-commands"
 		)
 
+	def testCompileFailWithBatchedCompletions(self):
+		"""Test a compile failure when finished tasks are processed in batches"""
+		self.cleanArgs = ["--project=fail_compile"]
+		self.assertMakeFails(
+			R"ERROR: Build for fail_compile/main\.cpp in project fail_compile \(.*\) failed!",
+			"-v",
+			"--project=fail_compile",
+			"--show-commands",
+			"--batch-completions"
+		)
+
 	def testLinkFail(self):
 		"""Test a link failure"""
 		self.cleanArgs = ["--project=fail_link"]
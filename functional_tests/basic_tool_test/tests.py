@@ -27,7 +27,10 @@
 
 from __future__ import unicode_literals, division, print_function
 
+import os
+
 from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import task_history
 
 class BasicToolTest(FunctionalTest):
 	"""Basic tool test"""
@@ -46,3 +49,17 @@ class BasicToolTest(FunctionalTest):
 		for i in range(1, 11):
 			self.assertFileContents("./intermediate/{}.second".format(i), str(i*2))
 		self.assertFileContents("./out/Foo.third", "110")
+
+	def testTaskHistory(self):
+		"""Test that the time taken by each task is recorded for future builds"""
+		self.assertMakeSucceeds("-v")
+		history = task_history.TaskHistory(os.path.join(".csbuild", "taskHistory"))
+		# pylint: disable=protected-access
+		doublerRecords = [(key, record) for key, record in history._records.items() if key[1] == "Doubler"]
+		self.assertEqual(10, len(doublerRecords))
+		for key, record in doublerRecords:
+			self.assertTrue(key[0].startswith("TestProject "))
+			self.assertTrue(key[2].endswith(".first"))
+			self.assertTrue(record.succeeded)
+			self.assertGreater(record.inputSize, 0)
+		self.assertIsNotNone(history.GetRecord(doublerRecords[0][0][0], "Adder", None))
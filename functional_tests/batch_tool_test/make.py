@@ -0,0 +1,118 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: make
+	:synopsis: Makefile for this test
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import threading
+
+import csbuild
+from csbuild.toolchain import Tool
+
+csbuild.SetIntermediateDirectory("intermediate")
+csbuild.SetOutputDirectory("out")
+
+_batchLogLock = threading.Lock()
+
+def _recordBatch(inputProject, toolName, inputFiles):
+	with _batchLogLock:
+		with open(os.path.join(inputProject.csbuildDir, "batches"), "a") as f:
+			f.write("{} {}\n".format(toolName, len(inputFiles)))
+
+class Doubler(Tool):
+	"""
+	Batch tool that doubles the contents of each of its inputs, taking up to four at a time.
+	"""
+	inputFiles = {".first"}
+
+	outputFiles = {".second"}
+
+	supportedArchitectures = None
+
+	maxBatchSize = 4
+
+	def RunBatch(self, inputProject, inputFiles):
+		_recordBatch(inputProject, "Doubler", inputFiles)
+		outputs = []
+		for inputFile in inputFiles:
+			with open(inputFile.filename, "r") as f:
+				value = int(f.read())
+			outFile = os.path.join(inputProject.intermediateDir, os.path.splitext(os.path.basename(inputFile.filename))[0] + ".second")
+			with open(outFile, "w") as f:
+				f.write(str(value * 2))
+			outputs.append(outFile)
+		return outputs
+
+class Incrementer(Tool):
+	"""
+	Batch tool that adds one to the contents of each of its inputs, waiting for more inputs to show up before running.
+	"""
+	inputFiles = {".second"}
+
+	outputFiles = {".third"}
+
+	supportedArchitectures = None
+
+	batchWindow = 1.0
+
+	def RunBatch(self, inputProject, inputFiles):
+		_recordBatch(inputProject, "Incrementer", inputFiles)
+		outputs = []
+		for inputFile in inputFiles:
+			with open(inputFile.filename, "r") as f:
+				value = int(f.read())
+			outFile = os.path.join(inputProject.intermediateDir, os.path.splitext(os.path.basename(inputFile.filename))[0] + ".third")
+			with open(outFile, "w") as f:
+				f.write(str(value + 1))
+			outputs.append(outFile)
+		return outputs
+
+class Adder(Tool):
+	"""
+	Simple tool that adds the contents of all its inputs together.
+	"""
+	inputGroups = {".third"}
+
+	outputFiles = {".fourth"}
+
+	supportedArchitectures = None
+
+	def RunGroup(self, inputProject, inputFiles):
+		value = 0
+		for inputFile in inputFiles:
+			with open(inputFile.filename, "r") as f:
+				value += int(f.read())
+		outFile = os.path.join(inputProject.outputDir, inputProject.outputName + ".fourth")
+		with open(outFile, "w") as f:
+			f.write(str(value))
+		return outFile
+
+csbuild.RegisterToolchain("Batch", "", Doubler, Incrementer, Adder)
+csbuild.SetDefaultToolchain("Batch")
+
+with csbuild.Project("TestProject", "."):
+	csbuild.SetOutput("Foo", csbuild.ProjectType.Application)
@@ -0,0 +1,81 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test tools that build several inputs at once with RunBatch
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import time
+
+from csbuild._testing.functional_test import FunctionalTest
+
+class BatchToolTest(FunctionalTest):
+	"""Batch tool test"""
+	# pylint: disable=invalid-name
+	def _readBatches(self):
+		batchFile = os.path.join(".csbuild", "batches")
+		if not os.access(batchFile, os.F_OK):
+			return []
+		with open(batchFile, "r") as f:
+			batches = [line.split() for line in f.read().splitlines()]
+		os.remove(batchFile)
+		return [(toolName, int(size)) for toolName, size in batches]
+
+	def _assertOutputs(self):
+		for i in range(1, 11):
+			self.assertFileContents("./intermediate/{}.second".format(i), str(i * 2))
+			self.assertFileContents("./intermediate/{}.third".format(i), str(i * 2 + 1))
+		self.assertFileContents("./out/Foo.fourth", str(sum(i * 2 + 1 for i in range(1, 11))))
+
+	def test(self):
+		"""Test that ready inputs are batched together and tracked individually for incremental builds"""
+		self.assertMakeSucceeds("-v", "-j", "4")
+		self._assertOutputs()
+
+		batches = self._readBatches()
+		doublerBatches = [size for toolName, size in batches if toolName == "Doubler"]
+		incrementerBatches = [size for toolName, size in batches if toolName == "Incrementer"]
+		# All ten inputs are ready at once, so they're split up only by maxBatchSize
+		self.assertEqual([4, 4, 2], doublerBatches)
+		# The Doubler's batches all finish well within the Incrementer's batch window
+		self.assertEqual([10], incrementerBatches)
+
+		# Nothing changed, so nothing is built again
+		self.assertMakeSucceeds("-v", "-j", "4")
+		self.assertEqual([], self._readBatches())
+
+		# Only the changed input is passed to the batch tool
+		time.sleep(1)
+		try:
+			with open("./firsts/3.first", "w") as f:
+				f.write("3")
+			self.assertMakeSucceeds("-v", "-j", "4")
+		finally:
+			with open("./firsts/3.first", "w") as f:
+				f.write("3")
+		# The Doubler's output comes out the same as before, so the Incrementer has nothing to do
+		self.assertEqual([("Doubler", 1)], self._readBatches())
+		self._assertOutputs()
@@ -0,0 +1,79 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test recompiling files when the commands that build them change
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import platform
+import subprocess
+
+from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import PlatformBytes, PlatformString
+
+class CommandSignatureTest(FunctionalTest):
+	"""Command signature test"""
+	# pylint: disable=invalid-name
+	def setUp(self): # pylint: disable=arguments-differ
+		if platform.system() == "Windows":
+			self.outputFile = "out/hello_world.exe"
+		else:
+			self.outputFile = "out/hello_world"
+		FunctionalTest.setUp(self)
+
+	def tearDown(self):
+		os.environ.pop(PlatformString("CSBUILD_TEST_LIB_VALUE"), None)
+		FunctionalTest.tearDown(self)
+
+	def _getObjectTimes(self):
+		objectTimes = {}
+		for root, _, files in os.walk("intermediate"):
+			for filename in files:
+				if os.path.splitext(filename)[1] in (".o", ".obj"):
+					objectTimes[filename] = os.path.getmtime(os.path.join(root, filename))
+		self.assertEqual(len(objectTimes), 2)
+		return objectTimes
+
+	def test(self):
+		"""Test that changing a project's defines recompiles only that project's files"""
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1"))
+		objectTimes = self._getObjectTimes()
+
+		os.environ[PlatformString("CSBUILD_TEST_LIB_VALUE")] = PlatformString("2")
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("2"))
+		newObjectTimes = self._getObjectTimes()
+		for filename, mtime in newObjectTimes.items():
+			if filename.startswith("libvalue"):
+				self.assertNotEqual(mtime, objectTimes[filename])
+			else:
+				self.assertEqual(mtime, objectTimes[filename])
+
+		# Building again with the same defines shouldn't do anything
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertEqual(self._getObjectTimes(), newObjectTimes)
+		self.assertIn("Nothing to build.", out)
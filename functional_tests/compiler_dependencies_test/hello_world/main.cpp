@@ -0,0 +1,11 @@
+#include <stdio.h>
+
+// Included through a macro, so it can only be found by the compiler
+#define VALUE_HEADER "value.hpp"
+#include VALUE_HEADER
+
+int main()
+{
+	printf("%d", VALUE);
+	return 0;
+}
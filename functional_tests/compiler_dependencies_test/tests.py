@@ -0,0 +1,67 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test tracking dependencies reported by the compiler
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import platform
+import subprocess
+
+from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import PlatformBytes
+
+class CompilerDependenciesTest(FunctionalTest):
+	"""Compiler dependencies test"""
+	# pylint: disable=invalid-name
+	def setUp(self): # pylint: disable=arguments-differ
+		if platform.system() == "Windows":
+			self.outputFile = "out/hello_world.exe"
+		else:
+			self.outputFile = "out/hello_world"
+		FunctionalTest.setUp(self)
+		self.header = os.path.join("hello_world", "value.hpp")
+		with open(self.header, "r") as f:
+			self.headerContents = f.read()
+
+	def tearDown(self):
+		with open(self.header, "w") as f:
+			f.write(self.headerContents)
+		FunctionalTest.tearDown(self)
+
+	def test(self):
+		"""Test that a header the include scanner can't find is still a dependency once the file has been compiled"""
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1"))
+
+		# Make sure the header's modification date moves forward even on file systems with coarse timestamps
+		with open(self.header, "w") as f:
+			f.write(self.headerContents.replace("VALUE 1", "VALUE 2"))
+		stat = os.stat(self.header)
+		os.utime(self.header, (stat.st_atime + 10, stat.st_mtime + 10))
+
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("2"))
@@ -0,0 +1,14 @@
+--pass-exit-codes
+-m64
+-O3
+-std=c++14
+-DNDEBUG
+-DCSB_APPLICATION=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/cpp_features_test/intermediate/gcc/x64/release/cxx_standard/cxx_standard/e6523e5fb6d33f6f982ca00c62596b6d/main.o
+-MD
+-MF
+/root/package/functional_tests/cpp_features_test/intermediate/gcc/x64/release/cxx_standard/cxx_standard/e6523e5fb6d33f6f982ca00c62596b6d/main.d
+-c
+/root/package/functional_tests/cpp_features_test/cxx_standard/main.cpp
\ No newline at end of file
@@ -0,0 +1,14 @@
+--pass-exit-codes
+-fPIC
+-m64
+-O3
+-DNDEBUG
+-DCSB_SHARED_LIBRARY=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/cpp_rpath_test/intermediate/gcc/x64/release/libhello/libhello/ab60040f92e8514599719ae7081f1187/libhello.o
+-MD
+-MF
+/root/package/functional_tests/cpp_rpath_test/intermediate/gcc/x64/release/libhello/libhello/ab60040f92e8514599719ae7081f1187/libhello.d
+-c
+/root/package/functional_tests/cpp_rpath_test/libhello/libhello.cpp
\ No newline at end of file
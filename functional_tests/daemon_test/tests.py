@@ -0,0 +1,88 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test running builds through the build daemon
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import platform
+import subprocess
+
+from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import daemon_client, PlatformBytes, PlatformString
+
+class DaemonTest(FunctionalTest):
+	"""Build daemon test"""
+	# pylint: disable=invalid-name
+	def setUp(self): # pylint: disable=arguments-differ
+		if platform.system() == "Windows":
+			self.outputFile = "out/hello_world.exe"
+		else:
+			self.outputFile = "out/hello_world"
+		FunctionalTest.setUp(self)
+
+	def tearDown(self):
+		os.environ.pop(PlatformString("CSBUILD_TEST_VALUE"), None)
+		self.RunMake("--stop-daemon")
+		FunctionalTest.tearDown(self)
+
+	def test(self):
+		"""Test that builds run through the daemon, and that it restarts when the makefile or environment changes"""
+		if not daemon_client.IsSupported():
+			return
+
+		_, out, _ = self.assertMakeSucceeds("--daemon")
+		self.assertIn("Starting build daemon", out)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1"))
+		self.assertFileExists(".csbuild/daemon.sock")
+
+		_, out, _ = self.assertMakeSucceeds("--daemon")
+		self.assertNotIn("Starting build daemon", out)
+		self.assertNotIn("Restarting build daemon", out)
+		self.assertIn("Nothing to build.", out)
+
+		os.environ[PlatformString("CSBUILD_TEST_VALUE")] = PlatformString("2")
+		_, out, _ = self.assertMakeSucceeds("--daemon")
+		self.assertIn("Restarting build daemon: environment changed", out)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("2"))
+
+		stat = os.stat("make.py")
+		os.utime("make.py", (stat.st_atime + 10, stat.st_mtime + 10))
+		_, out, _ = self.assertMakeSucceeds("--daemon")
+		self.assertIn("Restarting build daemon: make.py changed", out)
+
+		# Failures are reported back to the client
+		os.environ[PlatformString("CSBUILD_TEST_VALUE")] = PlatformString("undefined_value")
+		returncode, _, _ = self.RunMake("--daemon")
+		self.assertNotEqual(returncode, 0)
+
+		del os.environ[PlatformString("CSBUILD_TEST_VALUE")]
+		_, out, _ = self.assertMakeSucceeds("--daemon")
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1"))
+
+		_, out, _ = self.assertMakeSucceeds("--stop-daemon")
+		self.assertIn("Stopped build daemon", out)
+		self.assertFileDoesNotExist(".csbuild/daemon.sock")
@@ -0,0 +1,14 @@
+--pass-exit-codes
+-m64
+-O3
+-DUNUSED_VALUE=2
+-DNDEBUG
+-DCSB_STATIC_LIBRARY=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/early_cutoff_test/intermediate/gcc/x64/release/libvalue/libvalue/b538b5464329cfb20814f01226a16279/libvalue.o
+-MD
+-MF
+/root/package/functional_tests/early_cutoff_test/intermediate/gcc/x64/release/libvalue/libvalue/b538b5464329cfb20814f01226a16279/libvalue.d
+-c
+/root/package/functional_tests/early_cutoff_test/libvalue/libvalue.cpp
\ No newline at end of file
@@ -0,0 +1,76 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test skipping work downstream of outputs that were rebuilt without changing
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import platform
+import subprocess
+
+from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import PlatformBytes, PlatformString
+
+class EarlyCutoffTest(FunctionalTest):
+	"""Early cutoff test"""
+	# pylint: disable=invalid-name
+	def setUp(self): # pylint: disable=arguments-differ
+		if platform.system() == "Windows":
+			self.outputFile = "out/hello_world.exe"
+			self.libraryFile = "out/libvalue.lib"
+		else:
+			self.outputFile = "out/hello_world"
+			self.libraryFile = "out/libvalue.a"
+		FunctionalTest.setUp(self)
+
+	def tearDown(self):
+		os.environ.pop(PlatformString("CSBUILD_TEST_UNUSED_VALUE"), None)
+		FunctionalTest.tearDown(self)
+
+	def _getObjectTime(self):
+		for root, _, files in os.walk("intermediate"):
+			for filename in files:
+				if filename.startswith("libvalue") and os.path.splitext(filename)[1] in (".o", ".obj"):
+					return os.path.getmtime(os.path.join(root, filename))
+		self.fail("No object file found for libvalue")
+		return None
+
+	def test(self):
+		"""Test that an object that's recompiled to the same contents doesn't get archived or linked again"""
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1"))
+		objectTime = self._getObjectTime()
+		libraryTime = os.path.getmtime(self.libraryFile)
+		outputTime = os.path.getmtime(self.outputFile)
+
+		# The define isn't used by the code, so the object is recompiled but comes out the same
+		os.environ[PlatformString("CSBUILD_TEST_UNUSED_VALUE")] = PlatformString("2")
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertNotEqual(self._getObjectTime(), objectTime)
+		self.assertEqual(os.path.getmtime(self.libraryFile), libraryTime)
+		self.assertEqual(os.path.getmtime(self.outputFile), outputTime)
+		self.assertIn("Completed 1 tasks", out)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1"))
@@ -0,0 +1,13 @@
+--pass-exit-codes
+-m64
+-O3
+-DNDEBUG
+-DCSB_APPLICATION=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/explicit_sources_test/intermediate/gcc/x64/release/explicit_sources/explicit_sources/435449096b8bd46909f97d2423e60866/main.o
+-MD
+-MF
+/root/package/functional_tests/explicit_sources_test/intermediate/gcc/x64/release/explicit_sources/explicit_sources/435449096b8bd46909f97d2423e60866/main.d
+-c
+/root/package/functional_tests/explicit_sources_test/project/source/main.cpp
\ No newline at end of file
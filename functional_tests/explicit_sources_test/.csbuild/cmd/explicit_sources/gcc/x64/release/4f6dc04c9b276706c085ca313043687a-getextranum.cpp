@@ -0,0 +1,13 @@
+--pass-exit-codes
+-m64
+-O3
+-DNDEBUG
+-DCSB_APPLICATION=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/explicit_sources_test/intermediate/gcc/x64/release/explicit_sources/explicit_sources/4f6dc04c9b276706c085ca313043687a/getextranum.o
+-MD
+-MF
+/root/package/functional_tests/explicit_sources_test/intermediate/gcc/x64/release/explicit_sources/explicit_sources/4f6dc04c9b276706c085ca313043687a/getextranum.d
+-c
+/root/package/functional_tests/explicit_sources_test/project/extra/getextranum.cpp
\ No newline at end of file
@@ -0,0 +1,13 @@
+--pass-exit-codes
+-m64
+-O3
+-DNDEBUG
+-DCSB_APPLICATION=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/explicit_sources_test/intermediate/gcc/x64/release/explicit_sources/explicit_sources/b2c8f43c19f8427008db6d64aacac9f5/getnum.o
+-MD
+-MF
+/root/package/functional_tests/explicit_sources_test/intermediate/gcc/x64/release/explicit_sources/explicit_sources/b2c8f43c19f8427008db6d64aacac9f5/getnum.d
+-c
+/root/package/functional_tests/explicit_sources_test/project/source/correct/getnum.cpp
\ No newline at end of file
@@ -0,0 +1,93 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test recompiling files based on their contents
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import glob
+import os
+import platform
+import subprocess
+
+from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import PlatformBytes
+
+class HashCompileCheckerTest(FunctionalTest):
+	"""Hash compile checker test"""
+	# pylint: disable=invalid-name
+	def setUp(self): # pylint: disable=arguments-differ
+		if platform.system() == "Windows":
+			self.outputFile = "out/hello_world.exe"
+		else:
+			self.outputFile = "out/hello_world"
+		FunctionalTest.setUp(self)
+		self.header = os.path.join("hello_world", "value.hpp")
+		with open(self.header, "r") as f:
+			self.headerContents = f.read()
+
+	def tearDown(self):
+		with open(self.header, "w") as f:
+			f.write(self.headerContents)
+		FunctionalTest.tearDown(self)
+
+	def _getObjectTimes(self):
+		objectTimes = {}
+		for root, _, files in os.walk("intermediate"):
+			for filename in files:
+				if filename.endswith(".o"):
+					objectTimes[filename] = os.path.getmtime(os.path.join(root, filename))
+		self.assertEqual(len(objectTimes), 2)
+		return objectTimes
+
+	def test(self):
+		"""Test that touching files doesn't recompile them, but changing them does"""
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1 2"))
+		objectTimes = self._getObjectTimes()
+
+		# Touching every source file without changing it shouldn't rebuild anything
+		for filename in glob.glob("hello_world/*"):
+			stat = os.stat(filename)
+			os.utime(filename, (stat.st_atime + 10, stat.st_mtime + 10))
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertEqual(self._getObjectTimes(), objectTimes)
+		# Only work that was actually done is counted
+		self.assertIn("Completed 0 tasks", out)
+
+		# Changing the header should only rebuild the file that includes it
+		with open(self.header, "w") as f:
+			f.write(self.headerContents.replace("VALUE 1", "VALUE 5"))
+		self.assertMakeSucceeds()
+		newObjectTimes = self._getObjectTimes()
+		self.assertNotEqual(newObjectTimes["main.o"], objectTimes["main.o"])
+		self.assertEqual(newObjectTimes["value.o"], objectTimes["value.o"])
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("5 2"))
+
+		# Changing it back counts as a change too, even though it's back to what it was the first time
+		with open(self.header, "w") as f:
+			f.write(self.headerContents)
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1 2"))
@@ -30,10 +30,20 @@ from __future__ import unicode_literals, division, print_function
 import csbuild
 from csbuild.toolchain import Tool
 import os
+import threading
 import time
 
 csbuild.SetOutputDirectory("out")
 
+_eventLock = threading.Lock()
+
+def _recordEvent(inputProject, toolName, event, inputFile):
+	# Events are written in the order they happen so the test can check ordering and concurrency afterward.
+	# They go in the .csbuild directory so they don't get in the way of the test checking that clean works.
+	with _eventLock:
+		with open(os.path.join(inputProject.csbuildDir, "events.log"), "a") as f:
+			f.write("{} {} {}\n".format(toolName, event, os.path.basename(inputFile.filename)))
+
 class Sleeper(Tool):
 	"""
 	Simple tool that opens a file, doubles its contents numerically, and writes a new file.
@@ -51,6 +61,7 @@ class Sleeper(Tool):
 	def Run(self, inputProject, inputFile):
 		assert not Sleeper.running
 		Sleeper.running = True
+		_recordEvent(inputProject, "Sleeper", "start", inputFile)
 		time.sleep(1)
 		with open(inputFile.filename, "r") as f:
 			value = f.read()
@@ -59,11 +70,37 @@ class Sleeper(Tool):
 			f.write(value)
 			f.flush()
 			os.fsync(f.fileno())
+		_recordEvent(inputProject, "Sleeper", "end", inputFile)
 		Sleeper.running = False
 		return outFile
 
+class PairSleeper(Tool):
+	"""
+	Simple tool that sleeps, then copies its input to a new file, running at most two at a time.
+	"""
+	inputFiles = {".third"}
+
+	outputFiles = {".fourth"}
+
+	maxParallel = 2
+
+	supportedArchitectures = None
+
+	def Run(self, inputProject, inputFile):
+		_recordEvent(inputProject, "PairSleeper", "start", inputFile)
+		time.sleep(0.5)
+		with open(inputFile.filename, "r") as f:
+			value = f.read()
+		outFile = os.path.join(inputProject.outputDir, inputProject.outputName + "." + os.path.splitext(os.path.basename(inputFile.filename))[0] + ".fourth")
+		with open(outFile, "w") as f:
+			f.write(value)
+			f.flush()
+			os.fsync(f.fileno())
+		_recordEvent(inputProject, "PairSleeper", "end", inputFile)
+		return outFile
+
 
-csbuild.RegisterToolchain("Sleep", "", Sleeper)
+csbuild.RegisterToolchain("Sleep", "", Sleeper, PairSleeper)
 csbuild.SetDefaultToolchain("Sleep")
 
 with csbuild.Project("TestProject", "."):
@@ -27,6 +27,8 @@
 
 from __future__ import unicode_literals, division, print_function
 
+import re
+
 from csbuild._testing.functional_test import FunctionalTest
 
 class TestMaxParallel(FunctionalTest):
@@ -37,3 +39,45 @@ class TestMaxParallel(FunctionalTest):
 		self.assertMakeSucceeds("-v")
 		for i in range(1, 11):
 			self.assertFileContents("./out/Foo.{}.second".format(i), str(i))
+
+	def testMaxParallelWithBatchedCompletions(self):
+		"""test the maxParallel value when finished tasks are processed in batches"""
+		self.assertMakeSucceeds("-v", "--batch-completions")
+		for i in range(1, 11):
+			self.assertFileContents("./out/Foo.{}.second".format(i), str(i))
+
+	def testMaxParallelOrderingAndThroughput(self):
+		"""test that tasks held back by maxParallel start in the order they were queued without holding up other tools"""
+		_, output, _ = self.assertMakeSucceeds("-v", "-j", "4")
+		for i in range(1, 7):
+			self.assertFileContents("./out/Foo.{}.fourth".format(i), str(i))
+
+		with open("./.csbuild/events.log", "r") as f:
+			events = [line.split() for line in f.read().splitlines()]
+
+		running = {"Sleeper": 0, "PairSleeper": 0}
+		maxRunning = {"Sleeper": 0, "PairSleeper": 0}
+		started = {"Sleeper": [], "PairSleeper": []}
+		for toolName, event, filename in events:
+			if event == "start":
+				running[toolName] += 1
+				maxRunning[toolName] = max(maxRunning[toolName], running[toolName])
+				started[toolName].append(filename)
+			else:
+				running[toolName] -= 1
+
+		# Each tool runs exactly as many tasks at once as it's allowed to
+		self.assertEqual(1, maxRunning["Sleeper"])
+		self.assertEqual(2, maxRunning["PairSleeper"])
+
+		# Held-back tasks start in the order they were queued. PairSleeper's tasks are released in order too, but two
+		# of them can start at once, so which one records its start first is a race.
+		queued = re.findall(r"Enqueuing build for \S+/(\S+) using Sleeper ", output)
+		self.assertEqual(queued, started["Sleeper"])
+		queued = re.findall(r"Enqueuing build for \S+/(\S+) using PairSleeper ", output)
+		self.assertEqual(sorted(queued), sorted(started["PairSleeper"]))
+
+		# The serialized tool doesn't hold up the other one: all of PairSleeper's work is done long before Sleeper's is
+		lastPairEnd = max(i for i, event in enumerate(events) if event[0] == "PairSleeper" and event[1] == "end")
+		lastSleeperStart = max(i for i, event in enumerate(events) if event[0] == "Sleeper" and event[1] == "start")
+		self.assertLess(lastPairEnd, lastSleeperStart)
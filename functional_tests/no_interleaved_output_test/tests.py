@@ -29,10 +29,11 @@ from __future__ import unicode_literals, division, print_function
 
 import sys
 import threading
+import time
 
 from csbuild._testing.functional_test import FunctionalTest
 from csbuild import commands, log
-from csbuild._utils import queue
+from csbuild._utils import queue, shared_globals
 
 # Pay no attention to the unit test behind the curtain.
 # This test isn't really a functional test like the others.
@@ -80,6 +81,18 @@ class NoInterleavedOutputTest(FunctionalTest):
 
 	def test(self):
 		"""Ensure no interleaved output from commands"""
+		self._runAndTallyAll()
+
+	def testThreadedOutput(self):
+		"""Ensure no interleaved output from commands when output is read by a pair of threads per process"""
+		oldReactorSupported = commands._reactorSupported # pylint: disable=protected-access
+		commands._reactorSupported = False # pylint: disable=protected-access
+		try:
+			self._runAndTallyAll()
+		finally:
+			commands._reactorSupported = oldReactorSupported # pylint: disable=protected-access
+
+	def _runAndTallyAll(self):
 		commands.queueOfLogQueues = queue.Queue()
 		outputThread = threading.Thread(target=commands.PrintStaggeredRealTimeOutput)
 		outputThread.start()
@@ -111,3 +124,79 @@ class NoInterleavedOutputTest(FunctionalTest):
 		log.SetCallbackQueue(None)
 		self.assertEqual(self.lastValue, 9)
 		self.assertEqual(self.numTallies, len(threads) * 10)
+
+	def testOutputReadingOverhead(self):
+		"""Benchmark reading the output of many chatty processes with the shared reactor vs. a pair of threads each"""
+		if not commands._reactorSupported: # pylint: disable=protected-access
+			self.skipTest("The output reactor isn't supported on this platform")
+
+		numProcesses = 100
+		numLines = 200
+		numRunners = 32
+
+		def _benchmark():
+			latency = [0.0, 0]
+			peakThreads = [0]
+			returncodes = []
+			lock = threading.Lock()
+			remaining = list(range(numProcesses))
+
+			def _onLine(_, msg):
+				now = time.time()
+				threadCount = threading.active_count()
+				#pylint: disable=not-context-manager
+				with lock:
+					latency[0] += now - float(msg)
+					latency[1] += 1
+					peakThreads[0] = max(peakThreads[0], threadCount)
+
+			def _runner():
+				while True:
+					#pylint: disable=not-context-manager
+					with lock:
+						if not remaining:
+							return
+						remaining.pop()
+					returncode, _, _ = commands.Run([sys.executable, "chatty_compiler.py", str(numLines)], stdout=_onLine, stderr=_onLine)
+					#pylint: disable=not-context-manager
+					with lock:
+						returncodes.append(returncode)
+
+			runners = [threading.Thread(target=_runner) for _ in range(numRunners)]
+			baseThreads = threading.active_count()
+			start = time.time()
+			cpuStart = time.process_time() if hasattr(time, "process_time") else time.clock()
+			for runner in runners:
+				runner.start()
+			for runner in runners:
+				runner.join()
+			cpu = (time.process_time() if hasattr(time, "process_time") else time.clock()) - cpuStart
+			self.assertEqual([0] * numProcesses, returncodes)
+			self.assertEqual(numProcesses * numLines, latency[1])
+			return cpu, time.time() - start, latency[0] / latency[1], peakThreads[0] - baseThreads
+
+		# Logging the commands would need a callback queue and a main thread processing it, and isn't being measured
+		oldShowCommands = shared_globals.showCommands
+		shared_globals.showCommands = False
+		oldReactorSupported = commands._reactorSupported # pylint: disable=protected-access
+		try:
+			commands._reactorSupported = False # pylint: disable=protected-access
+			threadCpu, threadWall, threadLatency, threadExtraThreads = _benchmark()
+			commands._reactorSupported = oldReactorSupported # pylint: disable=protected-access
+			reactorCpu, reactorWall, reactorLatency, reactorExtraThreads = _benchmark()
+		finally:
+			commands._reactorSupported = oldReactorSupported # pylint: disable=protected-access
+			shared_globals.showCommands = oldShowCommands
+
+		# The times depend on the machine and what else it's doing, so they're only logged
+		log.Test(
+			"{} processes x {} lines, {} at once: threads used {:.2f}s cpu in {:.2f}s with {:.2f}ms average latency "
+			"and up to {} extra threads; reactor used {:.2f}s cpu in {:.2f}s with {:.2f}ms average latency "
+			"and up to {} extra threads",
+			numProcesses, numLines, numRunners,
+			threadCpu, threadWall, threadLatency * 1000, threadExtraThreads,
+			reactorCpu, reactorWall, reactorLatency * 1000, reactorExtraThreads
+		)
+		# With the reactor, no process gets threads of its own to read its output: the only threads beyond the ones
+		# running the processes are the reactor's
+		self.assertLessEqual(reactorExtraThreads, numRunners + 1)
@@ -0,0 +1,13 @@
+--pass-exit-codes
+-m64
+-O3
+-DNDEBUG
+-DCSB_APPLICATION=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/null_build_test/intermediate/gcc/x64/release/other/other/795f3202b17cb6bc3d4b771d8c6c9eaf/new.o
+-MD
+-MF
+/root/package/functional_tests/null_build_test/intermediate/gcc/x64/release/other/other/795f3202b17cb6bc3d4b771d8c6c9eaf/new.d
+-c
+/root/package/functional_tests/null_build_test/other/new.cpp
\ No newline at end of file
@@ -0,0 +1,9 @@
+#include <stdio.h>
+
+int GetValue();
+
+int main()
+{
+	printf("%d", GetValue());
+	return 0;
+}
@@ -0,0 +1,4 @@
+int GetValue()
+{
+	return LIB_VALUE;
+}
@@ -0,0 +1,53 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: make
+	:synopsis: Makefile for this test
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+
+import csbuild
+
+csbuild.SetOutputDirectory("out")
+
+with csbuild.Project("libvalue", "libvalue"):
+	csbuild.AddDefines("LIB_VALUE={}".format(os.environ.get("CSBUILD_TEST_LIB_VALUE", "1")))
+	csbuild.SetOutput("libvalue", csbuild.ProjectType.StaticLibrary)
+
+with csbuild.Project("hello_world", "hello_world", ["libvalue"]):
+	csbuild.SetOutput("hello_world", csbuild.ProjectType.Application)
+
+with csbuild.Project("other", "other"):
+	csbuild.SetOutput("other", csbuild.ProjectType.Application)
+
+if os.environ.get("CSBUILD_TEST_BUILD_HOOKS"):
+	@csbuild.OnBuildStarted
+	def _buildStarted(projects):
+		print("Build started with {} projects".format(len(projects)))
+
+	@csbuild.OnBuildFinished
+	def _buildFinished(projects):
+		print("Build finished with {} projects".format(len(projects)))
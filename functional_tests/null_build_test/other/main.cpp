@@ -0,0 +1,7 @@
+#include <stdio.h>
+
+int main()
+{
+	printf("other");
+	return 0;
+}
@@ -0,0 +1,120 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test skipping projects that are unchanged since the last build
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import platform
+import subprocess
+
+from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import PlatformBytes, PlatformString
+
+class NullBuildTest(FunctionalTest):
+	"""Null build test"""
+	# pylint: disable=invalid-name
+	def setUp(self): # pylint: disable=arguments-differ
+		if platform.system() == "Windows":
+			self.outputFile = "out/hello_world.exe"
+			self.otherFile = "out/other.exe"
+		else:
+			self.outputFile = "out/hello_world"
+			self.otherFile = "out/other"
+		self.newFile = os.path.join(os.path.dirname(__file__), "other", "new.cpp")
+		FunctionalTest.setUp(self)
+
+	def tearDown(self):
+		os.environ.pop(PlatformString("CSBUILD_TEST_LIB_VALUE"), None)
+		os.environ.pop(PlatformString("CSBUILD_TEST_BUILD_HOOKS"), None)
+		if os.access(self.newFile, os.F_OK):
+			os.remove(self.newFile)
+		FunctionalTest.tearDown(self)
+
+	def _touch(self, filename):
+		stat = os.stat(filename)
+		os.utime(filename, (stat.st_atime + 10, stat.st_mtime + 10))
+
+	def _getObjectFile(self, name):
+		for root, _, files in os.walk("intermediate"):
+			for filename in files:
+				if filename.startswith(name) and os.path.splitext(filename)[1] in (".o", ".obj"):
+					return os.path.join(root, filename)
+		self.fail("No object file found for {}".format(name))
+		return None
+
+	def test(self):
+		"""Test that only projects that have changed, and what depends on them, are looked at again"""
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1"))
+		outputTime = os.path.getmtime(self.outputFile)
+		otherTime = os.path.getmtime(self.otherFile)
+
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertIn("Skipping 3 of 3 projects", out)
+		self.assertIn("Nothing to build.", out)
+
+		# Options that only change how the build runs don't change what it produces
+		_, out, _ = self.assertMakeSucceeds("-v", "-j", "2", "--show-commands")
+		self.assertIn("Skipping 3 of 3 projects", out)
+
+		# Build hooks are given every project, so nothing is skipped while there are any
+		os.environ[PlatformString("CSBUILD_TEST_BUILD_HOOKS")] = PlatformString("1")
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertNotIn("Skipping", out)
+		self.assertIn("Build started with 3 projects", out)
+		self.assertIn("Build finished with 3 projects", out)
+		del os.environ[PlatformString("CSBUILD_TEST_BUILD_HOOKS")]
+
+		# Changing the library's source looks at the library and the application using it, but not the other one
+		self._touch("libvalue/libvalue.cpp")
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertIn("Skipping 1 of 3 projects", out)
+		self.assertEqual(os.path.getmtime(self.otherFile), otherTime)
+
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertIn("Skipping 3 of 3 projects", out)
+
+		# So does changing the library's settings
+		os.environ[PlatformString("CSBUILD_TEST_LIB_VALUE")] = PlatformString("2")
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertIn("Skipping 1 of 3 projects", out)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("2"))
+		self.assertNotEqual(os.path.getmtime(self.outputFile), outputTime)
+
+		# Adding a file to a project's directory is a change to that project
+		with open(self.newFile, "w") as f:
+			f.write("int NewFunction() { return 0; }\n")
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertIn("Skipping 2 of 3 projects", out)
+		self.assertNotEqual(os.path.getmtime(self.otherFile), otherTime)
+
+		# And so is deleting one of its outputs
+		objectFile = self._getObjectFile("new")
+		os.remove(objectFile)
+		_, out, _ = self.assertMakeSucceeds()
+		self.assertIn("Skipping 2 of 3 projects", out)
+		self.assertTrue(os.access(objectFile, os.F_OK))
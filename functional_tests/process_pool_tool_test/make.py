@@ -0,0 +1,106 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: make
+	:synopsis: Makefile for this test
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import hashlib
+import os
+
+import csbuild
+from csbuild import log
+from csbuild.toolchain import Tool
+
+csbuild.SetIntermediateDirectory("intermediate")
+csbuild.SetOutputDirectory("out")
+
+class Hasher(Tool):
+	"""
+	CPU-bound tool that hashes the contents of a file over and over, recording which process it ran in.
+	"""
+	inputFiles = {".first"}
+
+	outputFiles = {".second"}
+
+	supportedArchitectures = None
+
+	runInProcess = True
+
+	def __init__(self, projectSettings):
+		self._rounds = projectSettings.get("rounds", 1)
+		Tool.__init__(self, projectSettings)
+
+	@staticmethod
+	def SetRounds(rounds):
+		"""
+		Set how many times each file is hashed
+
+		:param rounds: Number of rounds
+		:type rounds: int
+		"""
+		csbuild.currentPlan.SetValue("rounds", rounds)
+
+	def Run(self, inputProject, inputFile):
+		with open(inputFile.filename, "rb") as f:
+			data = f.read()
+		if data == b"5" and os.getenv("PROCESS_POOL_TOOL_TEST_FAIL") == "1":
+			raise csbuild.BuildFailureException(inputProject, inputFile, "Failing on purpose")
+		for _ in range(self._rounds):
+			data = hashlib.sha256(data).digest()
+		log.Build("Hashed {} in a worker process", os.path.basename(inputFile.filename))
+		outFile = os.path.join(inputProject.intermediateDir, os.path.splitext(os.path.basename(inputFile.filename))[0] + ".second")
+		with open(outFile, "w") as f:
+			f.write("{} {} {}".format(hashlib.sha256(data).hexdigest(), os.getpid(), os.getppid()))
+		return outFile
+
+class Combiner(Tool):
+	"""
+	Tool that collects the hashes into one file from RunGroup, also in a worker process.
+	"""
+	inputGroups = {".second"}
+
+	outputFiles = {".third"}
+
+	supportedArchitectures = None
+
+	runInProcess = True
+
+	def RunGroup(self, inputProject, inputFiles):
+		digests = []
+		for inputFile in sorted(inputFiles, key=lambda x: x.filename):
+			with open(inputFile.filename, "r") as f:
+				digests.append(f.read().split(" ")[0])
+		outFile = os.path.join(inputProject.outputDir, inputProject.outputName + ".third")
+		with open(outFile, "w") as f:
+			f.write("\n".join(digests))
+		return outFile
+
+csbuild.RegisterToolchain("ProcessPool", "", Hasher, Combiner)
+csbuild.SetDefaultToolchain("ProcessPool")
+
+with csbuild.Project("TestProject", "."):
+	csbuild.SetRounds(20000)
+	csbuild.SetOutput("Foo", csbuild.ProjectType.Application)
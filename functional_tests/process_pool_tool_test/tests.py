@@ -0,0 +1,72 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test tools that run in worker processes with runInProcess
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import hashlib
+import os
+
+from csbuild._testing.functional_test import FunctionalTest
+
+class ProcessPoolToolTest(FunctionalTest):
+	"""Process pool tool test"""
+	# pylint: disable=invalid-name
+	def test(self):
+		"""Test that tools with runInProcess run in worker processes and their results and logs come back"""
+		_, output, _ = self.assertMakeSucceeds("-v", "-j", "2")
+
+		digests = []
+		parents = set()
+		for i in range(1, 9):
+			data = str(i).encode("UTF-8")
+			for _ in range(20000):
+				data = hashlib.sha256(data).digest()
+			digests.append(hashlib.sha256(data).hexdigest())
+
+			with open(os.path.join("intermediate", "{}.second".format(i)), "r") as f:
+				digest, pid, ppid = f.read().split(" ")
+			self.assertEqual(digests[-1], digest)
+			# Settings made in the makefile reached the workers, and each task ran in a child of the build process
+			self.assertNotEqual(pid, ppid)
+			parents.add(ppid)
+			self.assertIn("Hashed {}.first in a worker process".format(i), output)
+
+		self.assertEqual(1, len(parents))
+		self.assertFileContents("./out/Foo.third", "\n".join(digests))
+
+		# Up-to-date checks still happen on the build threads, without involving the workers
+		_, output, _ = self.assertMakeSucceeds("-v", "-j", "2")
+		self.assertIn("Previous result exists and input has not changed", output)
+		self.assertNotIn("in a worker process", output)
+
+	def testFailure(self):
+		"""Test that a build failure raised in a worker process fails the build"""
+		os.environ["PROCESS_POOL_TOOL_TEST_FAIL"] = "1"
+		try:
+			self.assertMakeFails("Failing on purpose", "-v", "-j", "2")
+		finally:
+			del os.environ["PROCESS_POOL_TOOL_TEST_FAIL"]
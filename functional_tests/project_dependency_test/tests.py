@@ -41,3 +41,21 @@ class ProjectDependencyTest(FunctionalTest):
 			self.assertFileContents("./intermediate/BarIntermediate/{}.second".format(i), str(i*2))
 		self.assertFileContents("./out/Foo.thirdlib", "110")
 		self.assertFileContents("./out/Bar.thirdapp", "220")
+
+	def testCriticalPathScheduler(self):
+		"""Test that dependencies are still honored when tasks are ordered by critical path"""
+		self.assertMakeSucceeds("-v", "--scheduler=critical-path")
+		for i in range(1, 11):
+			self.assertFileContents("./intermediate/FooIntermediate/{}.second".format(i), str(i*2))
+			self.assertFileContents("./intermediate/BarIntermediate/{}.second".format(i), str(i*2))
+		self.assertFileContents("./out/Foo.thirdlib", "110")
+		self.assertFileContents("./out/Bar.thirdapp", "220")
+
+	def testBatchedCompletions(self):
+		"""Test that dependencies are still honored when finished tasks are processed in batches"""
+		self.assertMakeSucceeds("-v", "--batch-completions", "-j", "8")
+		for i in range(1, 11):
+			self.assertFileContents("./intermediate/FooIntermediate/{}.second".format(i), str(i*2))
+			self.assertFileContents("./intermediate/BarIntermediate/{}.second".format(i), str(i*2))
+		self.assertFileContents("./out/Foo.thirdlib", "110")
+		self.assertFileContents("./out/Bar.thirdapp", "220")
@@ -0,0 +1,16 @@
+--pass-exit-codes
+-fPIC
+-m64
+-O3
+-DLIB_VALUE=2
+-DEXTRA_FUNCTION
+-DNDEBUG
+-DCSB_SHARED_LIBRARY=1
+-DCSB_TARGET_RELEASE=1
+-o
+/root/package/functional_tests/shared_library_interface_test/intermediate/gcc/x64/release/libvalue/libvalue/b538b5464329cfb20814f01226a16279/libvalue.o
+-MD
+-MF
+/root/package/functional_tests/shared_library_interface_test/intermediate/gcc/x64/release/libvalue/libvalue/b538b5464329cfb20814f01226a16279/libvalue.d
+-c
+/root/package/functional_tests/shared_library_interface_test/libvalue/libvalue.cpp
\ No newline at end of file
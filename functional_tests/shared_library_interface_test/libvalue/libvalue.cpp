@@ -0,0 +1,11 @@
+int GetValue()
+{
+	return LIB_VALUE;
+}
+
+#ifdef EXTRA_FUNCTION
+int GetExtraValue()
+{
+	return 0;
+}
+#endif
@@ -0,0 +1,70 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: tests
+	:synopsis: Test relinking projects that depend on a shared library only when its interface changes
+
+.. moduleauthor:: Jaedyn K. Draper
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+import os
+import platform
+import subprocess
+import unittest
+
+from csbuild._testing.functional_test import FunctionalTest
+from csbuild._utils import PlatformBytes, PlatformString
+
+@unittest.skipIf(platform.system() in ("Windows", "Darwin"), "Shared library interfaces are only read on Linux")
+class SharedLibraryInterfaceTest(FunctionalTest):
+	"""Shared library interface test"""
+	# pylint: disable=invalid-name
+	def setUp(self): # pylint: disable=arguments-differ
+		self.outputFile = "out/hello_world"
+		self.libraryFile = "out/libvalue.so"
+		FunctionalTest.setUp(self)
+
+	def tearDown(self):
+		os.environ.pop(PlatformString("CSBUILD_TEST_LIB_VALUE"), None)
+		os.environ.pop(PlatformString("CSBUILD_TEST_EXTRA_FUNCTION"), None)
+		FunctionalTest.tearDown(self)
+
+	def test(self):
+		"""Test that changing only the code in a shared library doesn't relink the projects that depend on it"""
+		self.assertMakeSucceeds()
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("1"))
+		libraryTime = os.path.getmtime(self.libraryFile)
+		outputTime = os.path.getmtime(self.outputFile)
+
+		os.environ[PlatformString("CSBUILD_TEST_LIB_VALUE")] = PlatformString("2")
+		self.assertMakeSucceeds()
+		self.assertNotEqual(os.path.getmtime(self.libraryFile), libraryTime)
+		self.assertEqual(os.path.getmtime(self.outputFile), outputTime)
+		# The application picks up the new code without being linked again
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("2"))
+
+		# Exporting another function changes the interface, so the application is linked again
+		os.environ[PlatformString("CSBUILD_TEST_EXTRA_FUNCTION")] = PlatformString("1")
+		self.assertMakeSucceeds()
+		self.assertNotEqual(os.path.getmtime(self.outputFile), outputTime)
+		self.assertEqual(subprocess.check_output([self.outputFile]), PlatformBytes("2"))
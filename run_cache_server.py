@@ -0,0 +1,42 @@
+# Copyright (C) 2016 Jaedyn K. Draper
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the "Software"),
+# to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,
+# and/or sell copies of the Software, and to permit persons to whom the
+# Software is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+.. module:: run_cache_server
+	:synopsis: Execute this file directly to run an artifact cache server that builds can share with --cache-server.
+"""
+
+from __future__ import unicode_literals, division, print_function
+
+
+if __name__ == "__main__":
+	import os
+	import sys
+
+	# Importing csbuild runs a build unless this is set, so it has to be set before csbuild.cache_server is imported
+	if sys.version_info[0] >= 3:
+		os.environ["CSBUILD_NO_AUTO_RUN"] = "1"
+	else:
+		os.environ[b"CSBUILD_NO_AUTO_RUN"] = b"1"
+	sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+	from csbuild.cache_server import Main
+
+	Main()